@@ -1,13 +1,59 @@
 import anthropic
-from anthropic.types import ContentBlock, ContentBlockParam, MessageParam, ModelParam, ServerToolUseBlockParam, TextBlockParam, ThinkingBlockParam, ThinkingConfigDisabledParam, ThinkingConfigEnabledParam, ToolChoiceAutoParam, ToolChoiceToolParam, ToolResultBlockParam, ToolUseBlockParam, WebSearchResultBlockParam, WebSearchToolRequestErrorParam, WebSearchToolResultBlockParam
+from anthropic.types import CacheControlEphemeralParam, ContentBlock, ContentBlockParam, Message, MessageParam, ModelParam, ServerToolUseBlockParam, TextBlockParam, ThinkingBlockParam, ThinkingConfigDisabledParam, ThinkingConfigEnabledParam, ToolChoiceAutoParam, ToolChoiceToolParam, ToolResultBlockParam, ToolUseBlockParam, WebSearchResultBlockParam, WebSearchToolRequestErrorParam, WebSearchToolResultBlockParam
 import json
-from settings import Settings
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from settings import EditMode, Settings
+from context_manager import CHARS_PER_TOKEN, ContextManager
+from response_cache import ResponseCache, cache_key
+from session_store import Session, SessionStore
+from stats import AgentStats
+from tracing import Span, propagate, trace_span
 from tools import Tool, ToolResult
 from tools.output_tool import create_output_tool
-from events import EventEmitter, AssistantMessageEvent, WebSearchErrorEvent, UnknownContentEvent
+from events import EventEmitter, AssistantMessageEvent, WebSearchErrorEvent, UnknownContentEvent, CacheUsageEvent, LLMCallStartedEvent, LLMCallCompletedEvent, ResponseCacheEvent, ContextCompactedEvent, TextDeltaEvent, ThinkingDeltaEvent, ToolInputDeltaEvent
 
 # Tool name constant for text editor filtering
 TEXT_EDITOR_TOOL_NAME = "str_replace_based_edit_tool"
+# Tools that write files, hidden from the model when edit mode is never
+EDIT_TOOL_NAMES = {TEXT_EDITOR_TOOL_NAME, "multi_edit", "apply_patch"}
+
+CACHE_CONTROL = CacheControlEphemeralParam(type="ephemeral")
+
+
+def _add_history_breakpoint(messages: list[MessageParam]) -> list[MessageParam]:
+    """
+    Return a copy of messages with a cache breakpoint on the last cacheable block,
+    so the next call can read the whole conversation so far from the cache.
+    """
+    if not messages:
+        return messages
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        blocks = [TextBlockParam(type="text", text=content)] if content else []
+    else:
+        blocks = list(content)
+    # thinking blocks can't carry cache_control, so mark the last block that can
+    for i in range(len(blocks) - 1, -1, -1):
+        block = blocks[i]
+        if isinstance(block, dict) and block.get("type") not in ("thinking", "redacted_thinking"):
+            blocks[i] = {**block, "cache_control": CACHE_CONTROL}  # type: ignore[misc]
+            return messages[:-1] + [MessageParam(role=last["role"], content=blocks)]
+    return messages
+
+
+@dataclass
+class LLMCallTimer:
+    """Times one model call: total latency, and time to the first streamed content delta."""
+    start: float = field(default_factory=time.perf_counter)
+    first_token: float | None = None
+
+    def observe(self, event: Any) -> None:
+        if self.first_token is None and event.type == "content_block_delta":
+            self.first_token = time.perf_counter()
 
 
 class Agent:
@@ -22,7 +68,13 @@ class Agent:
         tools: list[Tool] | None = None,
         thinking_enabled: bool = True,
         model: ModelParam = "claude-sonnet-4-5",
-        emitter: EventEmitter | None = None
+        emitter: EventEmitter | None = None,
+        max_tool_workers: int = 4,
+        stream: bool = False,
+        prompt_caching: bool = True,
+        context_manager: ContextManager | None = None,
+        response_cache: ResponseCache | None = None,
+        session_store: SessionStore | None = None
     ):
         self.settings = settings
         self.model = model
@@ -33,6 +85,21 @@ class Agent:
         self.thinking_enabled = thinking_enabled
         self.tool_dict: dict[str, Tool] = {tool.tool_name: tool for tool in tools} if tools else {}
         self.emitter = emitter or EventEmitter()
+        # max number of parallel-safe tool calls to run at once (1 = serial)
+        self.max_tool_workers = max_tool_workers
+        # stream responses and emit delta events as they arrive
+        self.stream = stream
+        # mark the system prompt, tools and latest history block as cacheable
+        self.prompt_caching = prompt_caching
+        # compacts old history when it nears the model's context window
+        self.context_manager = context_manager
+        # serves repeated identical requests without calling the API
+        self.response_cache = response_cache
+        # persists history; the session is created on the first message
+        self.session_store = session_store
+        self.session: Session | None = None
+        # cumulative model and tool usage
+        self.stats = AgentStats()
 
         # Create output tool with this agent's emitter
         self.output_tool = create_output_tool(self.emitter)
@@ -58,15 +125,16 @@ class Agent:
                 messages.append(msg)
         return messages
 
-    def _call_llm(self, require_output: bool = False) -> list[ContentBlock]:
+    def _build_request(self, require_output: bool = False) -> dict[str, Any]:
+        """Build the keyword arguments for a messages API call."""
         actual_tools = []
         if require_output:
             # force the output tool to be called
             actual_tools = [self.output_tool]
         elif self.tools:
-            # filter out edit tool if edit mode is never
-            if self.settings.edit_mode == "never":
-                actual_tools.extend([tool for tool in self.tools if tool.tool_name != TEXT_EDITOR_TOOL_NAME])
+            # filter out edit tools if edit mode is never
+            if self.settings.edit_mode == EditMode.NEVER:
+                actual_tools.extend([tool for tool in self.tools if tool.tool_name not in EDIT_TOOL_NAMES])
             else:
                 actual_tools.extend(self.tools)
             actual_tools.append(self.output_tool)  # may also call the output early
@@ -76,33 +144,216 @@ class Agent:
         # Can't use thinking when forcing a specific tool
         use_thinking = self.thinking_enabled and not require_output
         messages = self._get_messages_for_api(use_thinking)
+        if self.prompt_caching:
+            messages = _add_history_breakpoint(messages)
 
-        response = self.client.messages.create(
+        params: dict[str, Any] = dict(
             max_tokens=10001,
             model=self.model,
             messages=messages,
             thinking=ThinkingConfigEnabledParam(type="enabled", budget_tokens=10000) if use_thinking else ThinkingConfigDisabledParam(type="disabled"),
-            system=self.system_prompt if self.system_prompt else anthropic.omit,
             tool_choice=ToolChoiceToolParam(name=self.output_tool.tool_name, type="tool") if require_output else ToolChoiceAutoParam(type="auto"),
-            tools=[tool.to_anthropic_tool() for tool in actual_tools] if actual_tools else anthropic.omit,
         )
+        if self.system_prompt:
+            if self.prompt_caching:
+                params["system"] = [TextBlockParam(type="text", text=self.system_prompt, cache_control=CACHE_CONTROL)]
+            else:
+                params["system"] = self.system_prompt
+        if actual_tools:
+            tool_params = [tool.to_anthropic_tool() for tool in actual_tools]
+            if self.prompt_caching:
+                # a breakpoint on the last tool caches the whole tool list
+                tool_params[-1] = {**tool_params[-1], "cache_control": CACHE_CONTROL}  # type: ignore[misc]
+            params["tools"] = tool_params
+        return params
+
+    def _call_llm(self, require_output: bool = False) -> list[ContentBlock]:
+        params = self._build_request(require_output=require_output)
+        with trace_span(f"llm {self.model}", "llm", model=self.model, stream=self.stream) as span:
+            key, response = self._cached_response(params, span)
+            if response is None:
+                timer = self._start_llm_call(params)
+                if self.stream:
+                    response = self._stream_message(params, timer)
+                else:
+                    response = self.client.messages.create(**params)
+                self._record_response(response, timer, span)
+                if self.response_cache is not None:
+                    self.response_cache.put(params, response, key)
         return response.content
 
-    def _handle_tool_call(self, tool_name: str, input: dict) -> ToolResult:
+    def _cached_response(self, params: dict[str, Any], span: Span | None) -> tuple[str | None, Message | None]:
+        """Look the request up in the response cache. Returns the cache key and the cached response, if any."""
+        if self.response_cache is None:
+            return None, None
+        key = cache_key(params)
+        response = self.response_cache.get(params, key)
+        self.emitter.emit(ResponseCacheEvent(model=params["model"], key=key, hit=response is not None))
+        if span is not None:
+            span.set(response_cache_hit=response is not None)
+        if response is not None and self.context_manager is not None:
+            self.context_manager.observe_usage(response.usage, len(self.history))
+        return key, response
+
+    def _start_llm_call(self, params: dict[str, Any]) -> LLMCallTimer:
+        self.emitter.emit(LLMCallStartedEvent(model=params["model"], message_count=len(params["messages"])))
+        return LLMCallTimer()
+
+    def _record_response(self, response: Message, timer: LLMCallTimer, span: Span | None = None) -> None:
+        """Emit timing and usage events for a completed response, and add it to the stats."""
+        latency = time.perf_counter() - timer.start
+        usage = response.usage
+        if self.context_manager is not None:
+            self.context_manager.observe_usage(usage, len(self.history))
+        self.emitter.emit(CacheUsageEvent(
+            model=response.model,
+            input_tokens=usage.input_tokens,
+            cache_creation_input_tokens=usage.cache_creation_input_tokens or 0,
+            cache_read_input_tokens=usage.cache_read_input_tokens or 0
+        ))
+        thinking_chars = sum(len(block.thinking) for block in response.content if block.type == "thinking")
+        completed = LLMCallCompletedEvent(
+            model=response.model,
+            latency=latency,
+            time_to_first_token=timer.first_token - timer.start if timer.first_token is not None else None,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            thinking_tokens=thinking_chars // CHARS_PER_TOKEN,
+            cache_creation_input_tokens=usage.cache_creation_input_tokens or 0,
+            cache_read_input_tokens=usage.cache_read_input_tokens or 0,
+            stop_reason=response.stop_reason
+        )
+        self.stats.record_llm_call(completed)
+        self.emitter.emit(completed)
+        if span is not None:
+            span.set(
+                input_tokens=completed.input_tokens,
+                output_tokens=completed.output_tokens,
+                cache_read_input_tokens=completed.cache_read_input_tokens,
+                stop_reason=completed.stop_reason
+            )
+
+    def _stream_message(self, params: dict[str, Any], timer: LLMCallTimer) -> Message:
+        """Stream a response, emitting delta events, and return the assembled message."""
+        # tool_use blocks only carry their id and name in the block start event
+        tool_blocks: dict[int, tuple[str, str]] = {}
+        with self.client.messages.stream(**params) as stream:
+            for event in stream:
+                timer.observe(event)
+                self._emit_stream_event(event, tool_blocks)
+            return stream.get_final_message()
+
+    def _emit_stream_event(self, event: Any, tool_blocks: dict[int, tuple[str, str]]) -> None:
+        """Translate a raw stream event into delta events."""
+        if event.type == "content_block_start" and event.content_block.type == "tool_use":
+            tool_blocks[event.index] = (event.content_block.id, event.content_block.name)
+        elif event.type == "content_block_delta":
+            delta = event.delta
+            if delta.type == "text_delta":
+                self.emitter.emit(TextDeltaEvent(index=event.index, text=delta.text))
+            elif delta.type == "thinking_delta":
+                self.emitter.emit(ThinkingDeltaEvent(index=event.index, thinking=delta.thinking))
+            elif delta.type == "input_json_delta" and event.index in tool_blocks:
+                tool_id, tool_name = tool_blocks[event.index]
+                self.emitter.emit(ToolInputDeltaEvent(
+                    tool_use_id=tool_id,
+                    tool_name=tool_name,
+                    partial_json=delta.partial_json
+                ))
+
+    def _get_tool(self, tool_name: str) -> Tool:
         if tool_name == self.output_tool.tool_name:
-            return self.output_tool.execute(input)
+            return self.output_tool
         tool = self.tool_dict.get(tool_name)
         if tool is None:
             raise ValueError(f"Tool {tool_name} not found")
-        return tool.execute(input)
+        return tool
+
+    def _record_tool_result(self, tool_name: str, result: ToolResult, span: Span | None) -> ToolResult:
+        self.stats.record_tool_call(tool_name, result.success, result.wall_time, result.cpu_time)
+        if span is not None and result.is_error:
+            span.error = result.error
+        return result
+
+    def _handle_tool_call(self, tool_name: str, input: dict) -> ToolResult:
+        with trace_span(f"tool {tool_name}", "tool", tool=tool_name) as span:
+            return self._record_tool_result(tool_name, self._get_tool(tool_name).execute(input), span)
+
+    def _is_parallel_safe(self, tool_name: str) -> bool:
+        tool = self.tool_dict.get(tool_name)
+        return tool is not None and tool.parallel_safe
+
+    def _plan_tool_batches(self, tool_calls: list[tuple[str, str, dict]]) -> list[list[int]]:
+        """
+        Group tool call indexes into batches that may run concurrently: runs of
+        consecutive parallel-safe calls, and every other call on its own.
+        Batches must be run in order.
+        """
+        batches: list[list[int]] = []
+        extend_last = False
+        for index, (_, tool_name, _) in enumerate(tool_calls):
+            parallel_safe = self._is_parallel_safe(tool_name)
+            if parallel_safe and extend_last:
+                batches[-1].append(index)
+            else:
+                batches.append([index])
+            extend_last = parallel_safe
+        return batches
+
+    def _run_tool_calls(self, tool_calls: list[tuple[str, str, dict]]) -> list[ToolResult]:
+        """Execute tool calls batch by batch. Results are returned in the same order as tool_calls."""
+        results: list[ToolResult] = [None] * len(tool_calls)  # type: ignore[list-item]
+        for batch in self._plan_tool_batches(tool_calls):
+            if len(batch) == 1 or self.max_tool_workers <= 1:
+                for index in batch:
+                    _, tool_name, tool_input = tool_calls[index]
+                    results[index] = self._handle_tool_call(tool_name, tool_input)
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_tool_workers, len(batch))) as executor:
+                    futures = {
+                        index: executor.submit(propagate(self._handle_tool_call), tool_calls[index][1], tool_calls[index][2])
+                        for index in batch
+                    }
+                for index, future in futures.items():
+                    results[index] = future.result()
+        return results
+
+    def _compact_history(self) -> None:
+        """Let the context manager compact history before the next call, if it's getting too long."""
+        if self.context_manager is None:
+            return
+        tokens_before = self.context_manager.estimate_tokens(self.history)
+        compacted = self.context_manager.compact(self.history, self.model)
+        if compacted is self.history:
+            return
+        self.emitter.emit(ContextCompactedEvent(
+            messages_before=len(self.history),
+            messages_after=len(compacted),
+            tokens_before=tokens_before,
+            tokens_after=self.context_manager.estimate_tokens(compacted)
+        ))
+        self.history = compacted
+        if self.session is not None:
+            self.session.replace(compacted)
 
     def _handle_iteration(self, require_output: bool = False) -> str | None:
+        self._compact_history()
         response = self._call_llm(require_output=require_output)
+        tool_calls, text_result = self._process_response(response)
+        if text_result is not None:
+            return text_result
+        if tool_calls:
+            return self._add_tool_results(tool_calls, self._run_tool_calls(tool_calls))
+        return None
 
+    def _process_response(self, response: list[ContentBlock]) -> tuple[list[tuple[str, str, dict]], str | None]:
+        """
+        Append the response to history as a single assistant message.
+        Returns the requested tool calls, and the final text if this was a text-only response.
+        """
         # Collect all content blocks into a single assistant message
         assistant_content: list[ContentBlockParam] = []
         tool_calls: list[tuple[str, str, dict]] = []  # (tool_id, tool_name, input)
-        output_result: str | None = None
         text_only_content: list[str] = []  # Collect text content for text-only responses
 
         for content in response:
@@ -160,49 +411,75 @@ class Agent:
 
         # Add the assistant message with all content blocks
         if assistant_content:
-            self.history.append(
-                MessageParam(role="assistant", content=assistant_content)
-            )
+            self._append_history(MessageParam(role="assistant", content=assistant_content))
 
         # If there are no tool calls and only text content, treat as final response
         if not tool_calls and text_only_content:
-            return "\n".join(text_only_content)
+            return tool_calls, "\n".join(text_only_content)
+        return tool_calls, None
 
-        # Now execute tools and add results as user messages
-        if tool_calls:
-            tool_results: list[ToolResultBlockParam] = []
-            for tool_id, tool_name, tool_input in tool_calls:
-                tool_result = self._handle_tool_call(tool_name, tool_input)
-                result_dict = tool_result.to_dict()
-                # Tool errors are now emitted by Tool.execute() via the event system
-                tool_results.append(
-                    ToolResultBlockParam(
-                        type="tool_result",
-                        tool_use_id=tool_id,
-                        is_error=tool_result.is_error,
-                        content=json.dumps(result_dict)
-                    )
-                )
-                # Check if this is the output tool
-                if tool_name == "output" and tool_result.data:
-                    output_result = tool_result.data.result
+    def _append_history(self, message: MessageParam) -> None:
+        self.history.append(message)
+        if self.session_store is not None:
+            if self.session is None:
+                self.session = self.session_store.create(model=self.model)
+            self.session.append(message)
 
-            # Add all tool results as a single user message
-            self.history.append(
-                MessageParam(role="user", content=tool_results)
+    def _add_tool_results(self, tool_calls: list[tuple[str, str, dict]], executed: list[ToolResult]) -> str | None:
+        """Add tool results to history as a single user message. Returns the output tool's result, if called."""
+        output_result: str | None = None
+        tool_results: list[ToolResultBlockParam] = []
+        for (tool_id, tool_name, _), tool_result in zip(tool_calls, executed):
+            result_dict = tool_result.to_dict()
+            # Tool errors are now emitted by Tool.execute() via the event system
+            tool_results.append(
+                ToolResultBlockParam(
+                    type="tool_result",
+                    tool_use_id=tool_id,
+                    is_error=tool_result.is_error,
+                    content=json.dumps(result_dict)
+                )
             )
+            # Check if this is the output tool
+            if tool_name == "output" and tool_result.data:
+                output_result = tool_result.data.result
 
+        # Add all tool results as a single user message
+        self._append_history(MessageParam(role="user", content=tool_results))
         return output_result
 
     def run(self, prompt: str, max_iterations: int | None = 10) -> str:
         iteration = 0
-        self.history.append(MessageParam(role="user", content=prompt))
-        while max_iterations is None or iteration < max_iterations:
-            iteration += 1
-            result = self._handle_iteration(require_output=iteration == max_iterations)
-            if result is not None:
-                return result
+        self._append_history(MessageParam(role="user", content=prompt))
+        with trace_span("agent run", "agent", model=self.model):
+            while max_iterations is None or iteration < max_iterations:
+                iteration += 1
+                with trace_span(f"iteration {iteration}", "iteration", iteration=iteration):
+                    result = self._handle_iteration(require_output=iteration == max_iterations)
+                if result is not None:
+                    return result
         raise Exception("Error: max iterations reached")
 
+    def resume(self, session_id: str) -> None:
+        """Continue a saved session: load its history, and append to it from now on."""
+        if self.session_store is None:
+            raise ValueError("This agent has no session store")
+        session = self.session_store.open(session_id)
+        self.history = session.load()
+        if self.session is not None:
+            self.session.close()
+        self.session = session
+
+    def close(self):
+        """Release resources held by this agent's tools. Call when the agent won't be run again."""
+        for tool in self.tools or []:
+            tool.close()
+        if self.session is not None:
+            self.session.close()
+
     def reset(self):
-        self.__init__(settings=self.settings, client=self.client, emitter=self.emitter)
+        """Start a new conversation with the same configuration (and a new session, if persisted)."""
+        self.history = []
+        if self.session is not None:
+            self.session.close()
+            self.session = None
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any
+import anthropic
+from anthropic.types import ContentBlock, Message, MessageParam
+from agent import Agent, LLMCallTimer
+from settings import Settings
+from tools import ToolResult
+from tracing import trace_span
+
+
+class AsyncAgent(Agent):
+    """
+    asyncio version of Agent built on anthropic.AsyncAnthropic, so many conversations
+    can share one event loop. Tools with a native `arun` are awaited directly; sync
+    tools run in worker threads via Tool.aexecute.
+
+    Accepts the same keyword arguments as Agent. Drive it with `await agent.arun(...)`.
+    """
+    client: anthropic.AsyncAnthropic  # type: ignore[assignment]
+
+    def __init__(self, settings: Settings, client: anthropic.AsyncAnthropic, **kwargs: Any):
+        super().__init__(settings=settings, client=client, **kwargs)  # type: ignore[arg-type]
+
+    async def _acall_llm(self, require_output: bool = False) -> list[ContentBlock]:
+        params = self._build_request(require_output=require_output)
+        with trace_span(f"llm {self.model}", "llm", model=self.model, stream=self.stream) as span:
+            key, response = self._cached_response(params, span)
+            if response is None:
+                timer = self._start_llm_call(params)
+                if self.stream:
+                    response = await self._astream_message(params, timer)
+                else:
+                    response = await self.client.messages.create(**params)
+                self._record_response(response, timer, span)
+                if self.response_cache is not None:
+                    self.response_cache.put(params, response, key)
+        return response.content
+
+    async def _astream_message(self, params: dict[str, Any], timer: LLMCallTimer) -> Message:
+        """Stream a response, emitting delta events, and return the assembled message."""
+        tool_blocks: dict[int, tuple[str, str]] = {}
+        async with self.client.messages.stream(**params) as stream:
+            async for event in stream:
+                timer.observe(event)
+                self._emit_stream_event(event, tool_blocks)
+            return await stream.get_final_message()
+
+    async def _ahandle_tool_call(self, tool_name: str, input: dict) -> ToolResult:
+        with trace_span(f"tool {tool_name}", "tool", tool=tool_name) as span:
+            if tool_name == self.output_tool.tool_name:
+                return self._record_tool_result(tool_name, self.output_tool.execute(input), span)
+            return self._record_tool_result(tool_name, await self._get_tool(tool_name).aexecute(input), span)
+
+    async def _arun_tool_calls(self, tool_calls: list[tuple[str, str, dict]]) -> list[ToolResult]:
+        """Execute tool calls batch by batch. Results are returned in the same order as tool_calls."""
+        results: list[ToolResult] = [None] * len(tool_calls)  # type: ignore[list-item]
+        semaphore = asyncio.Semaphore(max(1, self.max_tool_workers))
+
+        async def run_one(index: int):
+            _, tool_name, tool_input = tool_calls[index]
+            async with semaphore:
+                results[index] = await self._ahandle_tool_call(tool_name, tool_input)
+
+        for batch in self._plan_tool_batches(tool_calls):
+            await asyncio.gather(*(run_one(index) for index in batch))
+        return results
+
+    async def _ahandle_iteration(self, require_output: bool = False) -> str | None:
+        if self.context_manager is not None:
+            # summarizing uses the context manager's own sync client
+            await asyncio.to_thread(self._compact_history)
+        response = await self._acall_llm(require_output=require_output)
+        tool_calls, text_result = self._process_response(response)
+        if text_result is not None:
+            return text_result
+        if tool_calls:
+            return self._add_tool_results(tool_calls, await self._arun_tool_calls(tool_calls))
+        return None
+
+    async def arun(self, prompt: str, max_iterations: int | None = 10) -> str:
+        iteration = 0
+        self._append_history(MessageParam(role="user", content=prompt))
+        with trace_span("agent run", "agent", model=self.model):
+            while max_iterations is None or iteration < max_iterations:
+                iteration += 1
+                with trace_span(f"iteration {iteration}", "iteration", iteration=iteration):
+                    result = await self._ahandle_iteration(require_output=iteration == max_iterations)
+                if result is not None:
+                    return result
+        raise Exception("Error: max iterations reached")
+
+    def run(self, prompt: str, max_iterations: int | None = 10) -> str:
+        raise TypeError("AsyncAgent uses an async client; call `await agent.arun(...)` instead")
@@ -0,0 +1,112 @@
+import itertools
+import time
+from typing import Any, Callable, Iterator, Sequence
+from anthropic.types import Message, RawMessageStreamEvent
+from cassette import message_stream_events
+from context_manager import estimate_message_tokens
+
+# Builds the response to a messages.create/stream call from its keyword arguments
+Responder = Callable[[dict[str, Any]], Message]
+
+_message_ids = itertools.count(1)
+
+
+def _message(content: list[dict], stop_reason: str, model: str = "fake-model") -> Message:
+    return Message.model_validate({
+        "id": f"msg_fake_{next(_message_ids)}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": content,
+        "stop_reason": stop_reason,
+        "usage": {"input_tokens": 0, "output_tokens": 0},
+    })
+
+
+def text_response(text: str, thinking: str | None = None) -> Message:
+    content = [{"type": "thinking", "thinking": thinking, "signature": "fake"}] if thinking else []
+    return _message(content + [{"type": "text", "text": text}], "end_turn")
+
+
+def tool_use_response(*calls: tuple[str, dict], thinking: str | None = None) -> Message:
+    """A response calling each (tool_name, input) in calls."""
+    content = [{"type": "thinking", "thinking": thinking, "signature": "fake"}] if thinking else []
+    for name, input in calls:
+        content.append({"type": "tool_use", "id": f"toolu_fake_{next(_message_ids)}", "name": name, "input": input})
+    return _message(content, "tool_use")
+
+
+class FakeStream:
+    """Context manager returned by FakeClient.messages.stream, like anthropic's MessageStream."""
+
+    def __init__(self, message: Message, latency: float, time_to_first_token: float):
+        self._message = message
+        self._latency = latency
+        self._time_to_first_token = time_to_first_token
+
+    def __enter__(self) -> "FakeStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[RawMessageStreamEvent]:
+        time.sleep(self._time_to_first_token)
+        yield from message_stream_events(self._message)
+        time.sleep(max(0.0, self._latency - self._time_to_first_token))
+
+    def get_final_message(self) -> Message:
+        return self._message
+
+
+class FakeMessages:
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+
+    def create(self, **params: Any) -> Message:
+        message = self._client.respond(params)
+        time.sleep(self._client.latency)
+        return message
+
+    def stream(self, **params: Any) -> FakeStream:
+        message = self._client.respond(params)
+        ttft = self._client.time_to_first_token
+        return FakeStream(message, self._client.latency, self._client.latency if ttft is None else ttft)
+
+
+class FakeClient:
+    """
+    Local stand-in for anthropic.Client that answers messages.create/stream from a script,
+    with no network. `responses` is either a list of messages returned in order, or a
+    function of the call's keyword arguments. Every call sleeps `latency` seconds (for
+    streams, the first event comes after `time_to_first_token`). Usage is filled in
+    with estimated token counts, and every call's parameters are kept in `calls`.
+    """
+
+    def __init__(
+        self,
+        responses: Sequence[Message] | Responder,
+        latency: float = 0.0,
+        time_to_first_token: float | None = None,
+    ):
+        self.latency = latency
+        self.time_to_first_token = time_to_first_token
+        self.calls: list[dict[str, Any]] = []
+        if callable(responses):
+            self._responder = responses
+        else:
+            script = iter(list(responses))
+            self._responder = lambda params: next(script)
+        self.messages = FakeMessages(self)
+
+    def respond(self, params: dict[str, Any]) -> Message:
+        self.calls.append(params)
+        try:
+            message = self._responder(params)
+        except StopIteration:
+            raise RuntimeError(f"FakeClient script ran out of responses after {len(self.calls) - 1} calls")
+        # a fresh copy, so agents can't see each other's mutations
+        message = message.model_copy(update={"model": params.get("model", message.model)}, deep=True)
+        message.usage.input_tokens = estimate_message_tokens(params["messages"])
+        message.usage.output_tokens = estimate_message_tokens([{"role": "assistant", "content": message.model_dump()["content"]}])
+        return message
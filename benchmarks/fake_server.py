@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Sequence
+from anthropic.types import Message
+from cassette import message_stream_events
+from benchmarks.fake_client import FakeClient, Responder, text_response
+
+
+class FakeAPIServer:
+    """
+    Local HTTP server answering POST /v1/messages like the real API, for exercising rate
+    limiting and retries end to end with an anthropic.Client(base_url=server.base_url).
+    Responses come from a FakeClient script (default: "ok"), as JSON or as an event stream.
+
+    With requests_per_minute, requests are limited by a token bucket refilled continuously
+    like the API's: requests beyond it get a 429 with retry-after, and every response carries
+    the anthropic-ratelimit-requests-* headers. The next fail_first requests get fail_status
+    regardless (set it again to fail more). The window defaults to a minute like the API's; tests can shorten it.
+    """
+
+    def __init__(
+        self,
+        responses: Sequence[Message] | Responder | None = None,
+        requests_per_minute: int | None = None,
+        fail_first: int = 0,
+        fail_status: int = 429,
+        retry_after: float | None = 1.0,
+        latency: float = 0.0,
+        window: float = 60.0,
+    ):
+        self.fake = FakeClient(responses if responses is not None else (lambda params: text_response("ok")))
+        self.requests_per_minute = requests_per_minute
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.latency = latency
+        self.window = window
+        self.requests = 0
+        self.rejected = 0
+        self._tokens = float(requests_per_minute or 0)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAPIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _admit(self) -> tuple[int | None, dict[str, str]]:
+        """Decide on one request. Returns the error status (None to accept it) and rate limit headers."""
+        with self._lock:
+            now = time.time()
+            self.requests += 1
+            limit = self.requests_per_minute
+            headers = {}
+            status = None
+            if limit is not None:
+                # a token bucket refilled continuously, like the API's limits
+                rate = limit / self.window
+                self._tokens = min(limit, self._tokens + (now - self._updated) * rate)
+                self._updated = now
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                status = self.fail_status
+            elif limit is not None and self._tokens < 1:
+                status = 429
+            elif limit is not None:
+                self._tokens -= 1
+            if limit is not None:
+                headers = {
+                    "anthropic-ratelimit-requests-limit": str(limit),
+                    "anthropic-ratelimit-requests-remaining": str(int(self._tokens)),
+                    "anthropic-ratelimit-requests-reset": datetime.fromtimestamp(
+                        now + (limit - self._tokens) / rate, timezone.utc
+                    ).isoformat(),
+                }
+            if status is not None:
+                self.rejected += 1
+                retry_after = self.retry_after
+                if status == 429 and limit is not None and self._tokens < 1:
+                    retry_after = (1 - self._tokens) / rate
+                if retry_after is not None:
+                    headers["retry-after"] = f"{retry_after:.3f}"
+            return status, headers
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are written separately
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _send(self, status: int, headers: dict[str, str], body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(body)))
+                # the client retries on its own terms, not because the server said so
+                self.send_header("x-should-retry", "false")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                params = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+                if self.path.split("?")[0] != "/v1/messages":
+                    self._send(404, {}, b'{"type":"error","error":{"type":"not_found_error","message":"Not found"}}', "application/json")
+                    return
+                status, headers = server._admit()
+                if status is not None:
+                    kind = {429: "rate_limit_error", 529: "overloaded_error"}.get(status, "api_error")
+                    body = {"type": "error", "error": {"type": kind, "message": f"Fake server returned {status}"}}
+                    self._send(status, headers, json.dumps(body).encode(), "application/json")
+                    return
+                time.sleep(server.latency)
+                message = server.fake.respond(params)
+                if params.get("stream"):
+                    body = "".join(
+                        f"event: {event.type}\ndata: {event.model_dump_json()}\n\n" for event in message_stream_events(message)
+                    )
+                    self._send(200, headers, body.encode(), "text/event-stream")
+                else:
+                    self._send(200, headers, message.model_dump_json().encode(), "application/json")
+
+        return Handler
@@ -0,0 +1,294 @@
+"""
+Offline benchmarks for the agent loop and tools, driven by FakeClient and a local
+FakeAPIServer (no network, no API key).
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json   # compare, exit 1 on regressions
+
+Each benchmark reports timing statistics in seconds. With --baseline, medians are
+compared and anything slower than the baseline by more than --threshold is flagged.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable
+import anthropic
+from anthropic.types import MessageParam
+from pydantic import BaseModel
+from agent import Agent
+from events import EventEmitter
+from scheduler import RequestScheduler, ScheduledClient
+from settings import Settings
+from tools import (
+    BashSessionPool,
+    Tool,
+    create_bash_tool,
+    create_glob_tool,
+    create_grep_tool,
+    create_read_file_tool,
+    create_sub_agent_tool,
+)
+from tools.utils import get_project_root
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+from benchmarks.fake_server import FakeAPIServer
+
+Samples = dict[str, list[float]]
+
+
+class NoopInput(BaseModel):
+    value: int = 0
+
+
+class NoopOutput(BaseModel):
+    value: int
+
+
+def create_noop_tool(emitter: EventEmitter) -> Tool:
+    return Tool(
+        tool_name="noop",
+        description="Returns its input",
+        input_schema=NoopInput,
+        output_schema=NoopOutput,
+        run=lambda input: NoopOutput(value=input.value),
+        emitter=emitter,
+        parallel_safe=True
+    )
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples: list[float]) -> dict[str, float | int]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def bench_iteration(iterations: int, latency: float) -> Samples:
+    """Cost of one _handle_iteration (model call, response processing, one tool call) as history grows."""
+    results: Samples = {}
+    for stream in (False, True):
+        emitter = EventEmitter()
+        client = FakeClient(lambda params: tool_use_response(("noop", {"value": 1}), thinking="Let me check."), latency=latency)
+        agent = Agent(
+            settings=Settings(),
+            client=client,  # type: ignore[arg-type]
+            tools=[create_noop_tool(emitter)],
+            emitter=emitter,
+            stream=stream
+        )
+        agent.history.append(MessageParam(role="user", content="Start"))
+        samples = measure(agent._handle_iteration, repeat=iterations)
+        # the simulated model latency isn't agent overhead
+        results["iteration.stream" if stream else "iteration"] = [sample - latency for sample in samples]
+    return results
+
+
+def _synthetic_history(messages: int) -> list[MessageParam]:
+    history: list[MessageParam] = [MessageParam(role="user", content="Refactor the parser")]
+    for i in range(1, messages):
+        if i % 2:
+            history.append(MessageParam(role="assistant", content=[
+                {"type": "thinking", "thinking": "Thinking about the next step. " * 20, "signature": "fake"},
+                {"type": "text", "text": "Reading the next file."},
+                {"type": "tool_use", "id": f"toolu_{i}", "name": "read_file", "input": {"path": f"src/module_{i}.py"}},
+            ]))
+        else:
+            history.append(MessageParam(role="user", content=[
+                {"type": "tool_result", "tool_use_id": f"toolu_{i - 1}", "content": json.dumps({"contents": "x = 1\n" * 200})},
+            ]))
+    return history
+
+
+def bench_history(sizes: list[int], repeat: int) -> Samples:
+    """_get_messages_for_api (thinking stripped) and _build_request as history grows."""
+    results: Samples = {}
+    agent = Agent(settings=Settings(), client=FakeClient([]), tools=[create_noop_tool(EventEmitter())])  # type: ignore[arg-type]
+    for size in sizes:
+        agent.history = _synthetic_history(size)
+        results[f"history.strip_thinking[n={size}]"] = measure(lambda: agent._get_messages_for_api(use_thinking=False), repeat)
+        results[f"history.build_request[n={size}]"] = measure(agent._build_request, repeat)
+    return results
+
+
+def bench_tools(repeat: int) -> Samples:
+    """Latency of common tool calls against this repository. The first (cold) call is reported separately."""
+    emitter = EventEmitter()
+    root = get_project_root()
+    bash_tool = create_bash_tool(emitter)
+    calls = {
+        "glob": (create_glob_tool(emitter), {"pattern": "**/*.py"}),
+        "grep": (create_grep_tool(emitter), {"pattern": r"def \w+\("}),
+        "read_file": (create_read_file_tool(emitter), {"path": os.path.join(root, "agent.py")}),
+        "bash": (bash_tool, {"command": "true"}),
+    }
+    results: Samples = {}
+    try:
+        for name, (tool, input) in calls.items():
+            def call(tool=tool, input=input):
+                result = tool.execute(input)
+                if result.is_error:
+                    raise RuntimeError(f"{tool.tool_name} failed: {result.error}")
+            results[f"tool.{name}.cold"] = measure(call, repeat=1, warmup=0)
+            results[f"tool.{name}"] = measure(call, repeat, warmup=0)
+    finally:
+        bash_tool.close()
+    return results
+
+
+def bench_sub_agent(repeat: int, latency: float) -> Samples:
+    """Creating, running and closing sub-agents set up like main.py's explore agent."""
+    pool = BashSessionPool()
+
+    def create_agent(agent_type, agent_emitter: EventEmitter) -> Agent:
+        return Agent(
+            settings=Settings(),
+            client=FakeClient(lambda params: text_response("Done"), latency=latency),  # type: ignore[arg-type]
+            tools=[
+                create_glob_tool(agent_emitter),
+                create_grep_tool(agent_emitter),
+                create_read_file_tool(agent_emitter),
+                create_bash_tool(agent_emitter, pool=pool),
+            ],
+            thinking_enabled=False,
+            emitter=agent_emitter
+        )
+
+    tool = create_sub_agent_tool(EventEmitter(), create_agent)
+    jobs = [{"agent_type": "explore", "prompt": f"Job {i}"} for i in range(4)]
+    try:
+        return {
+            "sub_agent.spawn": [s - latency for s in measure(lambda: tool.execute({"agent_type": "explore", "prompt": "Go"}), repeat)],
+            "sub_agent.batch4": [s - latency for s in measure(lambda: tool.execute({"jobs": jobs}), repeat)],
+        }
+    finally:
+        pool.close()
+
+
+def bench_scheduler(repeat: int) -> Samples:
+    """Requests through the RequestScheduler to a local FakeAPIServer over HTTP, and a burst recovering from 429s."""
+    params = {"model": "fake-model", "max_tokens": 100, "messages": [MessageParam(role="user", content="Hi")]}
+    with FakeAPIServer(retry_after=0.0) as server:
+        client = ScheduledClient(
+            anthropic.Client(api_key="fake", base_url=server.base_url, max_retries=0),
+            RequestScheduler(base_delay=0.01)
+        )
+
+        def burst() -> None:
+            # 8 parallel requests, the first 4 answered with a 429 and retry-after: 0
+            server.fail_first = 4
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda _: client.messages.create(**params), range(8)))
+
+        return {
+            "scheduler.request": measure(lambda: client.messages.create(**params), repeat),
+            "scheduler.burst429": measure(burst, max(1, repeat // 4)),
+        }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=get_project_root(), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(only: set[str] | None = None, repeat: int = 20, latency: float = 0.0) -> dict:
+    suites: dict[str, Callable[[], Samples]] = {
+        "iteration": lambda: bench_iteration(iterations=repeat * 10, latency=latency),
+        "history": lambda: bench_history(sizes=[10, 100, 1000], repeat=repeat),
+        "tools": lambda: bench_tools(repeat=repeat),
+        "sub_agent": lambda: bench_sub_agent(repeat=max(1, repeat // 4), latency=latency),
+        "scheduler": lambda: bench_scheduler(repeat=repeat),
+    }
+    results = {}
+    for name, suite in suites.items():
+        if only is None or name in only:
+            print(f"running {name}...", file=sys.stderr)
+            results.update({bench: summarize(samples) for bench, samples in suite().items()})
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "latency": latency,
+        },
+        "unit": "seconds",
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print current vs baseline medians. Returns the benchmarks slower than baseline by more than threshold."""
+    regressions = []
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:<40} {'-':>12} {result['median'] * 1000:>10.3f}ms {'new':>8}")
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {before['median'] * 1000:>10.3f}ms {result['median'] * 1000:>10.3f}ms {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the agent loop and tools")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline before flagging (0.2 = 20%%)")
+    parser.add_argument("--only", help="Comma separated suites: iteration,history,tools,sub_agent,scheduler")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated model latency in seconds")
+    args = parser.parse_args()
+
+    os.chdir(get_project_root())
+    report = run_benchmarks(set(args.only.split(",")) if args.only else None, args.repeat, args.latency)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    elif not args.baseline:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
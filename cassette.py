@@ -0,0 +1,316 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import defaultdict, deque
+from typing import IO, Any, Iterator
+from anthropic.types import Message, RawMessageStreamEvent, ToolUnionParam
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from tools.tool import Tool, ToolResult, ToolTimer
+from events import ToolStartedEvent, ToolCompletedEvent, ToolErrorEvent
+
+_stream_event = TypeAdapter(RawMessageStreamEvent)
+
+
+def request_hash(params: dict[str, Any]) -> str:
+    """Stable hash of a messages API request: canonical JSON of its keyword arguments."""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _input_key(tool_name: str, input: dict) -> str:
+    return f"{tool_name}:{json.dumps(input, sort_keys=True, default=str)}"
+
+
+def open_cassette(path: str, mode: str) -> IO[str]:
+    """Open a cassette as text. .gz files are gzip compressed, .zst files zstd compressed."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            from compression import zstd  # type: ignore[import-not-found]  # Python 3.14+
+        except ImportError:
+            try:
+                import zstandard as zstd  # type: ignore[import-not-found, no-redef]
+            except ImportError:
+                raise ValueError("zstd cassettes need Python 3.14+ or the zstandard package")
+        return zstd.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def message_stream_events(message: Message) -> Iterator[RawMessageStreamEvent]:
+    """Raw stream events that assemble into message, one delta per content block."""
+    yield _stream_event.validate_python({
+        "type": "message_start",
+        "message": {**message.model_dump(), "content": [], "stop_reason": None},
+    })
+    for index, block in enumerate(message.content):
+        if block.type == "text":
+            start, delta = {"type": "text", "text": ""}, {"type": "text_delta", "text": block.text}
+        elif block.type == "thinking":
+            start, delta = {"type": "thinking", "thinking": "", "signature": ""}, {"type": "thinking_delta", "thinking": block.thinking}
+        elif block.type == "tool_use":
+            start = {"type": "tool_use", "id": block.id, "name": block.name, "input": {}}
+            delta = {"type": "input_json_delta", "partial_json": json.dumps(block.input)}
+        else:
+            # other blocks (server tool use, redacted thinking) arrive whole
+            yield _stream_event.validate_python({"type": "content_block_start", "index": index, "content_block": block.model_dump()})
+            yield _stream_event.validate_python({"type": "content_block_stop", "index": index})
+            continue
+        yield _stream_event.validate_python({"type": "content_block_start", "index": index, "content_block": start})
+        yield _stream_event.validate_python({"type": "content_block_delta", "index": index, "delta": delta})
+        yield _stream_event.validate_python({"type": "content_block_stop", "index": index})
+    yield _stream_event.validate_python({
+        "type": "message_delta",
+        "delta": {"stop_reason": message.stop_reason},
+        "usage": {"output_tokens": message.usage.output_tokens},
+    })
+    yield _stream_event.validate_python({"type": "message_stop"})
+
+
+class CassetteWriter:
+    """
+    Appends records to a cassette, one JSON object per line, flushed as they are written
+    so a crashed session still leaves a usable cassette:
+    - {"kind": "llm", "hash", "model", "message_count", "last_message", "response"} for each model call
+    - {"kind": "tool", "tool", "input", "content", "is_error"} for each tool result,
+      taken from the tool_result blocks of the following request
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open_cassette(path, "a")
+        self._lock = threading.Lock()
+        self._tool_uses: dict[str, tuple[str, dict]] = {}  # tool_use id -> (name, input)
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+        self._file.flush()
+
+    def record(self, params: dict[str, Any], response: Message) -> None:
+        with self._lock:
+            self._record_tool_results(params)
+            messages = params.get("messages") or []
+            # replay only needs the hash; the full request would make the cassette grow
+            # quadratically with the conversation, so keep just the newest message
+            self._write({
+                "kind": "llm",
+                "hash": request_hash(params),
+                "model": params.get("model"),
+                "message_count": len(messages),
+                "last_message": messages[-1] if messages else None,
+                "response": response.model_dump(mode="json"),
+            })
+            for block in response.content:
+                if block.type == "tool_use":
+                    self._tool_uses[block.id] = (block.name, block.input)  # type: ignore[assignment]
+
+    def _record_tool_results(self, params: dict[str, Any]) -> None:
+        messages = params.get("messages") or []
+        content = messages[-1]["content"] if messages else None
+        if not isinstance(content, list):
+            return
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "tool_result":
+                tool_use = self._tool_uses.pop(block["tool_use_id"], None)
+                if tool_use is not None:
+                    self._write({
+                        "kind": "tool",
+                        "tool": tool_use[0],
+                        "input": tool_use[1],
+                        "content": block.get("content"),
+                        "is_error": bool(block.get("is_error")),
+                    })
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class _RecordingStream:
+    def __init__(self, stream_manager: Any, on_message: Any):
+        self._manager = stream_manager
+        self._on_message = on_message
+        self._stream: Any = None
+
+    def __enter__(self) -> "_RecordingStream":
+        self._stream = self._manager.__enter__()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self._manager.__exit__(*exc_info)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._stream)
+
+    def get_final_message(self) -> Message:
+        message = self._stream.get_final_message()
+        self._on_message(message)
+        return message
+
+
+class _RecordingMessages:
+    def __init__(self, client: "RecordingClient"):
+        self._client = client
+
+    def create(self, **params: Any) -> Message:
+        response = self._client.client.messages.create(**params)
+        self._client.writer.record(params, response)
+        return response
+
+    def stream(self, **params: Any) -> _RecordingStream:
+        return _RecordingStream(
+            self._client.client.messages.stream(**params),
+            lambda message: self._client.writer.record(params, message)
+        )
+
+
+class RecordingClient:
+    """
+    Wraps an anthropic.Client and writes every messages.create/stream request and its
+    response to a cassette, for ReplayClient to serve back later.
+    """
+
+    def __init__(self, client: Any, path: str | None = None, writer: CassetteWriter | None = None):
+        self.client = client
+        if writer is None:
+            if path is None:
+                raise ValueError("RecordingClient needs a cassette path or a writer")
+            writer = CassetteWriter(path)
+        # agents with their own clients can share a writer, so all their calls go to one cassette
+        self.writer = writer
+        self.messages = _RecordingMessages(self)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class CassetteMissError(KeyError):
+    """A replayed request that isn't in the cassette (or has been served as many times as it was recorded)."""
+
+
+class _ReplayStream:
+    def __init__(self, message: Message):
+        self._message = message
+
+    def __enter__(self) -> "_ReplayStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[RawMessageStreamEvent]:
+        return message_stream_events(self._message)
+
+    def get_final_message(self) -> Message:
+        return self._message
+
+
+class _ReplayMessages:
+    def __init__(self, client: "ReplayClient"):
+        self._client = client
+
+    def create(self, **params: Any) -> Message:
+        return self._client.response_for(params)
+
+    def stream(self, **params: Any) -> _ReplayStream:
+        return _ReplayStream(self._client.response_for(params))
+
+
+class ReplayClient:
+    """
+    Stand-in for anthropic.Client that serves responses from a cassette by request hash,
+    without touching the network. A request recorded n times is served n times, in order.
+    The replayed session must send byte-identical requests, so tools either have to
+    return what they returned when recording, or be replaced with stub_tools().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._responses: dict[str, deque[Message]] = defaultdict(deque)
+        self._tool_results: dict[str, deque[tuple[Any, bool]]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        with open_cassette(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["kind"] == "llm":
+                    self._responses[record["hash"]].append(Message.model_validate(record["response"]))
+                elif record["kind"] == "tool":
+                    key = _input_key(record["tool"], record["input"])
+                    self._tool_results[key].append((record["content"], record["is_error"]))
+        self.messages = _ReplayMessages(self)
+
+    def response_for(self, params: dict[str, Any]) -> Message:
+        key = request_hash(params)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise CassetteMissError(
+                    f"No recorded response for request {key[:12]} (model {params.get('model')}, "
+                    f"{len(params.get('messages', []))} messages) in {self.path}"
+                )
+            return responses.popleft()
+
+    def tool_result(self, tool_name: str, input: dict) -> tuple[Any, bool]:
+        """The next recorded (content, is_error) for this tool call."""
+        key = _input_key(tool_name, input)
+        with self._lock:
+            results = self._tool_results.get(key)
+            if not results:
+                raise CassetteMissError(f"No recorded result for {tool_name} with input {json.dumps(input)[:200]}")
+            return results.popleft()
+
+
+class RecordedOutput(BaseModel):
+    """A recorded tool result, dumped back exactly as it was recorded."""
+    model_config = ConfigDict(extra="allow")
+
+
+class RecordedTool(Tool):
+    """Stands in for a tool during replay, returning the results recorded for the same inputs."""
+
+    def __init__(self, tool: Tool, replay: ReplayClient):
+        self.tool = tool
+        self.replay = replay
+        super().__init__(
+            tool_name=tool.tool_name,
+            description=tool.description,
+            input_schema=tool.input_schema,
+            output_schema=RecordedOutput,
+            run=tool.run,  # not called, execute serves the recording
+            emitter=tool.emitter,
+            parallel_safe=tool.parallel_safe
+        )
+
+    def to_anthropic_tool(self) -> ToolUnionParam:
+        # requests must match the recording, including special tool types
+        return self.tool.to_anthropic_tool()
+
+    def close(self) -> None:
+        self.tool.close()
+
+    def execute(self, input: dict) -> ToolResult[RecordedOutput]:
+        timer = ToolTimer()
+        self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
+
+        try:
+            content, is_error = self.replay.tool_result(self.tool_name, input)
+            data = json.loads(content) if isinstance(content, str) else {}
+            if is_error:
+                raise ValueError(data.get("error"))
+            output = RecordedOutput.model_validate(data)
+
+            timing = timer.elapsed()
+            self.emitter.emit(ToolCompletedEvent(tool_name=self.tool_name, output=data, **timing))
+            return ToolResult(data=output, **timing)
+        except Exception as e:
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
+
+
+def stub_tools(tools: list[Tool], replay: ReplayClient) -> list[Tool]:
+    """Replace tools with RecordedTools serving results from the replay cassette."""
+    return [RecordedTool(tool, replay) for tool in tools]
@@ -1,3 +1,4 @@
+import threading
 from events import (
     Event,
     EventHandler,
@@ -6,56 +7,145 @@ from events import (
     ToolCompletedEvent,
     ToolErrorEvent,
     AssistantMessageEvent,
+    TextDeltaEvent,
+    ThinkingDeltaEvent,
+    CacheUsageEvent,
+    LLMCallCompletedEvent,
+    ResponseCacheEvent,
+    RequestScheduledEvent,
+    RequestRetryEvent,
+    ContextCompactedEvent,
     FileViewedEvent,
     WebSearchErrorEvent,
     UnknownContentEvent,
     FinalOutputEvent,
     TodosUpdatedEvent,
+    SubAgentEvent,
 )
 
 
 class CLIEventHandler(EventHandler):
     """Default CLI event handler that prints formatted output"""
 
-    def __init__(self, verbose: bool = False):
+    def __init__(self, verbose: bool = False, stream: bool = False):
         self.verbose = verbose
+        # print text deltas as they arrive instead of waiting for the full message
+        self.stream = stream
+        self._stream_index: int | None = None  # content block currently being streamed
+        self._streamed_blocks = 0  # text blocks printed via deltas, not yet closed by their message event
+        # events may arrive from concurrent sub-agent threads; print one event at a time
+        self._lock = threading.RLock()
+        self._prefix = ""
+
+    def _print(self, text: str = "", **kwargs) -> None:
+        print(f"{self._prefix}{text}", **kwargs)
 
     def handle(self, event: Event) -> None:
+        with self._lock:
+            self._handle(event)
+
+    def handle_batch(self, events: list[Event]) -> None:
+        with self._lock:
+            for event in events:
+                self._handle(event)
+
+    def _handle(self, event: Event) -> None:
         # Pattern match on strongly typed events - type checker validates field access
         match event:
+            case TextDeltaEvent(index=index, text=text):
+                if self.stream:
+                    if index != self._stream_index:
+                        if self._stream_index is not None:
+                            print()
+                        print("💬 ", end="")
+                        self._stream_index = index
+                        self._streamed_blocks += 1
+                    print(text, end="", flush=True)
+
+            case ThinkingDeltaEvent(thinking=thinking):
+                if self.stream and self.verbose:
+                    print(thinking, end="", flush=True)
+
             case AssistantMessageEvent(text=text):
-                print(f"💬 {text}")
+                if self._streamed_blocks:
+                    # already printed via deltas, just end the line after the last block
+                    self._streamed_blocks -= 1
+                    if self._streamed_blocks == 0:
+                        print()
+                        self._stream_index = None
+                else:
+                    self._print(f"💬 {text}")
 
             case ToolErrorEvent(tool_name=name, error=err):
-                print(f"🛠️ Tool {name} error: {err}")
+                self._print(f"🛠️ Tool {name} error: {err}")
 
             case FileViewedEvent(path=path):
-                print(f"🔍 View file: {path}")
+                self._print(f"🔍 View file: {path}")
 
             case WebSearchErrorEvent(error_code=code):
-                print(f"web search error: {code}")
+                self._print(f"web search error: {code}")
 
             case UnknownContentEvent(content_type=ct):
-                print(f"unknown content type: {ct}")
+                self._print(f"unknown content type: {ct}")
 
             case FinalOutputEvent(result=result):
-                print(f"💡 {result}")
+                self._print(f"💡 {result}")
 
             case TodosUpdatedEvent(todos=todos):
-                print("--------------------------------")
-                print("Todos:")
+                self._print("--------------------------------")
+                self._print("Todos:")
                 for todo in todos:
                     status_mark = "✔" if todo.status.value == "completed" else " "
-                    print(f"[{status_mark}]: {todo.title}")
-                print("--------------------------------")
+                    self._print(f"[{status_mark}]: {todo.title}")
+                self._print("--------------------------------")
 
             case ToolStartedEvent(tool_name=name):
                 if self.verbose:
-                    print(f"🛠️ Starting {name}...")
+                    self._print(f"🛠️ Starting {name}...")
+
+            case ToolCompletedEvent(tool_name=name, wall_time=wall_time):
+                if self.verbose:
+                    took = f" in {wall_time:.2f}s" if wall_time is not None else ""
+                    self._print(f"✅ {name} completed{took}")
+
+            case LLMCallCompletedEvent():
+                if self.verbose:
+                    first_token = f", first token {event.time_to_first_token:.2f}s" if event.time_to_first_token is not None else ""
+                    self._print(
+                        f"🤖 {event.model}: {event.latency:.2f}s{first_token}, "
+                        f"{event.input_tokens} in / {event.output_tokens} out tokens, stop: {event.stop_reason}"
+                    )
+
+            case CacheUsageEvent(input_tokens=uncached, cache_creation_input_tokens=written, cache_read_input_tokens=read):
+                if self.verbose:
+                    self._print(f"🗄️ Prompt cache: {read} read, {written} written, {uncached} uncached")
 
-            case ToolCompletedEvent(tool_name=name):
+            case ResponseCacheEvent(hit=hit):
                 if self.verbose:
-                    print(f"✅ {name} completed")
+                    self._print("♻️ Response cache hit" if hit else "♻️ Response cache miss")
+
+            case RequestScheduledEvent(model=model, wait_time=wait_time, queue_depth=queue_depth):
+                if self.verbose and wait_time >= 0.1:
+                    self._print(f"🚦 {model} request waited {wait_time:.1f}s ({queue_depth} still queued)")
+
+            case RequestRetryEvent(model=model, attempt=attempt, status_code=status_code, delay=delay):
+                reason = f"HTTP {status_code}" if status_code is not None else "connection error"
+                self._print(f"🚦 {model} request failed ({reason}), retrying in {delay:.1f}s (attempt {attempt + 1})")
+
+            case ContextCompactedEvent(tokens_before=before, tokens_after=after):
+                self._print(f"🗜️ Compacted conversation history (~{before} -> ~{after} tokens)")
+
+            case SubAgentEvent(job_id=job_id, event=inner):
+                # skip deltas from batched jobs, their full messages are still printed
+                if isinstance(inner, (TextDeltaEvent, ThinkingDeltaEvent)):
+                    return
+                # prefix output from concurrent sub-agent jobs with their job id
+                previous_prefix = self._prefix
+                self._prefix = f"{previous_prefix}[{job_id}] "
+                try:
+                    self._handle(inner)
+                finally:
+                    self._prefix = previous_prefix
 
 
 class CLIConfirmationHandler(ConfirmationHandler):
@@ -0,0 +1,226 @@
+import json
+import anthropic
+from anthropic.types import MessageParam, ModelParam, TextBlockParam, Usage
+
+# Context window size per model, in tokens
+MODEL_CONTEXT_WINDOWS: dict[str, int] = {
+    "claude-opus-4-5": 200_000,
+    "claude-sonnet-4-5": 200_000,
+    "claude-haiku-4-5": 200_000,
+}
+DEFAULT_CONTEXT_WINDOW = 200_000
+
+# Rough heuristic used between real token counts from the API
+CHARS_PER_TOKEN = 4
+TOKENS_PER_BLOCK = 4
+
+SUMMARY_PROMPT = """Summarize the following conversation between a user and a coding agent so the agent can continue the work without it.
+Keep the user's requests and constraints, decisions made, files and code locations involved, important tool results, and anything still left to do.
+Be concise and factual. Respond with the summary only."""
+
+# Start of the placeholder that replaces old tool results
+ELIDED_RESULT_PREFIX = "[old tool result elided, "
+
+
+def _block_chars(block) -> int:
+    if not isinstance(block, dict):
+        return len(str(block))
+    match block.get("type"):
+        case "text":
+            return len(block["text"])
+        case "thinking":
+            return len(block["thinking"])
+        case "tool_use" | "server_tool_use":
+            return len(json.dumps(block["input"]))
+        case "tool_result":
+            content = block.get("content", "")
+            if isinstance(content, str):
+                return len(content)
+            return sum(_block_chars(b) for b in content)
+        case _:
+            return len(json.dumps(block, default=str))
+
+
+def _is_elided(block: dict) -> bool:
+    """Whether a tool_result block was already replaced by the placeholder, by an earlier compaction."""
+    content = block.get("content")
+    return isinstance(content, str) and content.startswith(ELIDED_RESULT_PREFIX)
+
+
+def estimate_message_tokens(messages: list[MessageParam]) -> int:
+    """Cheap token estimate for a list of messages, without calling the API."""
+    chars = 0
+    blocks = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            chars += len(content)
+            blocks += 1
+        else:
+            chars += sum(_block_chars(block) for block in content)
+            blocks += len(content)  # type: ignore[arg-type]
+    return chars // CHARS_PER_TOKEN + blocks * TOKENS_PER_BLOCK
+
+
+class ContextManager:
+    """
+    Keeps an agent's history within its model's context window.
+
+    Before each call the history size is estimated, starting from the real input token
+    count of the previous response and adding a heuristic estimate for messages appended
+    since. Once it passes `compact_threshold` of the budget, old turns are compacted in
+    stages until it is under `target_ratio` of the budget:
+    1. old tool results are replaced by a short placeholder
+    2. old thinking blocks are dropped
+    3. the oldest turns are summarized with a cheap model (or a plain excerpt if no client)
+
+    The most recent `keep_recent_messages` messages are never touched, and cuts only happen
+    before an assistant message, so tool_use/tool_result pairs stay intact.
+    """
+
+    def __init__(
+        self,
+        client: anthropic.Client | None = None,
+        summary_model: ModelParam = "claude-haiku-4-5",
+        compact_threshold: float = 0.75,
+        target_ratio: float = 0.5,
+        keep_recent_messages: int = 6,
+        reserved_output_tokens: int = 10001,
+    ):
+        self.client = client
+        self.summary_model = summary_model
+        self.compact_threshold = compact_threshold
+        self.target_ratio = target_ratio
+        self.keep_recent_messages = keep_recent_messages
+        self.reserved_output_tokens = reserved_output_tokens
+        # calibration from the last response: (real input tokens, number of history messages sent)
+        self._measured: tuple[int, int] | None = None
+
+    def budget(self, model: ModelParam) -> int:
+        """Tokens available for the prompt (system, tools and history)."""
+        window = MODEL_CONTEXT_WINDOWS.get(str(model), DEFAULT_CONTEXT_WINDOW)
+        return window - self.reserved_output_tokens
+
+    def observe_usage(self, usage: Usage, message_count: int) -> None:
+        """Record the real prompt size of the last call, which covered the first message_count messages."""
+        input_tokens = usage.input_tokens + (usage.cache_creation_input_tokens or 0) + (usage.cache_read_input_tokens or 0)
+        self._measured = (input_tokens, message_count)
+
+    def estimate_tokens(self, history: list[MessageParam]) -> int:
+        if self._measured is not None and self._measured[1] <= len(history):
+            measured_tokens, measured_count = self._measured
+            return measured_tokens + estimate_message_tokens(history[measured_count:])
+        return estimate_message_tokens(history)
+
+    def compact(self, history: list[MessageParam], model: ModelParam) -> list[MessageParam]:
+        """Return a compacted copy of history if it is near the budget, otherwise history itself."""
+        budget = self.budget(model)
+        if self.estimate_tokens(history) < budget * self.compact_threshold:
+            return history
+
+        target = budget * self.target_ratio
+        # the estimate of the untouched part is still calibrated, so measure savings relative to it
+        overhead = self.estimate_tokens(history) - estimate_message_tokens(history)
+        cutoff = max(0, len(history) - self.keep_recent_messages)
+
+        compacted = self._elide_tool_results(history, cutoff)
+        if overhead + estimate_message_tokens(compacted) > target:
+            compacted = self._drop_thinking(compacted, cutoff)
+        if overhead + estimate_message_tokens(compacted) > target:
+            compacted = self._summarize_prefix(compacted, cutoff)
+
+        # message indexes changed, the old measurement no longer lines up
+        self._measured = None
+        return compacted
+
+    def _elide_tool_results(self, history: list[MessageParam], cutoff: int) -> list[MessageParam]:
+        compacted: list[MessageParam] = []
+        for i, message in enumerate(history):
+            content = message["content"]
+            if i >= cutoff or message["role"] != "user" or isinstance(content, str):
+                compacted.append(message)
+                continue
+            blocks = []
+            for block in content:
+                if isinstance(block, dict) and block.get("type") == "tool_result" and not _is_elided(block):
+                    size = _block_chars(block)
+                    block = {**block, "content": f"{ELIDED_RESULT_PREFIX}{size} characters]"}
+                blocks.append(block)
+            compacted.append(MessageParam(role="user", content=blocks))
+        return compacted
+
+    def _drop_thinking(self, history: list[MessageParam], cutoff: int) -> list[MessageParam]:
+        compacted: list[MessageParam] = []
+        for i, message in enumerate(history):
+            content = message["content"]
+            if i >= cutoff or message["role"] != "assistant" or isinstance(content, str):
+                compacted.append(message)
+                continue
+            blocks = [
+                block for block in content
+                if not (isinstance(block, dict) and block.get("type") in ("thinking", "redacted_thinking"))
+            ]
+            compacted.append(MessageParam(role="assistant", content=blocks or [TextBlockParam(type="text", text="(thinking omitted)")]))
+        return compacted
+
+    def _summarize_prefix(self, history: list[MessageParam], cutoff: int) -> list[MessageParam]:
+        # Cut right before the latest assistant message outside the recent window: the prefix
+        # then ends with a user message, and the kept part starts with an assistant message whose
+        # tool results (if any) follow it.
+        boundary = next(
+            (i for i in range(min(cutoff, len(history) - 1), 0, -1) if history[i]["role"] == "assistant"),
+            None
+        )
+        if boundary is None:
+            return history
+
+        summary = self._summarize(history[:boundary])
+        summary_message = MessageParam(
+            role="user",
+            content=[TextBlockParam(type="text", text=f"Summary of the earlier conversation:\n\n{summary}")]
+        )
+        return [summary_message] + history[boundary:]
+
+    def _summarize(self, messages: list[MessageParam]) -> str:
+        transcript = render_transcript(messages)
+        if self.client is None:
+            # No model available: keep the tail of the transcript as a plain excerpt
+            limit = 4000 * CHARS_PER_TOKEN
+            return transcript if len(transcript) <= limit else "...\n" + transcript[-limit:]
+
+        response = self.client.messages.create(
+            model=self.summary_model,
+            max_tokens=2048,
+            system=SUMMARY_PROMPT,
+            messages=[MessageParam(role="user", content=transcript)],
+        )
+        return "\n".join(block.text for block in response.content if block.type == "text")
+
+
+def render_transcript(messages: list[MessageParam], max_block_chars: int = 2000) -> str:
+    """Render messages as plain text for summarization, truncating long blocks."""
+
+    def clip(text: str) -> str:
+        return text if len(text) <= max_block_chars else text[:max_block_chars] + " ...[truncated]"
+
+    lines: list[str] = []
+    for message in messages:
+        role = message["role"].upper()
+        content = message["content"]
+        if isinstance(content, str):
+            lines.append(f"{role}: {clip(content)}")
+            continue
+        for block in content:
+            if not isinstance(block, dict):
+                continue
+            match block.get("type"):
+                case "text":
+                    lines.append(f"{role}: {clip(block['text'])}")
+                case "tool_use":
+                    lines.append(f"{role} called {block['name']}: {clip(json.dumps(block['input']))}")
+                case "tool_result":
+                    result = block.get("content", "")
+                    if not isinstance(result, str):
+                        result = json.dumps(result, default=str)
+                    lines.append(f"TOOL RESULT: {clip(result)}")
+    return "\n".join(lines)
@@ -1,6 +1,12 @@
+import atexit
+import threading
+import time
+import traceback
+from collections import deque
 from dataclasses import dataclass, field
 from typing import Annotated, Literal, Protocol, Union
 from pydantic import Field
+from tracing import trace_span
 
 
 # Strongly typed event classes with discriminated union
@@ -8,6 +14,7 @@ from pydantic import Field
 class ToolStartedEvent:
     tool_name: str
     input: dict
+    started_at: float = field(default_factory=time.time)  # unix timestamp
     type: Literal["tool_started"] = field(default="tool_started", repr=False)
 
 
@@ -15,6 +22,8 @@ class ToolStartedEvent:
 class ToolCompletedEvent:
     tool_name: str
     output: dict | None
+    wall_time: float | None = None  # seconds
+    cpu_time: float | None = None  # seconds of CPU used by the thread running the tool
     type: Literal["tool_completed"] = field(default="tool_completed", repr=False)
 
 
@@ -22,6 +31,8 @@ class ToolCompletedEvent:
 class ToolErrorEvent:
     tool_name: str
     error: str
+    wall_time: float | None = None
+    cpu_time: float | None = None
     type: Literal["tool_error"] = field(default="tool_error", repr=False)
 
 
@@ -31,6 +42,96 @@ class AssistantMessageEvent:
     type: Literal["assistant_message"] = field(default="assistant_message", repr=False)
 
 
+@dataclass
+class TextDeltaEvent:
+    index: int  # content block index within the message
+    text: str
+    type: Literal["text_delta"] = field(default="text_delta", repr=False)
+
+
+@dataclass
+class ThinkingDeltaEvent:
+    index: int
+    thinking: str
+    type: Literal["thinking_delta"] = field(default="thinking_delta", repr=False)
+
+
+@dataclass
+class ToolInputDeltaEvent:
+    tool_use_id: str
+    tool_name: str
+    partial_json: str
+    type: Literal["tool_input_delta"] = field(default="tool_input_delta", repr=False)
+
+
+@dataclass
+class CacheUsageEvent:
+    model: str
+    input_tokens: int  # uncached input tokens
+    cache_creation_input_tokens: int  # tokens written to the prompt cache
+    cache_read_input_tokens: int  # tokens served from the prompt cache
+    type: Literal["cache_usage"] = field(default="cache_usage", repr=False)
+
+
+@dataclass
+class LLMCallStartedEvent:
+    model: str
+    message_count: int  # messages sent, including the new one
+    started_at: float = field(default_factory=time.time)  # unix timestamp
+    type: Literal["llm_call_started"] = field(default="llm_call_started", repr=False)
+
+
+@dataclass
+class LLMCallCompletedEvent:
+    model: str
+    latency: float  # seconds from sending the request to the complete response
+    time_to_first_token: float | None  # seconds to the first content delta, streaming only
+    input_tokens: int  # uncached input tokens
+    output_tokens: int  # includes thinking tokens
+    thinking_tokens: int  # estimated from the thinking text, the API doesn't report them separately
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+    stop_reason: str | None
+    type: Literal["llm_call_completed"] = field(default="llm_call_completed", repr=False)
+
+
+@dataclass
+class ResponseCacheEvent:
+    model: str
+    key: str  # cache key of the request
+    hit: bool
+    type: Literal["response_cache"] = field(default="response_cache", repr=False)
+
+
+@dataclass
+class RequestScheduledEvent:
+    model: str
+    priority: int
+    attempt: int  # 1 for the first try
+    wait_time: float  # seconds spent queued for rate limits or backoff
+    queue_depth: int  # requests still waiting when this one was sent
+    type: Literal["request_scheduled"] = field(default="request_scheduled", repr=False)
+
+
+@dataclass
+class RequestRetryEvent:
+    model: str
+    attempt: int  # the attempt that failed
+    status_code: int | None  # None for connection errors
+    delay: float  # seconds before the next attempt
+    error: str
+    type: Literal["request_retry"] = field(default="request_retry", repr=False)
+
+
+@dataclass
+class ContextCompactedEvent:
+    messages_before: int
+    messages_after: int
+    tokens_before: int  # estimated
+    tokens_after: int  # estimated
+    type: Literal["context_compacted"] = field(default="context_compacted", repr=False)
+
+
 @dataclass
 class FileViewedEvent:
     path: str
@@ -61,6 +162,14 @@ class TodosUpdatedEvent:
     type: Literal["todos_updated"] = field(default="todos_updated", repr=False)
 
 
+@dataclass
+class SubAgentEvent:
+    """An event emitted by one job of a batched sub_agent call, tagged with its job id."""
+    job_id: str
+    event: "Event"
+    type: Literal["sub_agent_event"] = field(default="sub_agent_event", repr=False)
+
+
 # Discriminated union - type checker knows which fields are available
 Event = Annotated[
     Union[
@@ -68,11 +177,22 @@ Event = Annotated[
         ToolCompletedEvent,
         ToolErrorEvent,
         AssistantMessageEvent,
+        TextDeltaEvent,
+        ThinkingDeltaEvent,
+        ToolInputDeltaEvent,
+        CacheUsageEvent,
+        LLMCallStartedEvent,
+        LLMCallCompletedEvent,
+        ResponseCacheEvent,
+        RequestScheduledEvent,
+        RequestRetryEvent,
+        ContextCompactedEvent,
         FileViewedEvent,
         WebSearchErrorEvent,
         UnknownContentEvent,
         FinalOutputEvent,
         TodosUpdatedEvent,
+        SubAgentEvent,
     ],
     Field(discriminator="type"),
 ]
@@ -84,6 +204,35 @@ class EventHandler(Protocol):
     def handle(self, event: Event) -> None: ...
 
 
+class BatchEventHandler(EventHandler, Protocol):
+    """
+    Handlers can opt in to batched delivery by also defining handle_batch. With async
+    dispatch they then get every event drained from the queue in one call.
+    """
+
+    def handle_batch(self, events: list[Event]) -> None: ...
+
+
+BackpressurePolicy = Literal["block", "drop_oldest", "coalesce"]
+
+
+def coalesce_events(last: Event, event: Event) -> Event | None:
+    """Merge event into the queued event before it if both are deltas of the same block, else None."""
+    match (last, event):
+        case (TextDeltaEvent(), TextDeltaEvent()) if last.index == event.index:
+            return TextDeltaEvent(index=last.index, text=last.text + event.text)
+        case (ThinkingDeltaEvent(), ThinkingDeltaEvent()) if last.index == event.index:
+            return ThinkingDeltaEvent(index=last.index, thinking=last.thinking + event.thinking)
+        case (ToolInputDeltaEvent(), ToolInputDeltaEvent()) if last.tool_use_id == event.tool_use_id:
+            return ToolInputDeltaEvent(
+                tool_use_id=last.tool_use_id, tool_name=last.tool_name, partial_json=last.partial_json + event.partial_json
+            )
+        case (SubAgentEvent(), SubAgentEvent()) if last.job_id == event.job_id:
+            merged = coalesce_events(last.event, event.event)
+            return SubAgentEvent(job_id=last.job_id, event=merged) if merged is not None else None
+    return None
+
+
 class ConfirmationHandler(Protocol):
     """Protocol for confirmation callbacks - returns True to proceed, False to skip"""
 
@@ -99,11 +248,48 @@ class ConfirmationHandler(Protocol):
 
 
 class EventEmitter:
-    """Simple event emitter for agent/tool events"""
-
-    def __init__(self):
+    """
+    Simple event emitter for agent/tool events.
+
+    By default handlers run synchronously inside emit(). With async_dispatch, emit()
+    only queues the event and a dispatcher thread delivers it, so slow handlers (terminal
+    rendering, log shippers, network sinks) don't hold up the agent. The queue holds at
+    most queue_size events; when it is full `backpressure` decides what happens:
+    - "block": emit() waits for room
+    - "drop_oldest": the oldest queued event is discarded (counted in `dropped`)
+    - "coalesce": consecutive text/thinking/tool input deltas of the same block are
+      always merged while queued, and emit() blocks if the queue is still full
+    Confirmation requests stay synchronous, and flush the queue first so the prompt
+    comes after everything emitted before it. Queued events are flushed by close(),
+    which also runs at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        async_dispatch: bool = False,
+        queue_size: int = 1000,
+        backpressure: BackpressurePolicy = "block",
+        max_batch_size: int = 100,
+    ):
         self._handlers: list[EventHandler] = []
         self._confirmation_handler: ConfirmationHandler | None = None
+        # concurrent agents share one handler; only one confirmation prompt at a time
+        self._confirmation_lock = threading.Lock()
+
+        self.async_dispatch = async_dispatch
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.max_batch_size = max_batch_size
+        self.dropped = 0
+        self._queue: deque[Event] = deque()
+        self._in_flight = 0  # events taken off the queue but not yet delivered
+        self._cond = threading.Condition()
+        self._closed = False
+        self._dispatcher: threading.Thread | None = None
+        if async_dispatch:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="event-dispatcher", daemon=True)
+            self._dispatcher.start()
+            atexit.register(self.close)
 
     def add_handler(self, handler: EventHandler) -> None:
         """Register an event handler"""
@@ -119,8 +305,77 @@ class EventEmitter:
 
     def emit(self, event: Event) -> None:
         """Emit an event to all registered handlers"""
-        for handler in self._handlers:
-            handler.handle(event)
+        if self._dispatcher is not None:
+            with self._cond:
+                if not self._closed:
+                    self._enqueue(event)
+                    return
+        self._deliver([event])
+
+    def _enqueue(self, event: Event) -> None:
+        # called with self._cond held
+        if self.backpressure == "coalesce" and self._queue:
+            merged = coalesce_events(self._queue[-1], event)
+            if merged is not None:
+                self._queue[-1] = merged
+                return
+        if len(self._queue) >= self.queue_size:
+            if self.backpressure == "drop_oldest":
+                self._queue.popleft()
+                self.dropped += 1
+            elif threading.current_thread() is not self._dispatcher:
+                # the dispatcher keeps draining until the queue is empty, so this always ends
+                # (a handler emitting from the dispatcher itself can't wait on it)
+                self._cond.wait_for(lambda: len(self._queue) < self.queue_size)
+        self._queue.append(event)
+        self._cond.notify_all()
+
+    def _deliver(self, events: list[Event]) -> None:
+        for handler in list(self._handlers):
+            handle_batch = getattr(handler, "handle_batch", None)
+            if handle_batch is not None and len(events) > 1:
+                handle_batch(events)
+            else:
+                for event in events:
+                    handler.handle(event)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return  # closed and drained
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch_size))]
+                self._in_flight = len(batch)
+                self._cond.notify_all()  # room for blocked emitters
+            try:
+                self._deliver(batch)
+            except Exception:
+                # a failing handler must not kill the dispatcher
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued event has been delivered. Returns False on timeout."""
+        if self._dispatcher is None or threading.current_thread() is self._dispatcher:
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout=timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Deliver everything still queued and stop the dispatcher. Later events are delivered synchronously."""
+        if self._dispatcher is None or self._closed:
+            return
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._dispatcher.join(timeout)
+        # closed emitters (one per sub-agent job) shouldn't stay referenced until exit
+        atexit.unregister(self.close)
 
     def request_confirmation(
         self, tool_name: str, action: str, path: str | None, preview: str
@@ -129,6 +384,32 @@ class EventEmitter:
         if self._confirmation_handler is None:
             # Default: always approve if no handler set
             return (True, None)
-        return self._confirmation_handler.request_confirmation(
-            tool_name, action, path, preview
-        )
+        with trace_span(f"confirm {tool_name}", "confirmation", action=action, path=path or ""):
+            with self._confirmation_lock:
+                # show everything emitted so far before prompting
+                self.flush()
+                return self._confirmation_handler.request_confirmation(
+                    tool_name, action, path, preview
+                )
+
+
+class ScopedEventEmitter(EventEmitter):
+    """
+    Emitter for one sub-agent job. Events are forwarded to the parent emitter wrapped
+    in a SubAgentEvent so output from concurrent jobs can be told apart. Confirmations
+    go straight to the parent.
+    """
+
+    def __init__(self, parent: EventEmitter, job_id: str):
+        super().__init__()
+        self.parent = parent
+        self.job_id = job_id
+
+    def emit(self, event: Event) -> None:
+        super().emit(event)
+        self.parent.emit(SubAgentEvent(job_id=self.job_id, event=event))
+
+    def request_confirmation(
+        self, tool_name: str, action: str, path: str | None, preview: str
+    ) -> tuple[bool, str | None]:
+        return self.parent.request_confirmation(tool_name, action, path, preview)
@@ -1,35 +1,95 @@
+import atexit
 import sys
 import os
+import time
+from typing import Any
 import anthropic
 import dotenv
 from agent import Agent
+from context_manager import ContextManager
 from settings import SETTINGS, EditMode
 from tools import (
+    Tool,
     create_bash_tool,
+    create_bash_job_tool,
     create_glob_tool,
     create_grep_tool,
     create_ping_tool,
     create_read_file_tool,
     create_text_editor_tool,
+    create_multi_edit_tool,
+    create_apply_patch_tool,
     create_sub_agent_tool,
     create_write_todos_tool,
 )
 from tools.github_tool import create_pull_request_tool
+from tools.bash_pool import BashSessionPool
 from tools.sub_agent_tool import agent_types
 from app_state import AppState
 from events import EventEmitter, FinalOutputEvent
+from tracing import Tracer, set_tracer
+from cassette import CassetteWriter, RecordingClient, ReplayClient, stub_tools
+from response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+from session_store import SessionStore
+from scheduler import MAIN_PRIORITY, SUB_AGENT_PRIORITY, RequestScheduler, ScheduledClient
 from cli_handler import CLIEventHandler, CLIConfirmationHandler
 
 dotenv.load_dotenv()
 
 app_state = AppState()
-client = anthropic.Client()
+# retries are left to the scheduler, which coordinates them across agents
+api_client = anthropic.Client(max_retries=0)
+# one scheduler for every agent, since they share the API key's rate limits
+scheduler = RequestScheduler()
+
+# TOY_AGENT_RECORD=session.jsonl(.gz) records every model call to a cassette;
+# TOY_AGENT_REPLAY=session.jsonl(.gz) serves them back without the network, and with
+# TOY_AGENT_REPLAY_TOOLS=1 tools return their recorded results instead of running
+replay_client: ReplayClient | None = None
+cassette_writer: CassetteWriter | None = None
+if os.environ.get("TOY_AGENT_REPLAY"):
+    replay_client = ReplayClient(os.environ["TOY_AGENT_REPLAY"])
+elif os.environ.get("TOY_AGENT_RECORD"):
+    cassette_writer = CassetteWriter(os.environ["TOY_AGENT_RECORD"])
+    atexit.register(cassette_writer.close)
+
+
+def create_client(priority: int, agent_emitter: EventEmitter) -> Any:
+    """Client for one agent, rate limited by the shared scheduler at the agent's priority."""
+    if replay_client is not None:
+        return replay_client
+    client = ScheduledClient(api_client, scheduler, priority=priority, emitter=agent_emitter)
+    if cassette_writer is not None:
+        return RecordingClient(client, writer=cassette_writer)
+    return client
+
+# TOY_AGENT_RESPONSE_CACHE=sqlite (persistent, shared by reruns) or =memory serves
+# identical requests from a cache; TOY_AGENT_RESPONSE_CACHE_TTL sets the entry lifetime in seconds
+response_cache: ResponseCache | None = None
+if os.environ.get("TOY_AGENT_RESPONSE_CACHE"):
+    backend = MemoryCacheBackend() if os.environ["TOY_AGENT_RESPONSE_CACHE"] == "memory" else SQLiteCacheBackend()
+    response_cache = ResponseCache(backend, ttl=float(os.environ.get("TOY_AGENT_RESPONSE_CACHE_TTL", 24 * 60 * 60)))
 
 # Create event system
-emitter = EventEmitter()
-emitter.add_handler(CLIEventHandler(verbose=False))
+emitter = EventEmitter(async_dispatch=True, backpressure="coalesce")
+emitter.add_handler(CLIEventHandler(verbose=False, stream=True))
 emitter.set_confirmation_handler(CLIConfirmationHandler())
 
+# Set TOY_AGENT_TRACE to write a Chrome trace (open in Perfetto or chrome://tracing) on exit,
+# and/or TOY_AGENT_TRACE_OTLP to write the same spans as OTLP JSON
+trace_path = os.environ.get("TOY_AGENT_TRACE")
+otlp_trace_path = os.environ.get("TOY_AGENT_TRACE_OTLP")
+if trace_path or otlp_trace_path:
+    tracer = Tracer()
+    set_tracer(tracer)
+    if trace_path:
+        atexit.register(tracer.export_chrome_trace, trace_path)
+    if otlp_trace_path:
+        atexit.register(tracer.export_otlp, otlp_trace_path)
+
+# Pre-warmed shells for sub-agents, returned to the pool when each sub-agent finishes
+bash_pool = BashSessionPool()
+
 
 def load_prompt_file(prompt_name: str) -> str:
     """Load a prompt file from the prompts/ directory."""
@@ -61,61 +121,100 @@ def handle_prompt(prompt: str, agent: Agent) -> str:
                 edit_mode = prompt.split(" ")[2]
                 SETTINGS.edit_mode = EditMode(edit_mode)
                 return "Edit mode set to " + edit_mode
+        if command == "/stats":
+            return f"{agent.stats.summary()}\n{scheduler.summary()}"
+        if command == "/sessions" and agent.session_store is not None:
+            lines = [
+                f"{info.session_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(info.updated))}  {info.title or ''}"
+                for info in agent.session_store.list()[:20]
+            ]
+            return "\n".join(lines) or "No saved sessions"
+        if command == "/resume":
+            args = prompt.split()[1:]
+            if not args:
+                return "Usage: /resume <session id> (/sessions lists them)"
+            try:
+                agent.resume(args[0])
+            except ValueError as e:
+                return str(e)
+            return f"Resumed session {args[0]} ({len(agent.history)} messages)"
     return agent.run(prompt=prompt, max_iterations=None)
 
 
+def replayable(tools: list[Tool]) -> list[Tool]:
+    """The tools, or stubs serving recorded results when replaying with TOY_AGENT_REPLAY_TOOLS."""
+    if replay_client is not None and os.environ.get("TOY_AGENT_REPLAY_TOOLS"):
+        return stub_tools(tools, replay_client)
+    return tools
+
+
 def create_agent(agent_type: agent_types, agent_emitter: EventEmitter) -> Agent:
+    client = create_client(SUB_AGENT_PRIORITY, agent_emitter)
     if agent_type == "explore":
         return Agent(
             settings=SETTINGS,
             client=client,
-            tools=[
+            tools=replayable([
                 create_glob_tool(agent_emitter),
                 create_grep_tool(agent_emitter),
                 create_read_file_tool(agent_emitter),
-                create_bash_tool(agent_emitter),
-            ],
+                create_bash_tool(agent_emitter, pool=bash_pool),
+            ]),
             thinking_enabled=False,
             system_prompt=load_system_prompt(prompt_name="explore_agent"),
             model="claude-haiku-4-5",
-            emitter=agent_emitter
+            emitter=agent_emitter,
+            context_manager=ContextManager(client=client),
+            response_cache=response_cache
         )
     elif agent_type == "plan":
         return Agent(
             settings=SETTINGS,
             client=client,
-            tools=[
+            tools=replayable([
                 create_glob_tool(agent_emitter),
                 create_grep_tool(agent_emitter),
                 create_read_file_tool(agent_emitter),
-                create_bash_tool(agent_emitter),
-            ],
+                create_bash_tool(agent_emitter, pool=bash_pool),
+            ]),
             thinking_enabled=True,
             system_prompt=load_system_prompt(prompt_name="plan_agent"),
             model="claude-sonnet-4-5",
-            emitter=agent_emitter
+            emitter=agent_emitter,
+            context_manager=ContextManager(client=client),
+            response_cache=response_cache
         )
 
 
 if __name__ == "__main__":
+    client = create_client(MAIN_PRIORITY, emitter)
+    bash_tool = create_bash_tool(emitter)
     agent = Agent(
         settings=SETTINGS,
         client=client,
-        tools=[
+        tools=replayable([
             create_ping_tool(emitter),
             create_glob_tool(emitter),
             create_grep_tool(emitter),
             create_read_file_tool(emitter),
             create_text_editor_tool(emitter, SETTINGS),
-            create_bash_tool(emitter),
+            create_multi_edit_tool(emitter, SETTINGS),
+            create_apply_patch_tool(emitter, SETTINGS),
+            bash_tool,
+            create_bash_job_tool(emitter, bash_tool),
             create_sub_agent_tool(emitter, create_agent),
             create_write_todos_tool(emitter, app_state),
             create_pull_request_tool(emitter),
-        ],
+        ]),
         thinking_enabled=True,
         model="claude-opus-4-5",
         system_prompt=load_system_prompt(prompt_name="main_agent"),
-        emitter=emitter
+        emitter=emitter,
+        stream=True,
+        context_manager=ContextManager(client=client),
+        response_cache=response_cache,
+        # saved under $XDG_DATA_HOME/toy-agent/sessions; /sessions lists them, /resume <id> continues one
+        session_store=SessionStore()
     )
     if len(sys.argv) > 1:
         prompt = sys.argv[1]
@@ -124,7 +223,9 @@ if __name__ == "__main__":
     else:
         pass
     while True:
+        emitter.flush()
         prompt = input("> ")
         result = handle_prompt(prompt, agent)
         emitter.emit(FinalOutputEvent(result=result))
+        emitter.flush()
         print()  # Add newline after output
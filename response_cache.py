@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+from anthropic.types import Message
+
+# Request fields that decide the response. Cache breakpoints don't, so they are ignored.
+KEY_FIELDS = ("model", "system", "tools", "messages", "thinking", "tool_choice", "max_tokens")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_access ON responses (accessed);
+"""
+
+
+def _strip_cache_control(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip_cache_control(item) for key, item in value.items() if key != "cache_control"}
+    if isinstance(value, list):
+        return [_strip_cache_control(item) for item in value]
+    return value
+
+
+def _as_blocks(content: Any) -> Any:
+    # a plain string is the same request as a single text block (prompt caching sends the latter)
+    return [{"type": "text", "text": content}] if isinstance(content, str) else content
+
+
+def cache_key(params: dict[str, Any]) -> str:
+    """Canonical hash of the parts of a messages API request that determine the response."""
+    relevant = {name: params.get(name) for name in KEY_FIELDS}
+    relevant["system"] = _as_blocks(relevant["system"])
+    relevant["messages"] = [{**message, "content": _as_blocks(message["content"])} for message in relevant["messages"] or []]
+    canonical = json.dumps(_strip_cache_control(relevant), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CacheBackend(Protocol):
+    """Key-value store for cached responses. Backends evict by size on their own."""
+
+    def get(self, key: str) -> str | None: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryCacheBackend:
+    """In-process LRU, bounded by entry count and total size of the stored values."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self._bytes -= len(value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class SQLiteCacheBackend:
+    """
+    Persistent store in a SQLite file, shared across processes (e.g. CI reruns). When the
+    stored values exceed max_bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str | None = None, max_bytes: int = 256 * 1024 * 1024):
+        from tools.utils import get_cache_dir
+        self.path = path or os.path.join(get_cache_dir(), "responses.sqlite")
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock, self._db:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # walk from the least recently used entry until enough has been freed
+            excess = total - self.max_bytes
+            evict = []
+            for old_key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                if excess <= 0:
+                    break
+                evict.append((old_key,))
+                excess -= size
+            self._db.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    """
+    Opt-in cache of model responses keyed by cache_key(request), so identical requests
+    (reruns of a deterministic pipeline, retries after a crash) skip the API call.
+    Entries older than ttl seconds are treated as misses (None keeps them forever).
+    """
+
+    def __init__(self, backend: CacheBackend | None = None, ttl: float | None = 24 * 60 * 60):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, params: dict[str, Any], key: str | None = None) -> Message | None:
+        key = key or cache_key(params)
+        raw = self.backend.get(key)
+        entry = json.loads(raw) if raw is not None else None
+        if entry is not None and self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.backend.delete(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Message.model_validate(entry["response"])
+
+    def put(self, params: dict[str, Any], response: Message, key: str | None = None) -> None:
+        if response.stop_reason not in ("end_turn", "tool_use", "stop_sequence"):
+            # truncated or refused responses are worth asking for again
+            return
+        entry = {"created": time.time(), "response": response.model_dump(mode="json")}
+        self.backend.set(key or cache_key(params), json.dumps(entry, separators=(",", ":")))
@@ -0,0 +1,531 @@
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Mapping
+import anthropic
+from anthropic.types import Message, Usage
+from context_manager import CHARS_PER_TOKEN, estimate_message_tokens
+from events import EventEmitter, RequestRetryEvent, RequestScheduledEvent
+
+# Lower goes first: queued main agent requests are sent before queued sub-agent requests
+MAIN_PRIORITY = 0
+SUB_AGENT_PRIORITY = 1
+
+# Rate limited (429), overloaded (529) and transient server errors are retried
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+# Statuses that mean the model is saturated, so every request for it backs off, not just the failed one
+BACKOFF_STATUSES = {429, 529}
+
+# The API's limits are per minute, replenished continuously
+LIMIT_WINDOW = 60.0
+
+# Bucket name -> prefix of the API's -limit and -remaining headers
+RATE_LIMIT_HEADERS = {
+    "requests": "anthropic-ratelimit-requests",
+    "input_tokens": "anthropic-ratelimit-input-tokens",
+    "output_tokens": "anthropic-ratelimit-output-tokens",
+}
+
+# Async callers can't block on the scheduler's condition variable, so they poll
+ASYNC_POLL_INTERVAL = 0.05
+
+
+def estimate_request_tokens(params: dict[str, Any]) -> int:
+    """Cheap estimate of a request's input tokens: messages, system prompt and tool definitions."""
+    extra = json.dumps([params.get("system"), params.get("tools")], default=str)
+    return estimate_message_tokens(params["messages"]) + len(extra) // CHARS_PER_TOKEN
+
+
+def _retry_after(headers: Mapping[str, str]) -> float | None:
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after (seconds or an HTTP date)."""
+    if "retry-after-ms" in headers:
+        try:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Holds up to capacity tokens, refilled continuously at `rate` per second. Usage that is
+    only known after the fact (output tokens) may overdraw it, delaying later requests.
+    """
+
+    def __init__(self, capacity: float, tokens: float, rate: float, now: float):
+        self.capacity = capacity
+        self.tokens = tokens
+        self.rate = rate
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until amount tokens are available. Requests larger than the bucket wait for a full one."""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate if self.rate > 0 else LIMIT_WINDOW
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+    def sync(self, limit: float, remaining: float, rate: float, now: float) -> None:
+        """
+        Take in the server's view of the limit, which counts requests from every process
+        sharing the key. Responses can arrive out of order, so a higher remaining count than
+        ours may be stale and is ignored.
+        """
+        self._refill(now)
+        self.capacity = limit
+        self.rate = rate
+        self.tokens = min(self.tokens, remaining)
+
+
+@dataclass(eq=False)
+class _Ticket:
+    priority: int
+    seq: int
+    model: str
+    input_tokens: int
+    not_before: float  # monotonic time; set while backing off before a retry
+    enqueued: float = field(default_factory=time.monotonic)
+
+    def ahead_of(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+@dataclass
+class _ModelState:
+    # filled in from response headers; a limit we haven't seen yet doesn't hold requests back
+    buckets: dict[str, TokenBucket] = field(default_factory=dict)
+    blocked_until: float = 0.0  # monotonic time, after a 429 or 529
+    # after a 429/529, one request at a time is sent until one succeeds
+    probing: bool = False
+    in_flight: int = 0  # requests sent and waiting for response headers
+
+
+class RequestScheduler:
+    """
+    Coordinates model calls from every agent sharing an API key, so bursts from parallel
+    sub-agents queue up instead of overshooting the rate limits and failing.
+
+    For each model, requests wait until token buckets for requests, input tokens and output
+    tokens (sized from the API's anthropic-ratelimit-* response headers) have room. Queued
+    requests for a model are sent in priority order, then first come first served. Failed
+    requests are retried with jittered exponential backoff, or after retry-after when the
+    server sends it; a 429 or 529 pauses every request for that model, not just the one
+    that failed. Clients should be created with max_retries=0 so retries aren't doubled.
+    """
+
+    def __init__(self, max_retries: int = 8, base_delay: float = 1.0, max_delay: float = 60.0, window: float = LIMIT_WINDOW):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window = window  # seconds for a bucket to refill from empty
+        self._cond = threading.Condition()
+        self._queue: list[_Ticket] = []
+        self._seq = itertools.count()
+        self._models: dict[str, _ModelState] = defaultdict(_ModelState)
+        # metrics
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _enqueue(self, model: str, input_tokens: int, priority: int, not_before: float) -> _Ticket:
+        ticket = _Ticket(priority, next(self._seq), model, input_tokens, not_before)
+        with self._cond:
+            self._queue.append(ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        return ticket
+
+    def _wait_time(self, ticket: _Ticket) -> float | None:
+        """Seconds until ticket can be sent (0.0 to send now), or None to wait for another request to be sent or answered."""
+        now = time.monotonic()
+        if any(
+            other.model == ticket.model and other.not_before <= now and other.ahead_of(ticket)
+            for other in self._queue
+        ):
+            return None
+        state = self._models[ticket.model]
+        if state.probing and state.in_flight:
+            return None
+        delays = [ticket.not_before - now, state.blocked_until - now]
+        # output tokens are charged once known, so only wait while they are overdrawn
+        for name, amount in (("requests", 1), ("input_tokens", ticket.input_tokens), ("output_tokens", 1)):
+            bucket = state.buckets.get(name)
+            if bucket is not None:
+                delays.append(bucket.delay(amount, now))
+        return max(0.0, *delays)
+
+    def _admit(self, ticket: _Ticket) -> tuple[float, int]:
+        """Take ticket off the queue and charge its request. Returns its wait time and the remaining queue depth."""
+        now = time.monotonic()
+        self._queue.remove(ticket)
+        state = self._models[ticket.model]
+        state.in_flight += 1
+        if "requests" in state.buckets:
+            state.buckets["requests"].take(1, now)
+        if "input_tokens" in state.buckets:
+            state.buckets["input_tokens"].take(ticket.input_tokens, now)
+        wait = now - ticket.enqueued
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._cond.notify_all()
+        return wait, len(self._queue)
+
+    def _leave(self, ticket: _Ticket) -> None:
+        # the caller gave up (e.g. interrupted) while queued
+        with self._cond:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def _abandoned(self, model: str) -> None:
+        # the caller gave up (e.g. interrupted or cancelled) while its request was in flight;
+        # if it was the probe after a 429/529, the next request probes instead
+        with self._cond:
+            state = self._models[model]
+            state.in_flight -= 1
+            state.probing = False
+            self._cond.notify_all()
+
+    def _sync_limits(self, state: _ModelState, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        for name, prefix in RATE_LIMIT_HEADERS.items():
+            try:
+                limit = float(headers[f"{prefix}-limit"])
+                remaining = float(headers[f"{prefix}-remaining"])
+            except (KeyError, ValueError):
+                continue
+            rate = limit / self.window
+            bucket = state.buckets.get(name)
+            if bucket is None:
+                state.buckets[name] = TokenBucket(limit, remaining, rate, now)
+            else:
+                bucket.sync(limit, remaining, rate, now)
+
+    def _succeeded(self, model: str, headers: Mapping[str, str]) -> None:
+        with self._cond:
+            state = self._models[model]
+            state.in_flight -= 1
+            state.probing = False
+            self._sync_limits(state, headers)
+            self._cond.notify_all()
+
+    def _failed(self, model: str, error: Exception, attempt: int) -> float | None:
+        """Record a failed attempt. Returns the delay before retrying, or None if it shouldn't be retried."""
+        status = error.status_code if isinstance(error, anthropic.APIStatusError) else None
+        headers = error.response.headers if isinstance(error, anthropic.APIStatusError) else {}
+        retryable = isinstance(error, anthropic.APIConnectionError) or status in RETRY_STATUSES
+        with self._cond:
+            state = self._models[model]
+            state.in_flight -= 1
+            self._sync_limits(state, headers)
+            self._cond.notify_all()
+            if not retryable or attempt > self.max_retries:
+                return None
+            retry_after = _retry_after(headers)
+            if retry_after is not None:
+                # honor the server, with a little jitter so queued requests don't all return at once
+                delay = retry_after + random.uniform(0, self.base_delay / 2)
+            else:
+                backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                delay = random.uniform(backoff / 2, backoff)
+            if status in BACKOFF_STATUSES:
+                self.rate_limited += 1
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+                state.probing = True
+            self.retries += 1
+            return delay
+
+    def _emit(self, emitter: EventEmitter | None, event: Any) -> None:
+        if emitter is not None:
+            emitter.emit(event)
+
+    def call(
+        self,
+        send: Callable[[], tuple[Any, Mapping[str, str]]],
+        model: str,
+        input_tokens: int,
+        priority: int = MAIN_PRIORITY,
+        emitter: EventEmitter | None = None,
+    ) -> Any:
+        """
+        Run send() when the rate limits allow, retrying failures. send makes the request and
+        returns its result and response headers; it is called again for each retry.
+        """
+        not_before = 0.0
+        for attempt in itertools.count(1):
+            ticket = self._enqueue(model, input_tokens, priority, not_before)
+            with self._cond:
+                try:
+                    while (delay := self._wait_time(ticket)) != 0:
+                        self._cond.wait(delay)
+                except BaseException:
+                    self._leave(ticket)
+                    raise
+                wait, queue_depth = self._admit(ticket)
+            self._emit(emitter, RequestScheduledEvent(
+                model=model, priority=priority, attempt=attempt, wait_time=wait, queue_depth=queue_depth
+            ))
+            try:
+                result, headers = send()
+            except Exception as e:
+                retry_delay = self._failed(model, e, attempt)
+                if retry_delay is None:
+                    raise
+                self._emit(emitter, RequestRetryEvent(
+                    model=model, attempt=attempt, status_code=getattr(e, "status_code", None), delay=retry_delay, error=str(e)
+                ))
+                not_before = time.monotonic() + retry_delay
+                continue
+            except BaseException:
+                self._abandoned(model)
+                raise
+            self._succeeded(model, headers)
+            return result
+
+    async def acall(
+        self,
+        send: Callable[[], Awaitable[tuple[Any, Mapping[str, str]]]],
+        model: str,
+        input_tokens: int,
+        priority: int = MAIN_PRIORITY,
+        emitter: EventEmitter | None = None,
+    ) -> Any:
+        """Async version of call(), sharing the same queue and limits."""
+        not_before = 0.0
+        for attempt in itertools.count(1):
+            ticket = self._enqueue(model, input_tokens, priority, not_before)
+            try:
+                while True:
+                    with self._cond:
+                        delay = self._wait_time(ticket)
+                        if delay == 0:
+                            wait, queue_depth = self._admit(ticket)
+                            break
+                    await asyncio.sleep(ASYNC_POLL_INTERVAL if delay is None else min(delay, ASYNC_POLL_INTERVAL))
+            except BaseException:
+                self._leave(ticket)
+                raise
+            self._emit(emitter, RequestScheduledEvent(
+                model=model, priority=priority, attempt=attempt, wait_time=wait, queue_depth=queue_depth
+            ))
+            try:
+                result, headers = await send()
+            except Exception as e:
+                retry_delay = self._failed(model, e, attempt)
+                if retry_delay is None:
+                    raise
+                self._emit(emitter, RequestRetryEvent(
+                    model=model, attempt=attempt, status_code=getattr(e, "status_code", None), delay=retry_delay, error=str(e)
+                ))
+                not_before = time.monotonic() + retry_delay
+                continue
+            except BaseException:
+                self._abandoned(model)
+                raise
+            self._succeeded(model, headers)
+            return result
+
+    def observe_usage(self, model: str, usage: Usage) -> None:
+        """Charge output tokens of a streamed response, whose headers arrived before the output was generated."""
+        with self._cond:
+            bucket = self._models[model].buckets.get("output_tokens")
+            if bucket is not None:
+                bucket.take(usage.output_tokens, time.monotonic())
+
+    def metrics(self) -> dict[str, float | int]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": sum(state.in_flight for state in self._models.values()),
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "total_wait": self.total_wait,
+                "mean_wait": self.total_wait / self.requests if self.requests else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def summary(self) -> str:
+        metrics = self.metrics()
+        return (
+            f"API requests: {metrics['requests']} sent, {metrics['retries']} retried "
+            f"({metrics['rate_limited']} rate limited or overloaded)\n"
+            f"Queue: {metrics['queue_depth']} waiting (max {metrics['max_queue_depth']}), "
+            f"{metrics['mean_wait']:.2f}s mean wait, {metrics['max_wait']:.2f}s max"
+        )
+
+
+class _ScheduledStream:
+    def __init__(self, client: "ScheduledClient", params: dict[str, Any]):
+        self._client = client
+        self._params = params
+        self._manager: Any = None
+        self._stream: Any = None
+
+    def _open(self) -> tuple[tuple[Any, Any], Mapping[str, str]]:
+        manager = self._client.client.messages.stream(**self._params)
+        stream = manager.__enter__()
+        response = getattr(stream, "response", None)
+        return (manager, stream), response.headers if response is not None else {}
+
+    def __enter__(self) -> "_ScheduledStream":
+        # only opening the stream is retried; once events arrive, errors go to the caller
+        self._manager, self._stream = self._client.scheduler.call(
+            self._open,
+            model=self._params["model"],
+            input_tokens=estimate_request_tokens(self._params),
+            priority=self._client.priority,
+            emitter=self._client.emitter
+        )
+        return self
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self._manager.__exit__(*exc_info)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._stream)
+
+    def get_final_message(self) -> Message:
+        message = self._stream.get_final_message()
+        self._client.scheduler.observe_usage(self._params["model"], message.usage)
+        return message
+
+
+class _ScheduledMessages:
+    def __init__(self, client: "ScheduledClient"):
+        self._client = client
+
+    def _create(self, params: dict[str, Any]) -> tuple[Message, Mapping[str, str]]:
+        messages = self._client.client.messages
+        if not hasattr(messages, "with_raw_response"):
+            # stand-in clients (FakeClient, ReplayClient) have no headers
+            return messages.create(**params), {}
+        raw = messages.with_raw_response.create(**params)
+        return raw.parse(), raw.headers
+
+    def create(self, **params: Any) -> Message:
+        return self._client.scheduler.call(
+            lambda: self._create(params),
+            model=params["model"],
+            input_tokens=estimate_request_tokens(params),
+            priority=self._client.priority,
+            emitter=self._client.emitter
+        )
+
+    def stream(self, **params: Any) -> _ScheduledStream:
+        return _ScheduledStream(self._client, params)
+
+
+class ScheduledClient:
+    """
+    Wraps an anthropic.Client so messages.create/stream go through a shared RequestScheduler.
+    Each agent gets its own wrapper carrying its priority and event emitter.
+    """
+
+    def __init__(self, client: Any, scheduler: RequestScheduler, priority: int = MAIN_PRIORITY, emitter: EventEmitter | None = None):
+        self.client = client
+        self.scheduler = scheduler
+        self.priority = priority
+        self.emitter = emitter
+        self.messages = _ScheduledMessages(self)
+
+
+class _AsyncScheduledStream:
+    def __init__(self, client: "AsyncScheduledClient", params: dict[str, Any]):
+        self._client = client
+        self._params = params
+        self._manager: Any = None
+        self._stream: Any = None
+
+    async def _open(self) -> tuple[tuple[Any, Any], Mapping[str, str]]:
+        manager = self._client.client.messages.stream(**self._params)
+        stream = await manager.__aenter__()
+        response = getattr(stream, "response", None)
+        return (manager, stream), response.headers if response is not None else {}
+
+    async def __aenter__(self) -> "_AsyncScheduledStream":
+        self._manager, self._stream = await self._client.scheduler.acall(
+            self._open,
+            model=self._params["model"],
+            input_tokens=estimate_request_tokens(self._params),
+            priority=self._client.priority,
+            emitter=self._client.emitter
+        )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> Any:
+        return await self._manager.__aexit__(*exc_info)
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._stream.__aiter__()
+
+    async def get_final_message(self) -> Message:
+        message = await self._stream.get_final_message()
+        self._client.scheduler.observe_usage(self._params["model"], message.usage)
+        return message
+
+
+class _AsyncScheduledMessages:
+    def __init__(self, client: "AsyncScheduledClient"):
+        self._client = client
+
+    async def _create(self, params: dict[str, Any]) -> tuple[Message, Mapping[str, str]]:
+        raw = await self._client.client.messages.with_raw_response.create(**params)
+        return raw.parse(), raw.headers
+
+    async def create(self, **params: Any) -> Message:
+        return await self._client.scheduler.acall(
+            lambda: self._create(params),
+            model=params["model"],
+            input_tokens=estimate_request_tokens(params),
+            priority=self._client.priority,
+            emitter=self._client.emitter
+        )
+
+    def stream(self, **params: Any) -> _AsyncScheduledStream:
+        return _AsyncScheduledStream(self._client, params)
+
+
+class AsyncScheduledClient:
+    """ScheduledClient for anthropic.AsyncAnthropic, for AsyncAgent. Shares queues and limits with sync clients on the same scheduler."""
+
+    def __init__(self, client: Any, scheduler: RequestScheduler, priority: int = MAIN_PRIORITY, emitter: EventEmitter | None = None):
+        self.client = client
+        self.scheduler = scheduler
+        self.priority = priority
+        self.emitter = emitter
+        self.messages = _AsyncScheduledMessages(self)
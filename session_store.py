@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+from anthropic.types import MessageParam
+
+# Tool results longer than this are stored in a blob file instead of the log
+BLOB_THRESHOLD = 1024
+
+LOG_FILE = "log.jsonl"
+HEAD_FILE = "head"  # byte offset of the latest "replace" record in the log
+META_FILE = "meta.json"
+BLOB_DIR = "blobs"
+
+
+# Result given to tool calls that were still running when the session ended
+INTERRUPTED_TOOL_ERROR = "Interrupted: the session ended before this tool call finished. It may have partly run."
+
+
+@dataclass
+class SessionInfo:
+    session_id: str
+    created: float  # unix timestamp
+    updated: float  # last write to the log
+    model: str | None
+    title: str | None  # start of the first prompt
+
+
+def _write_file(path: str, data: bytes) -> None:
+    # rename into place so a crash never leaves a half-written file
+    temp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def _drop_torn_line(log_path: str) -> None:
+    """Truncate a partial last line left by a crash mid-write, so new records start on a fresh line."""
+    try:
+        log = open(log_path, "r+b")
+    except FileNotFoundError:
+        return
+    with log:
+        end = log.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 65536)
+            log.seek(start)
+            chunk = log.read(pos - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                if start + newline + 1 != end:
+                    log.truncate(start + newline + 1)
+                return
+            pos = start
+        log.truncate(0)
+
+
+def _interrupted_tool_results(history: list[MessageParam]) -> MessageParam | None:
+    """
+    Error results for the tool calls of a trailing assistant message, which is left without
+    results when the process dies (or is interrupted) while its tools run. The API rejects
+    a tool_use that isn't followed by its tool_result, so the session couldn't continue.
+    """
+    if not history or history[-1]["role"] != "assistant" or isinstance(history[-1]["content"], str):
+        return None
+    tool_ids = [
+        block["id"] for block in history[-1]["content"]
+        if isinstance(block, dict) and block.get("type") == "tool_use"
+    ]
+    if not tool_ids:
+        return None
+    return MessageParam(role="user", content=[
+        {"type": "tool_result", "tool_use_id": tool_id, "is_error": True, "content": json.dumps({"error": INTERRUPTED_TOOL_ERROR})}
+        for tool_id in tool_ids
+    ])
+
+
+def _read_info(path: str, session_id: str) -> SessionInfo:
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    log_path = os.path.join(path, LOG_FILE)
+    return SessionInfo(
+        session_id=session_id,
+        created=meta["created"],
+        updated=os.path.getmtime(log_path) if os.path.exists(log_path) else meta["created"],
+        model=meta.get("model"),
+        title=meta.get("title")
+    )
+
+
+class Session:
+    """
+    One persisted conversation. History is kept as an append-only JSONL log: each new
+    message is one appended line, and only compaction (which rewrites history) writes
+    the whole history again, as a "replace" record whose offset is kept in `head`.
+    Loading reads the log from that offset, so it costs the same however long ago the
+    session started. Large tool results are stored once per distinct payload in blobs/
+    and referenced from the log.
+    """
+
+    def __init__(self, path: str, session_id: str):
+        self.path = path
+        self.session_id = session_id
+        log_path = os.path.join(path, LOG_FILE)
+        _drop_torn_line(log_path)
+        self._log = open(log_path, "ab")
+        self._lock = threading.Lock()
+        self._titled = self.info().title is not None
+
+    def info(self) -> SessionInfo:
+        return _read_info(self.path, self.session_id)
+
+    def _store_blob(self, content: str) -> str:
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        path = os.path.join(self.path, BLOB_DIR, f"{digest}.json")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_file(path, content.encode())
+        return digest
+
+    def _load_blob(self, digest: str) -> str:
+        with open(os.path.join(self.path, BLOB_DIR, f"{digest}.json"), encoding="utf-8") as f:
+            return f.read()
+
+    def _out_of_line(self, message: MessageParam) -> dict:
+        content = message["content"]
+        if isinstance(content, str):
+            return dict(message)
+        blocks: list[Any] = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "tool_result" \
+                    and isinstance(block.get("content"), str) and len(block["content"]) > BLOB_THRESHOLD:  # type: ignore[arg-type]
+                block = {**block, "content": {"$blob": self._store_blob(block["content"])}}  # type: ignore[typeddict-item]
+            blocks.append(block)
+        return {**message, "content": blocks}
+
+    def _inline(self, message: dict, blobs: dict[str, str]) -> MessageParam:
+        content = message["content"]
+        if isinstance(content, list):
+            for block in content:
+                if isinstance(block, dict) and isinstance(block.get("content"), dict) and "$blob" in block["content"]:
+                    digest = block["content"]["$blob"]
+                    if digest not in blobs:
+                        blobs[digest] = self._load_blob(digest)
+                    block["content"] = blobs[digest]
+        return MessageParam(**message)  # type: ignore[typeddict-item]
+
+    def _write_record(self, record: dict) -> int:
+        """Append one record and return its offset in the log."""
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str).encode() + b"\n"
+        offset = self._log.tell()
+        self._log.write(line)
+        self._log.flush()
+        return offset
+
+    def append(self, message: MessageParam) -> None:
+        with self._lock:
+            self._write_record({"op": "append", "message": self._out_of_line(message)})
+            if not self._titled and message["role"] == "user" and isinstance(message["content"], str):
+                self._set_title(message["content"])
+
+    def replace(self, messages: list[MessageParam]) -> None:
+        """Record that history was rewritten (e.g. compacted) to messages."""
+        with self._lock:
+            offset = self._write_record({"op": "replace", "messages": [self._out_of_line(m) for m in messages]})
+            _write_file(os.path.join(self.path, HEAD_FILE), str(offset).encode())
+
+    def _set_title(self, prompt: str) -> None:
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta["title"] = " ".join(prompt.split())[:80]
+        _write_file(meta_path, json.dumps(meta).encode())
+        self._titled = True
+
+    def load(self) -> list[MessageParam]:
+        """
+        The current history: the latest replace record plus every message appended after it.
+        Tool calls left unanswered by a crash get error results, which are also appended to
+        the log so later loads see the same history.
+        """
+        try:
+            with open(os.path.join(self.path, HEAD_FILE)) as f:
+                offset = int(f.read() or 0)
+        except FileNotFoundError:
+            offset = 0
+        records = []
+        with open(os.path.join(self.path, LOG_FILE), "rb") as log:
+            log.seek(offset)
+            for line in log:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a line torn by a crash mid-write; nothing after it was written
+                    break
+        history: list[MessageParam] = []
+        blobs: dict[str, str] = {}  # repeated payloads (e.g. the same file read twice) are read once
+        for record in records:
+            if record["op"] == "replace":
+                history = [self._inline(message, blobs) for message in record["messages"]]
+            else:
+                history.append(self._inline(record["message"], blobs))
+        interrupted = _interrupted_tool_results(history)
+        if interrupted is not None:
+            self.append(interrupted)
+            history.append(interrupted)
+        return history
+
+    def close(self) -> None:
+        with self._lock:
+            self._log.close()
+
+
+class SessionStore:
+    """Directory of saved sessions, one subdirectory per session id."""
+
+    def __init__(self, root: str | None = None):
+        from tools.utils import get_data_dir
+        self.root = root or os.path.join(get_data_dir(), "sessions")
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, model: str | None = None) -> Session:
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        path = os.path.join(self.root, session_id)
+        os.makedirs(path)
+        _write_file(os.path.join(path, META_FILE), json.dumps({"created": time.time(), "model": model, "title": None}).encode())
+        return Session(path, session_id)
+
+    def open(self, session_id: str) -> Session:
+        path = os.path.join(self.root, session_id)
+        if os.sep in session_id or not os.path.exists(os.path.join(path, META_FILE)):
+            raise ValueError(f"No session {session_id!r} in {self.root}")
+        return Session(path, session_id)
+
+    def list(self) -> list[SessionInfo]:
+        """Saved sessions, most recently updated first. Only reads each session's metadata."""
+        sessions = []
+        for session_id in os.listdir(self.root):
+            path = os.path.join(self.root, session_id)
+            if os.path.exists(os.path.join(path, META_FILE)):
+                sessions.append(_read_info(path, session_id))
+        return sorted(sessions, key=lambda info: -info.updated)
@@ -0,0 +1,69 @@
+import threading
+from dataclasses import dataclass, field
+from events import LLMCallCompletedEvent
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    wall_time: float = 0.0  # seconds
+    cpu_time: float = 0.0  # seconds, sync calls only
+
+
+@dataclass
+class AgentStats:
+    """
+    Cumulative counters for one agent, updated after every model call and tool call.
+    Tool calls may run concurrently, so updates take a lock.
+    """
+    llm_calls: int = 0
+    llm_time: float = 0.0  # seconds spent waiting on the model
+    input_tokens: int = 0  # uncached
+    output_tokens: int = 0
+    thinking_tokens: int = 0  # estimated, also counted in output_tokens
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    tools: dict[str, ToolStats] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def tool_calls(self) -> int:
+        return sum(tool.calls for tool in self.tools.values())
+
+    @property
+    def tool_time(self) -> float:
+        return sum(tool.wall_time for tool in self.tools.values())
+
+    def record_llm_call(self, event: LLMCallCompletedEvent) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_time += event.latency
+            self.input_tokens += event.input_tokens
+            self.output_tokens += event.output_tokens
+            self.thinking_tokens += event.thinking_tokens
+            self.cache_creation_input_tokens += event.cache_creation_input_tokens
+            self.cache_read_input_tokens += event.cache_read_input_tokens
+
+    def record_tool_call(self, tool_name: str, success: bool, wall_time: float | None, cpu_time: float | None) -> None:
+        with self._lock:
+            tool = self.tools.setdefault(tool_name, ToolStats())
+            tool.calls += 1
+            tool.errors += not success
+            tool.wall_time += wall_time or 0.0
+            tool.cpu_time += cpu_time or 0.0
+
+    def summary(self) -> str:
+        with self._lock:
+            lines = [
+                f"LLM calls: {self.llm_calls} ({self.llm_time:.1f}s)",
+                f"Tokens: {self.input_tokens} in, {self.output_tokens} out (~{self.thinking_tokens} thinking), "
+                f"{self.cache_read_input_tokens} cache read, {self.cache_creation_input_tokens} cache written",
+                f"Tool calls: {self.tool_calls} ({self.tool_time:.1f}s)",
+            ]
+            for name, tool in sorted(self.tools.items(), key=lambda item: -item[1].wall_time):
+                errors = f", {tool.errors} failed" if tool.errors else ""
+                lines.append(f"  {name}: {tool.calls} calls{errors}, {tool.wall_time:.2f}s wall, {tool.cpu_time:.2f}s cpu")
+            return "\n".join(lines)
@@ -0,0 +1,118 @@
+import pytest
+from events import EventEmitter
+from settings import EditMode, Settings
+from tools.apply_patch_tool import ApplyPatchTool, apply_hunks, parse_unified_diff
+
+PATCH = """diff --git a/app.py b/app.py
+--- a/app.py
++++ b/app.py
+@@ -1,3 +1,3 @@
+ import os
+-name = "old"
++name = "new"
+ print(name)
+--- /dev/null
++++ b/notes.txt
+@@ -0,0 +1,2 @@
++first
++second
+\\ No newline at end of file
+"""
+
+
+@pytest.fixture
+def tool(tmp_path, monkeypatch):
+    monkeypatch.setattr("tools.utils.get_project_root", lambda: str(tmp_path))
+    settings = Settings()
+    settings.edit_mode = EditMode.ALWAYS
+    return ApplyPatchTool(emitter=EventEmitter(), settings=settings)
+
+
+def config(lines: int) -> str:
+    return "".join(f"option_{n} = {n}\n" for n in range(1, lines + 1))
+
+
+def test_parse_unified_diff():
+    diffs = parse_unified_diff(PATCH)
+    assert [(diff.old_path, diff.new_path) for diff in diffs] == [("app.py", "app.py"), (None, "notes.txt")]
+    edit, create = diffs[0].hunks[0], diffs[1].hunks[0]
+    assert edit.old_start == 1
+    assert edit.lines == [(" ", "import os"), ("-", 'name = "old"'), ("+", 'name = "new"'), (" ", "print(name)")]
+    assert create.lines == [("+", "first"), ("+", "second")]
+    assert create.new_no_newline and not create.old_no_newline
+
+
+def test_parse_rejects_truncated_hunk():
+    with pytest.raises(ValueError, match="truncated"):
+        parse_unified_diff("--- a/x\n+++ b/x\n@@ -1,3 +1,3 @@\n a\n-b\n")
+
+
+def test_hunks_apply_after_drift():
+    # two lines were added at the top since the diff was made
+    content = "# header\n# header\n" + config(20)
+    patch = "--- a/c\n+++ b/c\n@@ -9,3 +9,3 @@\n option_9 = 9\n-option_10 = 10\n+option_10 = 0\n option_11 = 11\n"
+    result = apply_hunks(content, parse_unified_diff(patch)[0].hunks, "c")
+    assert result == content.replace("option_10 = 10", "option_10 = 0")
+
+
+def test_hunk_not_matched_before_previous_hunk():
+    lines = config(60).splitlines(keepends=True)
+    lines[0] = "retry = 1\n"  # matches the second hunk, but before the first one
+    lines[49] = "retry = 2\n"  # the line the second hunk expects has already changed
+    patch = (
+        "--- a/c\n+++ b/c\n"
+        "@@ -10,1 +10,1 @@\n-option_10 = 10\n+option_10 = 0\n"
+        "@@ -50,1 +50,1 @@\n-retry = 1\n+retry = 3\n"
+    )
+    with pytest.raises(ValueError, match="hunk 2"):
+        apply_hunks("".join(lines), parse_unified_diff(patch)[0].hunks, "c")
+
+
+def test_hunk_not_matched_far_from_its_line():
+    patch = "--- a/c\n+++ b/c\n@@ -1,1 +1,1 @@\n-option_500 = 500\n+option_500 = 0\n"
+    with pytest.raises(ValueError, match="hunk 1"):
+        apply_hunks(config(500), parse_unified_diff(patch)[0].hunks, "c")
+
+
+def test_patch_applies(tool, tmp_path):
+    (tmp_path / "app.py").write_text('import os\nname = "old"\nprint(name)\n')
+    result = tool.execute({"patch": PATCH})
+    assert result.success, result.error
+    assert (tmp_path / "app.py").read_text() == 'import os\nname = "new"\nprint(name)\n'
+    assert (tmp_path / "notes.txt").read_text() == "first\nsecond"
+
+
+def test_nothing_written_when_a_hunk_fails(tool, tmp_path):
+    (tmp_path / "app.py").write_text('import os\nname = "other"\nprint(name)\n')
+    result = tool.execute({"patch": PATCH})
+    assert not result.success
+    assert "hunk 1" in (result.error or "")
+    assert not (tmp_path / "notes.txt").exists()
+
+
+def test_structured_changes(tool, tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\ny = 2\n")
+    (tmp_path / "old.py").write_text("gone\n")
+    result = tool.execute({"changes": [
+        {"path": "a.py", "edits": [{"command": "str_replace", "old_str": "x = 1", "new_str": "x = 10"}]},
+        {"path": "pkg/b.py", "action": "create", "content": "z = 3\n"},
+        {"path": "old.py", "action": "delete"},
+    ]})
+    assert result.success, result.error
+    assert (tmp_path / "a.py").read_text() == "x = 10\ny = 2\n"
+    assert (tmp_path / "pkg" / "b.py").read_text() == "z = 3\n"
+    assert not (tmp_path / "old.py").exists()
+
+
+def test_failed_write_rolls_back(tool, tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    (tmp_path / "blocker").write_text("a file, so no directory can be made here\n")
+    result = tool.execute({"changes": [
+        {"path": "new/sub/c.py", "action": "create", "content": "c\n"},
+        {"path": "a.py", "edits": [{"command": "str_replace", "old_str": "x = 1", "new_str": "x = 2"}]},
+        {"path": "blocker/d.py", "action": "create", "content": "d\n"},
+    ]})
+    assert not result.success
+    assert "rolled back" in (result.error or "")
+    assert (tmp_path / "a.py").read_text() == "x = 1\n"
+    assert not (tmp_path / "new").exists()
@@ -0,0 +1,89 @@
+import asyncio
+import time
+import anthropic
+import pytest
+from pydantic import BaseModel
+from async_agent import AsyncAgent
+from events import EventEmitter
+from settings import Settings
+from tools import Tool
+from benchmarks.fake_client import text_response, tool_use_response
+from benchmarks.fake_server import FakeAPIServer
+
+
+class WaitInput(BaseModel):
+    seconds: float
+
+
+class WaitOutput(BaseModel):
+    waited: float
+
+
+def create_async_wait_tool(emitter: EventEmitter, running: list[int]) -> Tool:
+    active = [0]
+
+    def run(input: WaitInput) -> WaitOutput:
+        raise AssertionError("the async agent should await arun")
+
+    async def arun(input: WaitInput) -> WaitOutput:
+        active[0] += 1
+        running.append(active[0])
+        await asyncio.sleep(input.seconds)
+        active[0] -= 1
+        return WaitOutput(waited=input.seconds)
+
+    return Tool(
+        tool_name="wait",
+        description="Waits",
+        input_schema=WaitInput,
+        output_schema=WaitOutput,
+        run=run,
+        arun=arun,
+        emitter=emitter,
+        parallel_safe=True
+    )
+
+
+def create_agent(server: FakeAPIServer, tools: list[Tool] | None = None) -> AsyncAgent:
+    client = anthropic.AsyncAnthropic(api_key="fake", base_url=server.base_url, max_retries=0)
+    return AsyncAgent(settings=Settings(), client=client, tools=tools, thinking_enabled=False)
+
+
+def test_async_tools_are_awaited_concurrently():
+    emitter = EventEmitter()
+    running: list[int] = []
+    calls = [("wait", {"seconds": 0.2}) for _ in range(3)]
+    with FakeAPIServer([tool_use_response(*calls), text_response("Done")]) as server:
+        agent = create_agent(server, [create_async_wait_tool(emitter, running)])
+        start = time.monotonic()
+        assert asyncio.run(agent.arun("Wait")) == "Done"
+        elapsed = time.monotonic() - start
+    assert max(running) == 3
+    assert elapsed < 0.5
+    assert [block["tool_use_id"] for block in agent.history[2]["content"]] == [
+        block["id"] for block in agent.history[1]["content"]
+    ]
+
+
+def test_agents_share_one_event_loop():
+    async def run_all(server: FakeAPIServer) -> list[str]:
+        agents = [create_agent(server) for _ in range(5)]
+        return await asyncio.gather(*(agent.arun(f"Task {n}") for n, agent in enumerate(agents)))
+
+    def echo_prompt(params):
+        # with prompt caching the prompt is sent as a text block
+        return text_response(params["messages"][0]["content"][0]["text"])
+
+    with FakeAPIServer(echo_prompt, latency=0.3) as server:
+        start = time.monotonic()
+        assert asyncio.run(run_all(server)) == [f"Task {n}" for n in range(5)]
+        elapsed = time.monotonic() - start
+    # the five calls overlap instead of taking 1.5 seconds in turn
+    assert elapsed < 1.0
+
+
+def test_sync_run_is_refused():
+    with FakeAPIServer() as server:
+        agent = create_agent(server)
+        with pytest.raises(TypeError, match="arun"):
+            agent.run("Hi")
@@ -0,0 +1,88 @@
+import gc
+import time
+import weakref
+from events import EventEmitter
+from tools.background_jobs import JobManager, OutputBuffer, _managers, utf8_boundary
+from tools.bash_job_tool import BashJobTool
+from tools.bash_tool import BashTool
+
+
+def test_start_poll_and_wait():
+    manager = JobManager()
+    try:
+        job = manager.start("echo first; sleep 0.3; echo second")
+        deadline = time.monotonic() + 5
+        while job.buffer.size < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert job.buffer.read(0, 100) == b"first\n"
+        assert job.running
+        assert job.wait(5)
+        assert job.exit_code == 0
+        # reading from the previous end returns only the new output
+        assert job.buffer.read(6, 100) == b"second\n"
+    finally:
+        manager.close()
+
+
+def test_kill_stops_the_job_and_its_children():
+    manager = JobManager()
+    try:
+        job = manager.start("sleep 30 & sleep 30; wait")
+        job.kill(grace=1)
+        assert not job.running
+        assert job.exit_code is not None and job.exit_code != 0
+    finally:
+        manager.close()
+
+
+def test_output_spills_to_temp_file():
+    buffer = OutputBuffer(max_memory_bytes=10)
+    data = bytes(range(256)) * 4
+    for start in range(0, len(data), 7):
+        buffer.write(data[start:start + 7])
+    assert buffer.size == len(data)
+    assert buffer._spill is not None
+    assert len(buffer._memory) == 10
+    # reads spanning the spill file and memory return the original bytes
+    assert buffer.read(0, len(data)) == data
+    assert buffer.read(1000, 100) == data[1000:1100]
+    assert buffer.read(len(data), 10) == b""
+    buffer.close()
+
+
+def test_closed_managers_are_not_kept_alive():
+    manager = JobManager()
+    assert manager in _managers
+    manager.close()
+    assert manager not in _managers
+    manager = JobManager()
+    ref = weakref.ref(manager)
+    del manager
+    gc.collect()
+    assert ref() is None
+
+
+def test_utf8_boundary():
+    text = "aé€😀".encode()
+    assert utf8_boundary(text) == len(text)
+    assert [utf8_boundary(text[:end]) for end in range(len(text) + 1)] == [0, 1, 1, 3, 3, 3, 6, 6, 6, 6, 10]
+
+
+def test_poll_stops_at_character_boundaries():
+    bash_tool = BashTool(emitter=EventEmitter())
+    tool = BashJobTool(emitter=EventEmitter(), bash_tool=bash_tool)
+    try:
+        job_id = tool.execute({"action": "start", "command": "printf 'é%.0s' 1 2 3 4 5; sleep 0.5"}).data.job.job_id
+        job = bash_tool.jobs.get(job_id)
+        deadline = time.monotonic() + 5
+        while job.buffer.size < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        output, offset = "", 0
+        while offset < 10:
+            result = tool.execute({"action": "poll", "job_id": job_id, "offset": offset, "max_bytes": 3}).data
+            assert "�" not in result.output
+            output += result.output
+            offset = result.next_offset
+        assert output == "ééééé"
+    finally:
+        bash_tool.close()
@@ -0,0 +1,64 @@
+import os
+import pytest
+from tools.bash_pool import BashSessionPool
+from tools.bash_session import BashSession
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = BashSessionPool(cwd=str(tmp_path), max_size=1, min_idle=0)
+    yield pool
+    pool.close()
+
+
+def run(session: BashSession, command: str) -> str:
+    result = session.execute_command(command)
+    assert not result["timed_out"]
+    return result["stdout"].strip()
+
+
+def test_released_session_is_reused_and_reset(pool, tmp_path):
+    (tmp_path / "sub").mkdir()
+    with pool.lease() as session:
+        first = session
+        run(session, "cd sub; export TOY_EXPORTED=1; toy_local=1; toy_fn() { :; }; alias toy_alias=true")
+        run(session, "set -o pipefail; shopt -s nullglob; trap 'echo bye' EXIT USR1; umask 077")
+    with pool.lease() as session:
+        assert session is first
+        assert run(session, "pwd") == str(tmp_path)
+        assert run(session, 'echo "${TOY_EXPORTED-unset} ${toy_local-unset}"') == "unset unset"
+        assert run(session, "type -t toy_fn toy_alias; echo done") == "done"
+        assert run(session, "set -o | grep pipefail") == "pipefail       \toff"
+        assert run(session, "shopt nullglob") == "nullglob       \toff"
+        assert run(session, "trap -p") == "trap -- ':' SIGINT"
+        umask = os.umask(0)
+        os.umask(umask)
+        assert run(session, "umask") == f"{umask:04o}"
+        assert run(session, "echo $HOME") == os.environ["HOME"]
+
+
+def test_session_stuck_in_reset_is_discarded(tmp_path):
+    pool = BashSessionPool(cwd=str(tmp_path), max_size=1, min_idle=0, reset_timeout=0.5)
+    try:
+        with pool.lease() as session:
+            first = session
+            # the reset runs this in place of cd, and never finishes
+            run(session, "cd() { sleep 30; }")
+        assert first.process.poll() is not None
+        with pool.lease() as session:
+            assert session is not first
+            assert run(session, "echo ok") == "ok"
+    finally:
+        pool.close()
+
+
+def test_acquire_times_out_when_pool_is_full(pool):
+    with pool.lease():
+        with pytest.raises(RuntimeError, match="No bash session available"):
+            pool.acquire(timeout=0.1)
+
+
+def test_terminate_reaps_the_process(tmp_path):
+    session = BashSession(cwd=str(tmp_path))
+    session.terminate()
+    assert session.process.returncode is not None
@@ -0,0 +1,68 @@
+import asyncio
+import time
+import pytest
+from tools.bash_session import TIMEOUT_EXIT_CODE, AsyncBashSession, BashSession
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = BashSession(cwd=str(tmp_path))
+    yield session
+    session.terminate()
+
+
+@pytest.mark.parametrize("command", [
+    "read x; echo \"read: $x\"",
+    "cat",
+    "python3 -c 'import sys; print(len(sys.stdin.read()))'",
+])
+def test_command_reading_stdin_does_not_consume_sentinel(session, command):
+    result = session.execute_command(command, timeout=5)
+    assert not result["timed_out"]
+    # the next command still completes normally
+    result = session.execute_command("echo next", timeout=5)
+    assert result == {"stdout": "next\n", "stderr": "", "exit_code": 0, "cwd": session.cwd, "timed_out": False}
+
+
+def test_timeout_stops_the_rest_of_the_command(session, tmp_path):
+    start = time.monotonic()
+    result = session.execute_command(f"echo start; sleep 5; touch {tmp_path}/done; echo done", timeout=0.5)
+    assert time.monotonic() - start < 3
+    assert result["timed_out"]
+    assert result["exit_code"] == TIMEOUT_EXIT_CODE
+    assert result["stdout"] == "start\n"
+    time.sleep(0.2)
+    assert not (tmp_path / "done").exists()
+
+
+def test_session_recovers_after_endless_loop(session, tmp_path):
+    session.execute_command("mkdir sub && cd sub", timeout=5)
+    result = session.execute_command("while true; do sleep 0.2; done", timeout=0.5)
+    assert result["timed_out"]
+    assert result["exit_code"] == TIMEOUT_EXIT_CODE
+    result = session.execute_command("echo alive; pwd", timeout=5)
+    assert result["stdout"] == f"alive\n{tmp_path}/sub\n"
+    assert result["exit_code"] == 0
+
+
+def test_exit_code_and_cwd(session, tmp_path):
+    result = session.execute_command("cd /; (exit 3)", timeout=5)
+    assert result["exit_code"] == 3
+    assert result["cwd"] == "/"
+
+
+def test_async_session_stdin_and_timeout(tmp_path):
+    async def run():
+        session = AsyncBashSession(cwd=str(tmp_path))
+        try:
+            assert not (await session.execute_command("cat", timeout=5))["timed_out"]
+            result = await session.execute_command("echo start; while true; do sleep 0.2; done; echo done", timeout=0.5)
+            assert result["timed_out"]
+            assert result["exit_code"] == TIMEOUT_EXIT_CODE
+            assert result["stdout"] == "start\n"
+            result = await session.execute_command("echo alive", timeout=5)
+            assert (result["stdout"], result["exit_code"]) == ("alive\n", 0)
+        finally:
+            await session.terminate()
+
+    asyncio.run(run())
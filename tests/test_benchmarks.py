@@ -0,0 +1,68 @@
+import json
+import sys
+import pytest
+from benchmarks import run
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+
+def report(**medians: float) -> dict:
+    return {"results": {name: run.summarize([median]) for name, median in medians.items()}}
+
+
+def test_summarize():
+    summary = run.summarize([0.5, 0.1, 0.4, 0.2, 0.3])
+    assert summary == {"n": 5, "median": 0.3, "mean": pytest.approx(0.3), "p90": 0.5, "min": 0.1, "max": 0.5}
+
+
+def test_compare_flags_regressions(capsys):
+    baseline = report(fast=1.0, slow=1.0, gone=1.0)
+    current = report(fast=1.1, slow=1.5, new=1.0)
+    assert run.compare(current, baseline, threshold=0.2) == ["slow"]
+    output = capsys.readouterr().out
+    assert "slow" in output and "REGRESSION" in output
+    assert "new" in output.splitlines()[-1]
+
+
+def test_run_benchmarks_report():
+    result = run.run_benchmarks(only={"iteration", "history"}, repeat=2)
+    assert result["unit"] == "seconds"
+    assert result["meta"]["repeat"] == 2
+    assert set(result["results"]) == {
+        "iteration", "iteration.stream",
+        *(f"history.{bench}[n={size}]" for bench in ("strip_thinking", "build_request") for size in (10, 100, 1000)),
+    }
+    assert result["results"]["iteration"]["n"] == 20
+    assert result["results"]["history.build_request[n=10]"]["n"] == 2
+
+
+def test_scheduler_suite():
+    # a real HTTP client against FakeAPIServer, including 429s that have to be retried
+    results = run.bench_scheduler(repeat=4)
+    assert len(results["scheduler.request"]) == 4
+    assert len(results["scheduler.burst429"]) == 1
+
+
+def test_main_exits_on_regression(tmp_path, monkeypatch):
+    baseline = tmp_path / "baseline.json"
+    # a baseline nothing can beat
+    baseline.write_text(json.dumps(report(**{"history.strip_thinking[n=10]": 0.0, "history.build_request[n=10]": 1e-12})))
+    output = tmp_path / "current.json"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["run", "--only", "history", "--repeat", "2", "--output", str(output), "--baseline", str(baseline)])
+    assert run.main() == 1
+    assert "history.build_request[n=10]" in json.loads(output.read_text())["results"]
+
+
+def test_fake_client_script():
+    client = FakeClient([tool_use_response(("noop", {"value": 1})), text_response("Done")])
+    params = {"model": "fake-model", "max_tokens": 100, "messages": [{"role": "user", "content": "Hi"}]}
+    first = client.messages.create(**params)
+    assert first.stop_reason == "tool_use"
+    assert first.usage.input_tokens > 0 and first.usage.output_tokens > 0
+    with client.messages.stream(**params) as stream:
+        types = [event.type for event in stream]
+    assert types[0] == "message_start" and types[-1] == "message_stop"
+    assert stream.get_final_message().content[0].text == "Done"
+    assert client.calls == [params, params]
+    with pytest.raises(RuntimeError, match="ran out of responses after 2 calls"):
+        client.messages.create(**params)
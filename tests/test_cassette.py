@@ -0,0 +1,79 @@
+import pytest
+from pydantic import BaseModel
+from agent import Agent
+from cassette import CassetteMissError, RecordingClient, ReplayClient, stub_tools
+from events import EventEmitter
+from settings import Settings
+from tools import Tool
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+
+class SleepInput(BaseModel):
+    seconds: float
+
+
+class SleepOutput(BaseModel):
+    slept: float
+
+
+def request(content: str) -> dict:
+    return {"model": "fake-model", "max_tokens": 100, "messages": [{"role": "user", "content": content}]}
+
+
+@pytest.mark.parametrize("name", ["session.jsonl", "session.jsonl.gz"])
+def test_replay_serves_recorded_responses(tmp_path, name):
+    path = str(tmp_path / name)
+    recording = RecordingClient(FakeClient([text_response("first"), text_response("second")]), path)
+    recording.messages.create(**request("Hi"))
+    with recording.messages.stream(**request("Hi")) as stream:
+        list(stream)
+        stream.get_final_message()
+    recording.close()
+
+    replay = ReplayClient(path)
+    # the same request recorded twice is served twice, in order
+    assert replay.messages.create(**request("Hi")).content[0].text == "first"
+    with replay.messages.stream(**request("Hi")) as stream:
+        assert [event.type for event in stream][0] == "message_start"
+        assert stream.get_final_message().content[0].text == "second"
+    with pytest.raises(CassetteMissError):
+        replay.messages.create(**request("Hi"))
+    with pytest.raises(CassetteMissError):
+        replay.messages.create(**request("Something else"))
+
+
+def create_agent(client, tools: list[Tool], emitter: EventEmitter) -> Agent:
+    return Agent(settings=Settings(), client=client, tools=tools, emitter=emitter, thinking_enabled=False)
+
+
+def test_replayed_session_with_stubbed_tools(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    slept = []
+
+    def create_sleep_tool(emitter: EventEmitter) -> Tool:
+        def sleep(input: SleepInput) -> SleepOutput:
+            slept.append(input.seconds)
+            return SleepOutput(slept=input.seconds)
+        return Tool(
+            tool_name="sleep",
+            description="Sleeps",
+            input_schema=SleepInput,
+            output_schema=SleepOutput,
+            run=sleep,
+            emitter=emitter
+        )
+
+    emitter = EventEmitter()
+    client = RecordingClient(FakeClient([tool_use_response(("sleep", {"seconds": 1})), text_response("Done")]), path)
+    recorded = create_agent(client, [create_sleep_tool(emitter)], emitter)
+    assert recorded.run("Sleep") == "Done"
+    client.close()
+    assert slept == [1]
+
+    replay = ReplayClient(path)
+    emitter = EventEmitter()
+    agent = create_agent(replay, stub_tools([create_sleep_tool(emitter)], replay), emitter)
+    assert agent.run("Sleep") == "Done"
+    # the tool result came from the cassette instead of running the tool again
+    assert slept == [1]
+    assert agent.history == recorded.history
@@ -0,0 +1,83 @@
+from benchmarks.fake_client import FakeClient, text_response
+from context_manager import ContextManager
+
+MODEL = "claude-haiku-4-5"
+
+
+def small_context(**kwargs) -> ContextManager:
+    """A context manager with a 1000 token budget, so small histories need compacting."""
+    return ContextManager(reserved_output_tokens=199_000, keep_recent_messages=2, **kwargs)
+
+
+def tool_turn(n: int, result: str, thinking: str = "", path: str = "") -> list[dict]:
+    """An assistant tool call and the user message answering it."""
+    blocks = [{"type": "thinking", "thinking": thinking, "signature": "sig"}] if thinking else []
+    blocks.append({"type": "tool_use", "id": f"tool_{n}", "name": "read", "input": {"n": n, "path": path}})
+    return [
+        {"role": "assistant", "content": blocks},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": f"tool_{n}", "content": result}]},
+    ]
+
+
+def conversation(turns: int, result: str, thinking: str = "", path: str = "") -> list[dict]:
+    history = [{"role": "user", "content": "Read the files"}]
+    for n in range(turns):
+        history += tool_turn(n, result, thinking, path)
+    return history + [{"role": "assistant", "content": [{"type": "text", "text": "Done"}]}]
+
+
+def tool_results(history: list[dict]) -> list[str]:
+    return [
+        block["content"] for message in history if isinstance(message["content"], list)
+        for block in message["content"] if block["type"] == "tool_result"
+    ]
+
+
+def test_under_threshold_is_untouched():
+    history = conversation(2, "short")
+    assert small_context().compact(history, MODEL) is history
+
+
+def test_old_tool_results_are_elided():
+    history = conversation(3, "x" * 1200)
+    compacted = small_context().compact(history, MODEL)
+    # the last tool result is within the recent messages
+    assert tool_results(compacted) == ["[old tool result elided, 1200 characters]"] * 2 + ["x" * 1200]
+    assert len(compacted) == len(history)
+
+
+def test_elided_results_keep_their_original_size():
+    manager = small_context()
+    history = conversation(3, "x" * 2000)
+    once = manager._elide_tool_results(history, len(history))
+    twice = manager._elide_tool_results(once, len(once))
+    assert tool_results(twice) == ["[old tool result elided, 2000 characters]"] * 3
+
+
+def test_old_thinking_is_dropped():
+    history = conversation(3, "ok", thinking="t" * 2000)
+    compacted = small_context().compact(history, MODEL)
+    thinking = [
+        block["type"] == "thinking" for message in compacted if message["role"] == "assistant"
+        for block in message["content"] if block["type"] in ("thinking", "tool_use")
+    ]
+    # thinking dropped from the old turns; tool calls kept
+    assert thinking == [False, False, False]
+    assert len(compacted) == len(history)
+
+
+def test_prefix_is_summarized_between_tool_pairs():
+    client = FakeClient([text_response("They read files 0 to 8.")])
+    # tool calls are never elided, so long inputs need summarizing
+    history = conversation(10, "y" * 500, path="z" * 500)
+    compacted = small_context(client=client).compact(history, MODEL)
+    assert len(compacted) < len(history)
+    assert compacted[0]["role"] == "user"
+    assert "They read files 0 to 8." in compacted[0]["content"][0]["text"]
+    assert client.calls[0]["model"] == "claude-haiku-4-5"
+    # roles alternate, and every tool result follows the assistant message that called it
+    assert [message["role"] for message in compacted] == ["user", "assistant"] * (len(compacted) // 2)
+    for previous, message in zip(compacted, compacted[1:]):
+        for block in message["content"]:
+            if block["type"] == "tool_result":
+                assert any(call.get("id") == block["tool_use_id"] for call in previous["content"])
@@ -0,0 +1,160 @@
+import gc
+import threading
+import time
+import weakref
+from events import AssistantMessageEvent, EventEmitter, TextDeltaEvent
+
+
+class SlowHandler:
+    """Records events and the batches they arrived in, taking `delay` seconds per event."""
+
+    def __init__(self, delay: float = 0.0, batches: bool = False):
+        self.delay = delay
+        self.events = []
+        self.batches = []
+        self.threads = set()
+        if batches:
+            self.handle_batch = self._handle_batch
+
+    def handle(self, event):
+        self.threads.add(threading.current_thread())
+        time.sleep(self.delay)
+        self.events.append(event)
+
+    def _handle_batch(self, events):
+        self.batches.append(len(events))
+        for event in events:
+            self.handle(event)
+
+
+class FailingHandler:
+    def handle(self, event):
+        raise RuntimeError("handler failed")
+
+
+class Approver:
+    def __init__(self, handler: SlowHandler):
+        self.handler = handler
+        self.seen = None
+
+    def request_confirmation(self, tool_name, action, path, preview):
+        self.seen = len(self.handler.events)
+        return True, None
+
+
+def messages(count: int) -> list[AssistantMessageEvent]:
+    return [AssistantMessageEvent(text=str(n)) for n in range(count)]
+
+
+def test_slow_handler_does_not_block_emit():
+    handler = SlowHandler(delay=0.02)
+    emitter = EventEmitter(async_dispatch=True)
+    emitter.add_handler(handler)
+    start = time.monotonic()
+    for event in messages(20):
+        emitter.emit(event)
+    assert time.monotonic() - start < 0.1
+    assert emitter.flush(timeout=5)
+    assert handler.events == messages(20)
+    assert handler.threads == {emitter._dispatcher}
+    emitter.close()
+
+
+def test_events_are_delivered_in_batches():
+    handler = SlowHandler(batches=True)
+    gate = threading.Event()
+    emitter = EventEmitter(async_dispatch=True, max_batch_size=10)
+    # hold the dispatcher in the first event, so the rest queue up behind it
+    emitter.add_handler(type("Gate", (), {"handle": lambda self, event: gate.wait(5)})())
+    emitter.add_handler(handler)
+    emitter.emit(AssistantMessageEvent(text="first"))
+    while emitter._queue:
+        time.sleep(0.01)
+    for event in messages(25):
+        emitter.emit(event)
+    gate.set()
+    emitter.close()
+    assert handler.events[1:] == messages(25)
+    # a lone event goes to handle(), queued ones to handle_batch()
+    assert handler.batches == [10, 10, 5]
+
+
+def test_drop_oldest_when_full():
+    gate = threading.Event()
+    handler = SlowHandler()
+    emitter = EventEmitter(async_dispatch=True, queue_size=5, backpressure="drop_oldest")
+    emitter.add_handler(type("Gate", (), {"handle": lambda self, event: gate.wait(5)})())
+    emitter.add_handler(handler)
+    emitter.emit(AssistantMessageEvent(text="first"))
+    while emitter._queue:
+        time.sleep(0.01)
+    for event in messages(8):
+        emitter.emit(event)
+    gate.set()
+    emitter.close()
+    assert emitter.dropped == 3
+    assert [event.text for event in handler.events] == ["first", "3", "4", "5", "6", "7"]
+
+
+def test_coalesce_merges_deltas_of_the_same_block():
+    gate = threading.Event()
+    handler = SlowHandler()
+    emitter = EventEmitter(async_dispatch=True, backpressure="coalesce")
+    emitter.add_handler(type("Gate", (), {"handle": lambda self, event: gate.wait(5)})())
+    emitter.add_handler(handler)
+    emitter.emit(AssistantMessageEvent(text="first"))
+    while emitter._queue:
+        time.sleep(0.01)
+    for text in ["Hel", "lo", " wor", "ld"]:
+        emitter.emit(TextDeltaEvent(index=0, text=text))
+    emitter.emit(TextDeltaEvent(index=1, text="next block"))
+    gate.set()
+    emitter.close()
+    assert handler.events[1:] == [TextDeltaEvent(index=0, text="Hello world"), TextDeltaEvent(index=1, text="next block")]
+
+
+def test_confirmation_comes_after_queued_events():
+    handler = SlowHandler(delay=0.01)
+    emitter = EventEmitter(async_dispatch=True)
+    emitter.add_handler(handler)
+    approver = Approver(handler)
+    emitter.set_confirmation_handler(approver)
+    for event in messages(10):
+        emitter.emit(event)
+    assert emitter.request_confirmation("tool", "run", None, "preview") == (True, None)
+    assert approver.seen == 10
+    emitter.close()
+
+
+def test_failing_handler_does_not_stop_dispatch():
+    handler = SlowHandler()
+    emitter = EventEmitter(async_dispatch=True)
+    emitter.add_handler(FailingHandler())
+    emitter.add_handler(handler)
+    emitter.emit(AssistantMessageEvent(text="a"))
+    assert emitter.flush(timeout=5)
+    emitter.remove_handler(emitter._handlers[0])
+    emitter.emit(AssistantMessageEvent(text="b"))
+    emitter.close()
+    # the dispatcher survived the failure and is still delivering
+    assert handler.events[-1].text == "b"
+
+
+def test_events_after_close_are_delivered_synchronously():
+    handler = SlowHandler()
+    emitter = EventEmitter(async_dispatch=True)
+    emitter.add_handler(handler)
+    emitter.close()
+    emitter.emit(AssistantMessageEvent(text="late"))
+    assert [event.text for event in handler.events] == ["late"]
+    assert handler.threads == {threading.current_thread()}
+
+
+def test_closed_emitter_is_released():
+    emitter = EventEmitter(async_dispatch=True)
+    emitter.close()
+    ref = weakref.ref(emitter)
+    del emitter
+    gc.collect()
+    # the exit hook registered for the dispatcher no longer holds it
+    assert ref() is None
@@ -0,0 +1,80 @@
+import os
+from tools.file_cache import FileContentCache
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_repeated_reads_hit_the_cache(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"one\r\ntwo\n")
+    cache = FileContentCache()
+    assert cache.read_text(str(path)) == "one\ntwo\n"
+    assert cache.read_text(str(path)) == "one\ntwo\n"
+    assert cache.read_bytes(str(path)) == b"one\r\ntwo\n"
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_same_size_rewrite_is_seen_through_mtime(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("aaaa\n")
+    cache = FileContentCache()
+    assert cache.read_text(str(path)) == "aaaa\n"
+    with open(path, "r+") as file:
+        file.write("bbbb\n")
+    bump_mtime(path)
+    assert cache.read_text(str(path)) == "bbbb\n"
+
+
+def test_replaced_file_is_seen_through_inode(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("aaaa\n")
+    cache = FileContentCache()
+    assert cache.read_text(str(path)) == "aaaa\n"
+    # same size and mtime, but a different file renamed over it
+    stat = os.stat(path)
+    replacement = tmp_path / "b.txt"
+    replacement.write_text("bbbb\n")
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, path)
+    assert cache.read_text(str(path)) == "bbbb\n"
+
+
+def test_invalidate_drops_entries_changed_within_one_mtime_tick(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("aaaa\n")
+    cache = FileContentCache()
+    assert cache.read_text(str(path)) == "aaaa\n"
+    stat = os.stat(path)
+    with open(path, "r+") as file:
+        file.write("bbbb\n")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    # indistinguishable by stat, which is why our own writes notify the cache
+    assert cache.read_text(str(path)) == "aaaa\n"
+    cache.invalidate(str(path))
+    assert cache.read_text(str(path)) == "bbbb\n"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = FileContentCache(max_bytes=25, max_file_bytes=10)
+    for name in "abc":
+        (tmp_path / name).write_bytes(name.encode() * 4)
+    (tmp_path / "big").write_bytes(b"x" * 11)
+    for name in ["a", "b", "a", "c", "big"]:
+        cache.read_bytes(str(tmp_path / name))
+    # a, b and c take 4 bytes each; big is over max_file_bytes, so it is never cached
+    cache.read_text(str(tmp_path / "a"))  # adds a's text: a 8 bytes, b 4, c 4
+    assert cache.misses == 4
+    cache.read_bytes(str(tmp_path / "big"))
+    assert cache.misses == 5
+    cache.read_text(str(tmp_path / "b"))  # b grows to 8: 20 bytes, all fit
+    cache.read_text(str(tmp_path / "c"))  # c grows to 8: 24 bytes, all fit
+    assert cache.misses == 5
+    (tmp_path / "d").write_bytes(b"dddd")
+    cache.read_text(str(tmp_path / "d"))  # 32 bytes: a, the least recently used, goes
+    cache.read_bytes(str(tmp_path / "b"))
+    assert cache.misses == 6
+    cache.read_bytes(str(tmp_path / "a"))
+    assert cache.misses == 7
@@ -0,0 +1,57 @@
+import os
+import pytest
+from tools.file_index import FileIndex
+
+
+@pytest.fixture
+def project(tmp_path):
+    for path in ["main.py", "README.md", "src/app.py", "src/util/helpers.py", "src/util/data.json",
+                 "build/out.py", "logs/run.log", "logs/keep.log", "docs/guide.md", "docs/draft/notes.md"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("x\n")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n!keep.log\n")
+    (tmp_path / "docs" / ".gitignore").write_text("/draft\n")
+    return tmp_path
+
+
+def test_gitignored_files_are_not_indexed(project):
+    index = FileIndex(str(project))
+    assert index.list_files() == [
+        ".gitignore", "README.md", "docs/.gitignore", "docs/guide.md", "logs/keep.log",
+        "main.py", "src/app.py", "src/util/data.json", "src/util/helpers.py",
+    ]
+    assert index.list_files("src/util") == ["src/util/data.json", "src/util/helpers.py"]
+
+
+def test_glob(project):
+    index = FileIndex(str(project))
+    assert index.glob("*.py") == ["main.py"]
+    assert index.glob("src/*") == ["src/app.py", "src/util"]
+    assert index.glob("**/*.py", recursive=True) == ["main.py", "src/app.py", "src/util/helpers.py"]
+    # without recursive, ** only spans one directory level
+    assert index.glob("**/*.py") == ["src/app.py"]
+    assert index.glob(str(project / "src" / "*.py")) == ["src/app.py"]
+    assert index.glob("build/*") == []
+
+
+def test_reported_changes_are_picked_up(project):
+    index = FileIndex(str(project), max_staleness=3600)
+    assert index.glob("src/*.py") == ["src/app.py"]
+    (project / "src" / "new.py").write_text("y\n")
+    (project / "src" / "app.py").unlink()
+    os.makedirs(project / "src" / "pkg")
+    (project / "src" / "pkg" / "mod.py").write_text("z\n")
+    index.file_changed(str(project / "src" / "new.py"))
+    index.file_changed(str(project / "src" / "app.py"))
+    index.file_changed(str(project / "src" / "pkg" / "mod.py"))
+    assert index.glob("src/**/*.py", recursive=True) == ["src/new.py", "src/pkg/mod.py", "src/util/helpers.py"]
+
+
+def test_gitignore_changes_apply_after_refresh(project):
+    index = FileIndex(str(project), max_staleness=3600)
+    assert "src/util/data.json" in index.list_files()
+    (project / "src" / ".gitignore").write_text("*.json\n")
+    index.mark_stale()
+    assert index.list_files("src") == ["src/.gitignore", "src/app.py", "src/util/helpers.py"]
@@ -0,0 +1,53 @@
+import os
+from tools.file_reader import read_lines
+
+
+def numbered(count: int) -> bytes:
+    return "".join(f"{n}\n" for n in range(1, count + 1)).encode()
+
+
+def rewrite_in_place(path, data: bytes):
+    """Overwrite the file on the same inode, then move its mtime on so the change is visible."""
+    stat = os.stat(path)
+    with open(path, "r+b") as file:
+        file.write(data)
+        file.truncate()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_same_size_rewrite_reindexes(tmp_path):
+    path = tmp_path / "numbers.txt"
+    original = numbered(600)
+    path.write_bytes(original)
+    assert read_lines(str(path), 300, 2).text == "300\n301\n"
+    # merge lines 100-299 into one, keeping the size and the tail of the file
+    lines = original.splitlines(keepends=True)
+    merged = b"".join(lines[:99]) + b"".join(line.rstrip(b"\n") + b" " for line in lines[99:298]) + b"".join(lines[298:])
+    assert len(merged) == len(original)
+    inode = os.stat(path).st_ino
+    rewrite_in_place(path, merged)
+    assert os.stat(path).st_ino == inode
+    result = read_lines(str(path), 300, 2)
+    assert result.total_lines == merged.count(b"\n")
+    expected = merged.splitlines(keepends=True)[299:301]
+    assert result.text == b"".join(expected).decode()
+
+
+def test_append_extends_index(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_bytes(numbered(500))
+    assert read_lines(str(path), 1, 1).total_lines == 500
+    with open(path, "ab") as file:
+        file.write("".join(f"{n}\n" for n in range(501, 1201)).encode())
+    result = read_lines(str(path), 1000, 3)
+    assert (result.text, result.total_lines) == ("1000\n1001\n1002\n", 1200)
+
+
+def test_growth_after_rewrite_reindexes(tmp_path):
+    path = tmp_path / "numbers.txt"
+    path.write_bytes(numbered(300))
+    assert read_lines(str(path), 1, 1).total_lines == 300
+    # a rewrite that also grows the file is not an append
+    rewrite_in_place(path, b"".join(f"{n} {n}\n".encode() for n in range(1, 301)))
+    result = read_lines(str(path), 200, 1)
+    assert (result.text, result.total_lines) == ("200 200\n", 300)
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from pydantic import BaseModel
+from agent import Agent
+from events import EventEmitter, LLMCallCompletedEvent, LLMCallStartedEvent, ToolCompletedEvent, ToolErrorEvent
+from settings import Settings
+from stats import AgentStats
+from tools import Tool
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+
+class WorkInput(BaseModel):
+    spin: float = 0.0  # seconds of busy CPU
+    sleep: float = 0.0  # seconds idle
+    fail: bool = False
+
+
+class WorkOutput(BaseModel):
+    done: bool
+
+
+class Recorder:
+    """Event handler keeping everything emitted on its emitter."""
+
+    def __init__(self):
+        self.events = []
+        self.emitter = EventEmitter()
+        self.emitter.add_handler(self)
+
+    def handle(self, event):
+        self.events.append(event)
+
+    def of_type(self, event_type) -> list:
+        return [event for event in self.events if isinstance(event, event_type)]
+
+
+def work(input: WorkInput) -> WorkOutput:
+    end = time.thread_time() + input.spin
+    while time.thread_time() < end:
+        pass
+    time.sleep(input.sleep)
+    if input.fail:
+        raise RuntimeError("work failed")
+    return WorkOutput(done=True)
+
+
+def create_work_tool(emitter: EventEmitter) -> Tool:
+    return Tool(
+        tool_name="work",
+        description="Spins and sleeps",
+        input_schema=WorkInput,
+        output_schema=WorkOutput,
+        run=work,
+        emitter=emitter
+    )
+
+
+def create_agent(client: FakeClient, recorder: Recorder, stream: bool = False) -> Agent:
+    return Agent(
+        settings=Settings(),
+        client=client,  # type: ignore[arg-type]
+        tools=[create_work_tool(recorder.emitter)],
+        emitter=recorder.emitter,
+        stream=stream
+    )
+
+
+def test_llm_call_events():
+    recorder = Recorder()
+    client = FakeClient([text_response("Done", thinking="x" * 400)], latency=0.1)
+    create_agent(client, recorder).run("Hi")
+    [started] = recorder.of_type(LLMCallStartedEvent)
+    [completed] = recorder.of_type(LLMCallCompletedEvent)
+    assert started.message_count == 1
+    assert completed.latency >= 0.1
+    # only known when streaming
+    assert completed.time_to_first_token is None
+    assert completed.thinking_tokens == 100
+    assert completed.output_tokens > 0
+    assert completed.stop_reason == "end_turn"
+
+
+def test_time_to_first_token_when_streaming():
+    recorder = Recorder()
+    client = FakeClient([text_response("Done")], latency=0.3, time_to_first_token=0.1)
+    create_agent(client, recorder, stream=True).run("Hi")
+    [completed] = recorder.of_type(LLMCallCompletedEvent)
+    assert completed.time_to_first_token is not None
+    assert 0.1 <= completed.time_to_first_token < 0.25
+    assert completed.latency >= 0.3
+
+
+def test_tool_wall_and_cpu_time():
+    recorder = Recorder()
+    client = FakeClient([
+        tool_use_response(("work", {"spin": 0.1, "sleep": 0.1}), ("work", {"fail": True})),
+        text_response("Done"),
+    ])
+    agent = create_agent(client, recorder)
+    agent.run("Work")
+    [completed] = recorder.of_type(ToolCompletedEvent)
+    assert completed.wall_time >= 0.2
+    # the sleep counts toward wall time only
+    assert 0.1 <= completed.cpu_time < 0.2
+    [failed] = recorder.of_type(ToolErrorEvent)
+    assert failed.wall_time is not None and failed.cpu_time is not None
+
+    stats = agent.stats
+    assert stats.llm_calls == 2
+    assert stats.tool_calls == 2
+    assert (stats.tools["work"].calls, stats.tools["work"].errors) == (2, 1)
+    assert stats.tools["work"].wall_time >= 0.2
+    assert stats.input_tokens == sum(event.input_tokens for event in recorder.of_type(LLMCallCompletedEvent))
+    assert "work: 2 calls, 1 failed" in stats.summary()
+
+
+def test_async_tools_skip_cpu_time():
+    async def arun(input: WorkInput) -> WorkOutput:
+        await asyncio.sleep(input.sleep)
+        return WorkOutput(done=True)
+
+    emitter = EventEmitter()
+    tool = Tool(
+        tool_name="work",
+        description="Sleeps",
+        input_schema=WorkInput,
+        output_schema=WorkOutput,
+        run=work,
+        arun=arun,
+        emitter=emitter
+    )
+    result = asyncio.run(tool.aexecute({"sleep": 0.05}))
+    assert result.wall_time >= 0.05
+    # the event loop thread is shared, so its CPU time isn't the tool's
+    assert result.cpu_time is None
+
+
+def test_stats_add_up_llm_calls():
+    stats = AgentStats()
+    for latency in [0.5, 1.5]:
+        stats.record_llm_call(LLMCallCompletedEvent(
+            model="fake-model",
+            latency=latency,
+            time_to_first_token=None,
+            input_tokens=10,
+            output_tokens=20,
+            thinking_tokens=5,
+            cache_creation_input_tokens=100,
+            cache_read_input_tokens=1000,
+            stop_reason="end_turn"
+        ))
+    assert (stats.llm_calls, stats.llm_time) == (2, 2.0)
+    assert (stats.input_tokens, stats.output_tokens, stats.thinking_tokens) == (20, 40, 10)
+    assert (stats.cache_creation_input_tokens, stats.cache_read_input_tokens) == (200, 2000)
+    assert stats.summary().splitlines()[0] == "LLM calls: 2 (2.0s)"
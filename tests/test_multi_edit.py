@@ -0,0 +1,78 @@
+import pytest
+from events import EventEmitter
+from settings import EditMode, Settings
+from tools.multi_edit_tool import MultiEditTool, insert_at_line
+
+SOURCE = "import os\n\n\ndef main():\n    return 1\n"
+
+
+class EditDuringConfirmation:
+    """Approves every prompt, but changes the file first, as another agent might."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def request_confirmation(self, tool_name, action, path, preview):
+        self.path.write_text(self.path.read_text() + "# changed\n")
+        return True, None
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr("tools.utils.get_project_root", lambda: str(tmp_path))
+    return tmp_path
+
+
+def edit_tool(edit_mode: EditMode = EditMode.ALWAYS, emitter: EventEmitter | None = None) -> MultiEditTool:
+    settings = Settings()
+    settings.edit_mode = edit_mode
+    return MultiEditTool(emitter=emitter or EventEmitter(), settings=settings)
+
+
+def test_edits_apply_in_order(project):
+    path = project / "main.py"
+    path.write_text(SOURCE)
+    result = edit_tool().execute({"path": str(path), "edits": [
+        {"command": "str_replace", "old_str": "return 1", "new_str": "return run()"},
+        {"command": "insert", "insert_line": 3, "insert_text": "def run():\n    return 1\n\n"},
+        # sees the text the first edit wrote
+        {"command": "str_replace", "old_str": "return run()", "new_str": "return run() + 1"},
+    ]})
+    assert result.success, result.error
+    assert path.read_text() == "import os\n\n\ndef run():\n    return 1\n\ndef main():\n    return run() + 1\n"
+
+
+def test_failing_edit_writes_nothing(project):
+    path = project / "main.py"
+    path.write_text(SOURCE)
+    result = edit_tool().execute({"path": str(path), "edits": [
+        {"command": "str_replace", "old_str": "return 1", "new_str": "return 2"},
+        {"command": "insert", "insert_line": 1, "insert_text": "import sys"},
+        # the first edit already replaced it
+        {"command": "str_replace", "old_str": "return 1", "new_str": "return 3"},
+    ]})
+    assert not result.success
+    assert "Edit 3" in (result.error or "") and "not found" in (result.error or "")
+    assert path.read_text() == SOURCE
+
+
+def test_file_changed_while_confirming_writes_nothing(project):
+    path = project / "main.py"
+    path.write_text(SOURCE)
+    emitter = EventEmitter()
+    emitter.set_confirmation_handler(EditDuringConfirmation(path))
+    result = edit_tool(EditMode.ASK, emitter).execute({"path": str(path), "edits": [
+        {"command": "str_replace", "old_str": "return 1", "new_str": "return 2"},
+    ]})
+    assert not result.success
+    assert "changed while waiting for confirmation" in (result.error or "")
+    assert path.read_text() == SOURCE + "# changed\n"
+
+
+def test_insert_at_line():
+    assert insert_at_line("a\nb\n", 0, "x") == "x\na\nb\n"
+    assert insert_at_line("a\nb\n", 2, "x\n") == "a\nb\nx\n"
+    # the last line gets a newline before text is added after it
+    assert insert_at_line("a\nb", 2, "x") == "a\nb\nx\n"
+    with pytest.raises(ValueError, match="past the end"):
+        insert_at_line("a\nb\n", 3, "x")
@@ -0,0 +1,109 @@
+from pydantic import BaseModel
+from agent import Agent, _add_history_breakpoint
+from events import CacheUsageEvent, EventEmitter
+from settings import Settings
+from tools import Tool
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class EchoInput(BaseModel):
+    text: str
+
+
+class EchoOutput(BaseModel):
+    text: str
+
+
+class Recorder:
+    """Event handler keeping everything emitted on its emitter."""
+
+    def __init__(self):
+        self.events = []
+        self.emitter = EventEmitter()
+        self.emitter.add_handler(self)
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+def create_agent(client: FakeClient, emitter: EventEmitter, prompt_caching: bool = True) -> Agent:
+    tool = Tool(
+        tool_name="echo",
+        description="Echoes text",
+        input_schema=EchoInput,
+        output_schema=EchoOutput,
+        run=lambda input: EchoOutput(text=input.text),
+        emitter=emitter
+    )
+    return Agent(
+        settings=Settings(),
+        client=client,  # type: ignore[arg-type]
+        system_prompt="You are a test agent.",
+        tools=[tool],
+        emitter=emitter,
+        prompt_caching=prompt_caching
+    )
+
+
+def with_cache_read(message, tokens: int):
+    def respond(params):
+        response = message.model_copy(deep=True)
+        response.usage.cache_read_input_tokens = tokens
+        return response
+    return respond
+
+
+def test_breakpoints_on_system_tools_and_latest_history():
+    recorder = Recorder()
+    responses = iter([tool_use_response(("echo", {"text": "hi"}), thinking="Echo it"), text_response("Done")])
+    client = FakeClient(lambda params: next(responses))
+    agent = create_agent(client, recorder.emitter)
+    assert agent.run("Echo hi") == "Done"
+
+    first, second = client.calls
+    for params in client.calls:
+        assert params["system"] == [{"type": "text", "text": "You are a test agent.", "cache_control": CACHE_CONTROL}]
+        # the last tool (the output tool) caches the whole list
+        assert [tool.get("cache_control") for tool in params["tools"]] == [None, CACHE_CONTROL]
+    assert first["messages"][-1]["content"] == [{"type": "text", "text": "Echo hi", "cache_control": CACHE_CONTROL}]
+    # the breakpoint moves to the end of the conversation, and only one message carries it
+    assert second["messages"][-1]["content"][0]["cache_control"] == CACHE_CONTROL
+    assert [
+        "cache_control" in block for message in second["messages"][:-1] if isinstance(message["content"], list)
+        for block in message["content"]
+    ] == [False, False]
+    # history itself is left unmarked
+    assert agent.history[0]["content"] == "Echo hi"
+
+
+def test_breakpoint_skips_thinking_blocks():
+    messages = [{"role": "assistant", "content": [
+        {"type": "text", "text": "Let me think"},
+        {"type": "thinking", "thinking": "hmm", "signature": "sig"},
+    ]}]
+    marked = _add_history_breakpoint(messages)  # type: ignore[arg-type]
+    assert marked[0]["content"][0]["cache_control"] == CACHE_CONTROL
+    assert "cache_control" not in marked[0]["content"][1]
+    assert "cache_control" not in messages[0]["content"][0]
+
+
+def test_prompt_caching_disabled():
+    client = FakeClient([text_response("Done")])
+    agent = create_agent(client, EventEmitter(), prompt_caching=False)
+    agent.run("Hi")
+    params = client.calls[0]
+    assert params["system"] == "You are a test agent."
+    assert all("cache_control" not in tool for tool in params["tools"])
+    assert params["messages"][0] == {"role": "user", "content": "Hi"}
+
+
+def test_cache_usage_events():
+    recorder = Recorder()
+    agent = create_agent(FakeClient(with_cache_read(text_response("Done"), 1200)), recorder.emitter)
+    agent.run("Hi")
+    [event] = [event for event in recorder.events if isinstance(event, CacheUsageEvent)]
+    assert event.cache_read_input_tokens == 1200
+    assert event.cache_creation_input_tokens == 0
+    assert event.input_tokens > 0
@@ -0,0 +1,65 @@
+import time
+import pytest
+from agent import Agent
+from events import EventEmitter
+from response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend, cache_key
+from settings import Settings
+from benchmarks.fake_client import FakeClient, text_response
+
+
+def request(content, **extra) -> dict:
+    return {"model": "fake-model", "max_tokens": 100, "messages": [{"role": "user", "content": content}], **extra}
+
+
+def test_cache_key_ignores_cache_breakpoints():
+    plain = request("Hi", system="Be brief")
+    cached = request(
+        [{"type": "text", "text": "Hi", "cache_control": {"type": "ephemeral"}}],
+        system=[{"type": "text", "text": "Be brief", "cache_control": {"type": "ephemeral"}}]
+    )
+    assert cache_key(plain) == cache_key(cached)
+    assert cache_key(plain) != cache_key(request("Hello", system="Be brief"))
+    assert cache_key(plain) != cache_key({**plain, "model": "other-model"})
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_agent_reuses_cached_response(tmp_path, backend):
+    cache = ResponseCache(MemoryCacheBackend() if backend == "memory" else SQLiteCacheBackend(str(tmp_path / "responses.sqlite")))
+    client = FakeClient(lambda params: text_response("Hello"))
+    for _ in range(2):
+        agent = Agent(settings=Settings(), client=client, emitter=EventEmitter(), thinking_enabled=False, response_cache=cache)  # type: ignore[arg-type]
+        assert agent.run("Hi") == "Hello"
+    assert len(client.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_and_truncated_responses_are_not_served():
+    cache = ResponseCache(ttl=0.05)
+    params = request("Hi")
+    cache.put(params, text_response("Hello"))
+    assert cache.get(params) is not None
+    time.sleep(0.1)
+    assert cache.get(params) is None
+
+    truncated = text_response("Hel").model_copy(update={"stop_reason": "max_tokens"})
+    cache.put(params, truncated)
+    assert cache.get(params) is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == ("1", None, "3")
+
+
+def test_sqlite_backend_evicts_by_size(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "responses.sqlite"), max_bytes=10)
+    backend.set("a", "x" * 6)
+    time.sleep(0.01)
+    backend.set("b", "y" * 6)
+    assert backend.get("a") is None
+    assert backend.get("b") == "y" * 6
+    backend.close()
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+import anthropic
+import pytest
+from benchmarks.fake_client import text_response
+from benchmarks.fake_server import FakeAPIServer
+from events import EventEmitter, RequestRetryEvent, RequestScheduledEvent
+from scheduler import (
+    MAIN_PRIORITY,
+    SUB_AGENT_PRIORITY,
+    AsyncScheduledClient,
+    RequestScheduler,
+    ScheduledClient,
+    _retry_after,
+)
+
+MODEL = "claude-haiku-4-5"
+
+
+class Recorder:
+    """Event handler keeping everything emitted on its emitter."""
+
+    def __init__(self):
+        self.events = []
+        self.emitter = EventEmitter()
+        self.emitter.add_handler(self)
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+def request(content: str = "Hi") -> dict:
+    return {"model": MODEL, "max_tokens": 100, "messages": [{"role": "user", "content": content}]}
+
+
+def api_client(server: FakeAPIServer) -> anthropic.Client:
+    return anthropic.Client(api_key="fake", base_url=server.base_url, max_retries=0)
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+def test_retries_429_after_retry_after(recorder):
+    with FakeAPIServer(fail_first=2, retry_after=0.3) as server:
+        client = ScheduledClient(api_client(server), RequestScheduler(base_delay=0.01), emitter=recorder.emitter)
+        start = time.monotonic()
+        response = client.messages.create(**request())
+        elapsed = time.monotonic() - start
+    assert response.content[0].text == "ok"
+    assert server.requests == 3
+    assert elapsed >= 0.6
+    retries = [event for event in recorder.events if isinstance(event, RequestRetryEvent)]
+    assert [(event.attempt, event.status_code) for event in retries] == [(1, 429), (2, 429)]
+    assert all(0.3 <= event.delay < 0.31 for event in retries)
+    scheduled = [event for event in recorder.events if isinstance(event, RequestScheduledEvent)]
+    assert [event.attempt for event in scheduled] == [1, 2, 3]
+    assert scheduled[-1].wait_time >= 0.3
+
+
+def test_retries_529_with_exponential_backoff(recorder):
+    with FakeAPIServer(fail_first=3, fail_status=529, retry_after=None) as server:
+        scheduler = RequestScheduler(base_delay=0.05)
+        client = ScheduledClient(api_client(server), scheduler, emitter=recorder.emitter)
+        assert client.messages.create(**request()).content[0].text == "ok"
+    delays = [event.delay for event in recorder.events if isinstance(event, RequestRetryEvent)]
+    # jittered within the upper half of 0.05, 0.1, 0.2
+    assert [0.025 <= delays[0] <= 0.05, 0.05 <= delays[1] <= 0.1, 0.1 <= delays[2] <= 0.2] == [True] * 3
+    assert scheduler.metrics()["rate_limited"] == 3
+
+
+def test_gives_up_after_max_retries():
+    with FakeAPIServer(fail_first=10, retry_after=0.0) as server:
+        client = ScheduledClient(api_client(server), RequestScheduler(max_retries=2, base_delay=0.01))
+        with pytest.raises(anthropic.RateLimitError):
+            client.messages.create(**request())
+        assert server.requests == 3
+
+
+def test_does_not_retry_client_errors():
+    with FakeAPIServer(fail_first=1, fail_status=400) as server:
+        scheduler = RequestScheduler(base_delay=0.01)
+        client = ScheduledClient(api_client(server), scheduler)
+        with pytest.raises(anthropic.BadRequestError):
+            client.messages.create(**request())
+        assert server.requests == 1
+        assert scheduler.retries == 0
+        # nothing is left counted as in flight
+        assert client.messages.create(**request()).content[0].text == "ok"
+
+
+def test_stream_is_retried():
+    with FakeAPIServer(fail_first=1, retry_after=0.0) as server:
+        client = ScheduledClient(api_client(server), RequestScheduler(base_delay=0.01))
+        with client.messages.stream(**request()) as stream:
+            events = [event.type for event in stream]
+            message = stream.get_final_message()
+    assert message.content[0].text == "ok"
+    assert events[0] == "message_start"
+
+
+def test_burst_stays_within_rate_limit_headers():
+    # 3 requests per second, learned from the first response's headers
+    with FakeAPIServer(requests_per_minute=3, window=1.0) as server:
+        scheduler = RequestScheduler(base_delay=0.01, window=1.0)
+        client = ScheduledClient(api_client(server), scheduler)
+        client.messages.create(**request())
+        start = time.monotonic()
+        threads = [threading.Thread(target=client.messages.create, kwargs=request()) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    assert server.rejected == 0
+    assert server.requests == 7
+    # 2 requests were left in the bucket, the other 4 wait for it to refill
+    assert elapsed >= 1.0
+    metrics = scheduler.metrics()
+    assert metrics["max_queue_depth"] >= 4
+    assert metrics["max_wait"] >= 1.0
+
+
+def test_main_agent_goes_ahead_of_sub_agents():
+    arrivals = []
+
+    def respond(params):
+        arrivals.append(params["messages"][0]["content"])
+        return text_response("ok")
+
+    with FakeAPIServer(respond, fail_first=1, retry_after=0.3) as server:
+        scheduler = RequestScheduler(base_delay=0.01)
+        api = api_client(server)
+        sub_agent = ScheduledClient(api, scheduler, priority=SUB_AGENT_PRIORITY)
+        main_agent = ScheduledClient(api, scheduler, priority=MAIN_PRIORITY)
+
+        # the first request is rate limited, pausing the model while the others queue up
+        threads = [threading.Thread(target=sub_agent.messages.create, kwargs=request("sub 0"))]
+        threads[0].start()
+        while scheduler.retries == 0:
+            time.sleep(0.01)
+        threads += [threading.Thread(target=sub_agent.messages.create, kwargs=request(f"sub {i}")) for i in (1, 2)]
+        threads += [threading.Thread(target=main_agent.messages.create, kwargs=request("main"))]
+        for thread in threads[1:]:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+    assert arrivals[0] == "main"
+    assert sorted(arrivals) == ["main", "sub 0", "sub 1", "sub 2"]
+
+
+def test_async_client_retries():
+    async def run(server):
+        client = AsyncScheduledClient(
+            anthropic.AsyncAnthropic(api_key="fake", base_url=server.base_url, max_retries=0),
+            RequestScheduler(base_delay=0.01)
+        )
+        responses = await asyncio.gather(*[client.messages.create(**request()) for _ in range(3)])
+        async with client.messages.stream(**request()) as stream:
+            async for _ in stream:
+                pass
+            message = await stream.get_final_message()
+        return [response.content[0].text for response in responses] + [message.content[0].text]
+
+    with FakeAPIServer(fail_first=2, retry_after=0.05) as server:
+        assert asyncio.run(run(server)) == ["ok"] * 4
+        assert server.rejected == 2
+
+
+def test_retry_after_header_formats():
+    assert _retry_after({"retry-after": "2"}) == 2.0
+    assert _retry_after({"retry-after-ms": "1500", "retry-after": "9"}) == 1.5
+    assert _retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert _retry_after({"retry-after": "soon"}) is None
+    assert _retry_after({}) is None
+
+
+def test_cancelled_probe_does_not_block_the_model():
+    async def run(server, scheduler):
+        client = AsyncScheduledClient(
+            anthropic.AsyncAnthropic(api_key="fake", base_url=server.base_url, max_retries=0), scheduler
+        )
+        # the 429 makes the retry a probe, which is cancelled while it waits for the slow response
+        probe = asyncio.create_task(client.messages.create(**request("probe")))
+        while server.requests < 2:
+            await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        response = await asyncio.wait_for(client.messages.create(**request("next")), timeout=5)
+        return response.content[0].text
+
+    with FakeAPIServer(fail_first=1, retry_after=0.05, latency=0.5) as server:
+        scheduler = RequestScheduler(base_delay=0.01)
+        assert asyncio.run(run(server, scheduler)) == "ok"
+    assert scheduler.metrics()["in_flight"] == 0
@@ -0,0 +1,62 @@
+from tools.search import compile_pattern, search_file, search_project
+
+SOURCE = """import os
+
+
+class Parser:
+    def parse(self):
+        pass
+
+
+def main():
+    return Parser()
+"""
+
+
+def test_anchored_pattern_matches_line_starts(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    matches = search_file(str(path), "module.py", compile_pattern(r"^def "))
+    assert [match.line for match in matches] == [9]
+    matches = search_file(str(path), "module.py", compile_pattern(r"^class "))
+    assert [match.line for match in matches] == [4]
+
+
+def test_anchored_pattern_matches_line_ends(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    matches = search_file(str(path), "module.py", compile_pattern(r"\):$"))
+    assert [match.line for match in matches] == [5, 9]
+
+
+def test_anchored_pattern_with_crlf_line_endings(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_bytes(SOURCE.replace("\n", "\r\n").encode())
+    matches = search_file(str(path), "module.py", compile_pattern(r"\):$"))
+    assert [match.line for match in matches] == [5, 9]
+
+
+def test_search_project_with_anchored_pattern(tmp_path):
+    (tmp_path / "a.py").write_text(SOURCE)
+    (tmp_path / "b.txt").write_text("def not python\n")
+    result = search_project(str(tmp_path), compile_pattern(r"^def "), include=["*.py"])
+    assert [(match.path, match.line) for match in result.matches] == [("a.py", 9)]
+
+
+def test_file_without_match_is_skipped(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    assert search_file(str(path), "module.py", compile_pattern(r"^return")) == []
+
+
+def test_project_search_keeps_walk_order_and_stops_at_max_results(tmp_path):
+    for n in range(100):
+        (tmp_path / f"file_{n:03}.py").write_text(f"x = {n}\n")
+    result = search_project(str(tmp_path), compile_pattern(r"^x = "), max_results=1000, max_workers=2)
+    assert [match.path for match in result.matches] == [f"file_{n:03}.py" for n in range(100)]
+    assert (result.truncated, result.files_searched) == (False, 100)
+
+    result = search_project(str(tmp_path), compile_pattern(r"^x = "), max_results=30, max_workers=2)
+    assert [match.path for match in result.matches] == [f"file_{n:03}.py" for n in range(30)]
+    assert result.truncated
+    assert result.files_searched == 30
@@ -0,0 +1,101 @@
+import json
+import pytest
+from pydantic import BaseModel
+from agent import Agent
+from events import EventEmitter
+from session_store import INTERRUPTED_TOOL_ERROR, LOG_FILE, SessionStore
+from settings import Settings
+from tools import Tool
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+
+class SleepInput(BaseModel):
+    seconds: float = 0
+
+
+class SleepOutput(BaseModel):
+    slept: float
+
+
+def interrupted(input: SleepInput) -> SleepOutput:
+    # what Ctrl-C does to a tool call in progress
+    raise KeyboardInterrupt
+
+
+def create_agent(store: SessionStore, client: FakeClient, run=interrupted) -> Agent:
+    emitter = EventEmitter()
+    tool = Tool(
+        tool_name="sleep",
+        description="Sleeps",
+        input_schema=SleepInput,
+        output_schema=SleepOutput,
+        run=run,
+        emitter=emitter
+    )
+    return Agent(settings=Settings(), client=client, tools=[tool], emitter=emitter, session_store=store)  # type: ignore[arg-type]
+
+
+def assert_tool_uses_answered(messages: list) -> None:
+    for index, message in enumerate(messages):
+        if message["role"] != "assistant" or isinstance(message["content"], str):
+            continue
+        tool_ids = {block["id"] for block in message["content"] if block["type"] == "tool_use"}
+        if tool_ids:
+            results = {block["tool_use_id"] for block in messages[index + 1]["content"] if block["type"] == "tool_result"}
+            assert tool_ids <= results
+
+
+def test_append_and_load_round_trip(tmp_path):
+    store = SessionStore(str(tmp_path))
+    session = store.create(model="claude-haiku-4-5")
+    session.append({"role": "user", "content": "Hello"})
+    session.append({"role": "assistant", "content": [{"type": "text", "text": "Hi"}]})
+    session.replace([{"role": "user", "content": "Summary"}])
+    session.append({"role": "assistant", "content": [{"type": "text", "text": "Go on"}]})
+    session.close()
+    assert store.open(session.session_id).load() == [
+        {"role": "user", "content": "Summary"},
+        {"role": "assistant", "content": [{"type": "text", "text": "Go on"}]},
+    ]
+    assert store.list()[0].title == "Hello"
+
+
+def test_resume_after_interrupted_tool_call(tmp_path):
+    store = SessionStore(str(tmp_path))
+    crashed = create_agent(store, FakeClient([tool_use_response(("sleep", {"seconds": 1}), ("sleep", {"seconds": 2}))]))
+    with pytest.raises(KeyboardInterrupt):
+        crashed.run("Sleep twice")
+    session_id = crashed.session.session_id
+    crashed.session.close()
+
+    client = FakeClient([text_response("Done")])
+    agent = create_agent(store, client)
+    agent.resume(session_id)
+    last = agent.history[-1]
+    assert last["role"] == "user"
+    assert [json.loads(block["content"]) for block in last["content"]] == [{"error": INTERRUPTED_TOOL_ERROR}] * 2
+    assert all(block["is_error"] for block in last["content"])
+
+    assert agent.run("Try again") == "Done"
+    assert_tool_uses_answered(client.calls[0]["messages"])
+    agent.close()
+
+    # the repair was saved, so loading again gives the same history
+    history = store.open(session_id).load()
+    assert history == agent.history
+    assert_tool_uses_answered(history)
+
+
+def test_load_ignores_line_torn_by_crash(tmp_path):
+    store = SessionStore(str(tmp_path))
+    session = store.create()
+    session.append({"role": "user", "content": "Hello"})
+    session.close()
+    with open(tmp_path / session.session_id / LOG_FILE, "ab") as log:
+        log.write(b'{"op":"append","message":{"role":"assi')
+
+    reopened = store.open(session.session_id)
+    assert reopened.load() == [{"role": "user", "content": "Hello"}]
+    reopened.append({"role": "assistant", "content": [{"type": "text", "text": "Hi"}]})
+    reopened.close()
+    assert len(store.open(session.session_id).load()) == 2
@@ -0,0 +1,84 @@
+import json
+import anthropic
+from pydantic import BaseModel
+from agent import Agent
+from events import EventEmitter, TextDeltaEvent, ThinkingDeltaEvent, ToolInputDeltaEvent
+from settings import Settings
+from tools import Tool
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+from benchmarks.fake_server import FakeAPIServer
+
+
+class EchoInput(BaseModel):
+    text: str
+
+
+class EchoOutput(BaseModel):
+    text: str
+
+
+class Recorder:
+    """Event handler keeping everything emitted on its emitter."""
+
+    def __init__(self):
+        self.events = []
+        self.emitter = EventEmitter()
+        self.emitter.add_handler(self)
+
+    def handle(self, event):
+        self.events.append(event)
+
+    def of_type(self, event_type) -> list:
+        return [event for event in self.events if isinstance(event, event_type)]
+
+
+def create_echo_tool(emitter: EventEmitter) -> Tool:
+    return Tool(
+        tool_name="echo",
+        description="Echoes text",
+        input_schema=EchoInput,
+        output_schema=EchoOutput,
+        run=lambda input: EchoOutput(text=input.text),
+        emitter=emitter
+    )
+
+
+def streaming_agent(client, recorder: Recorder) -> Agent:
+    return Agent(
+        settings=Settings(),
+        client=client,
+        tools=[create_echo_tool(recorder.emitter)],
+        emitter=recorder.emitter,
+        stream=True
+    )
+
+
+def test_stream_emits_deltas_and_assembles_messages():
+    recorder = Recorder()
+    responses = [
+        tool_use_response(("echo", {"text": "hi"}), thinking="Echo it"),
+        text_response("Echoed hi", thinking="All done"),
+    ]
+    agent = streaming_agent(FakeClient(responses), recorder)
+    assert agent.run("Echo hi") == "Echoed hi"
+
+    assert [event.thinking for event in recorder.of_type(ThinkingDeltaEvent)] == ["Echo it", "All done"]
+    [tool_delta] = recorder.of_type(ToolInputDeltaEvent)
+    assert (tool_delta.tool_use_id, tool_delta.tool_name) == (responses[0].content[1].id, "echo")
+    assert json.loads(tool_delta.partial_json) == {"text": "hi"}
+    assert [(event.index, event.text) for event in recorder.of_type(TextDeltaEvent)] == [(1, "Echoed hi")]
+    # the streamed messages end up in history whole, as without streaming
+    assert [block["type"] for block in agent.history[1]["content"]] == ["thinking", "tool_use"]
+    assert agent.history[1]["content"][0]["signature"] == "fake"
+    assert json.loads(agent.history[2]["content"][0]["content"]) == {"text": "hi"}
+
+
+def test_stream_over_http():
+    recorder = Recorder()
+    with FakeAPIServer([tool_use_response(("echo", {"text": "hi"})), text_response("Echoed hi")]) as server:
+        client = anthropic.Client(api_key="fake", base_url=server.base_url, max_retries=0)
+        agent = streaming_agent(client, recorder)
+        agent.thinking_enabled = False
+        assert agent.run("Echo hi") == "Echoed hi"
+    assert [event.text for event in recorder.of_type(TextDeltaEvent)] == ["Echoed hi"]
+    assert agent.history[1]["content"][0]["input"] == {"text": "hi"}
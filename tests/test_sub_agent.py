@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from agent import Agent
+from events import AssistantMessageEvent, EventEmitter, SubAgentEvent
+from settings import Settings
+from tools.sub_agent_tool import SubAgentTool
+from benchmarks.fake_client import FakeClient, text_response
+
+
+class Recorder:
+    """Event handler keeping everything emitted on its emitter."""
+
+    def __init__(self):
+        self.events = []
+        self.emitter = EventEmitter()
+        self.emitter.add_handler(self)
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+class AgentFactory:
+    """create_agent for SubAgentTool: agents answer with their prompt after `latency`, or fail on "fail"."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.closed = 0
+
+    def respond(self, params):
+        prompt = params["messages"][0]["content"][0]["text"]
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency)
+        with self.lock:
+            self.active -= 1
+        if prompt == "fail":
+            raise RuntimeError("sub-agent failed")
+        return text_response(f"{prompt} done")
+
+    def __call__(self, agent_type: str, emitter: EventEmitter) -> Agent:
+        factory = self
+        client = FakeClient(self.respond)
+
+        class ClosingAgent(Agent):
+            def close(self):
+                with factory.lock:
+                    factory.closed += 1
+                super().close()
+
+        return ClosingAgent(settings=Settings(), client=client, emitter=emitter, thinking_enabled=False)  # type: ignore[arg-type]
+
+
+def jobs(*prompts: str) -> dict:
+    return {"jobs": [{"agent_type": "explore", "prompt": prompt} for prompt in prompts]}
+
+
+def test_jobs_run_concurrently_and_return_in_order():
+    factory = AgentFactory(latency=0.2)
+    tool = SubAgentTool(emitter=EventEmitter(), create_agent=factory, max_concurrency=3)
+    start = time.monotonic()
+    result = tool.execute(jobs("a", "b", "c", "d", "e", "f"))
+    elapsed = time.monotonic() - start
+    assert result.success, result.error
+    assert [job.result for job in result.data.results] == [f"{name} done" for name in "abcdef"]
+    assert factory.max_active == 3
+    assert elapsed < 1.0
+    assert factory.closed == 6
+
+
+def test_failed_job_is_reported_without_failing_the_batch():
+    tool = SubAgentTool(emitter=EventEmitter(), create_agent=AgentFactory())
+    result = tool.execute(jobs("a", "fail", "c"))
+    assert result.success
+    outcomes = [(job.result, job.error) for job in result.data.results]
+    assert outcomes == [("a done", None), (None, "sub-agent failed"), ("c done", None)]
+
+
+def test_job_events_are_tagged_with_their_job_id():
+    recorder = Recorder()
+    tool = SubAgentTool(emitter=recorder.emitter, create_agent=AgentFactory())
+    result = tool.execute(jobs("a", "b"))
+    job_ids = [job.job_id for job in result.data.results]
+    assert len(set(job_ids)) == 2
+    messages = {
+        event.job_id: event.event.text for event in recorder.events
+        if isinstance(event, SubAgentEvent) and isinstance(event.event, AssistantMessageEvent)
+    }
+    assert messages == {job_ids[0]: "a done", job_ids[1]: "b done"}
+
+
+def test_async_jobs_respect_max_concurrency():
+    factory = AgentFactory(latency=0.1)
+    tool = SubAgentTool(emitter=EventEmitter(), create_agent=factory, max_concurrency=2)
+    result = asyncio.run(tool.aexecute(jobs("a", "b", "c", "d")))
+    assert [job.result for job in result.data.results] == [f"{name} done" for name in "abcd"]
+    assert factory.max_active == 2
+    assert factory.closed == 4
+
+
+def test_single_prompt():
+    tool = SubAgentTool(emitter=EventEmitter(), create_agent=AgentFactory())
+    result = tool.execute({"agent_type": "plan", "prompt": "a"})
+    assert result.data.result == "a done"
+    assert not tool.execute({"agent_type": "plan"}).success
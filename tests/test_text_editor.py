@@ -0,0 +1,71 @@
+import pytest
+from events import EventEmitter
+from settings import EditMode, Settings
+from tools.text_editor_tool import TextEditorTool
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr("tools.utils.get_project_root", lambda: str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def editor():
+    settings = Settings()
+    settings.edit_mode = EditMode.ALWAYS
+    return TextEditorTool(emitter=EventEmitter(), settings=settings)
+
+
+def numbered(count: int) -> str:
+    return "".join(f"line {n}\n" for n in range(1, count + 1))
+
+
+def view(editor, path, view_range=None) -> str:
+    result = editor.execute({"command": "view", "path": str(path), "view_range": view_range})
+    assert result.success, result.error
+    return result.data.content
+
+
+def insert(editor, path, insert_line: int, text: str):
+    return editor.execute({"command": "insert", "path": str(path), "insert_line": insert_line, "insert_text": text})
+
+
+def test_view_range(project, editor):
+    path = project / "big.txt"
+    path.write_text(numbered(1000))
+    assert view(editor, path, [500, 502]) == "line 500\nline 501\nline 502\n"
+    assert view(editor, path, [999, -1]) == "line 999\nline 1000\n"
+    assert view(editor, path, [1000, 2000]) == "line 1000\n"
+    for bad_range in ([0, 2], [5, 4], [1001, -1], [1]):
+        result = editor.execute({"command": "view", "path": str(path), "view_range": bad_range})
+        assert not result.success, bad_range
+
+
+def test_insert_lines(project, editor):
+    path = project / "a.txt"
+    path.write_text(numbered(3))
+    assert insert(editor, path, 0, "first").success
+    assert insert(editor, path, 2, "middle\n").success
+    assert insert(editor, path, 5, "last").success
+    assert path.read_text() == "first\nline 1\nmiddle\nline 2\nline 3\nlast\n"
+    result = insert(editor, path, 7, "too far")
+    assert not result.success and "out of range" in (result.error or "")
+
+
+def test_insert_after_last_line_without_newline(project, editor):
+    path = project / "a.txt"
+    path.write_text("one\ntwo")
+    assert insert(editor, path, 2, "three").success
+    assert path.read_text() == "one\ntwo\nthree\n"
+
+
+def test_view_and_insert_see_outside_changes(project, editor):
+    path = project / "a.txt"
+    path.write_text(numbered(300))
+    assert view(editor, path, [200, 200]) == "line 200\n"
+    # rewritten by something else, e.g. a shell command
+    path.write_text(numbered(100))
+    assert view(editor, path, [100, -1]) == "line 100\n"
+    assert insert(editor, path, 50, "inserted").success
+    assert view(editor, path, [50, 52]) == "line 50\ninserted\nline 51\n"
@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from pydantic import BaseModel
+from agent import Agent
+from events import EventEmitter
+from settings import Settings
+from tools import Tool
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+
+class WaitInput(BaseModel):
+    name: str
+    seconds: float
+
+
+class WaitOutput(BaseModel):
+    name: str
+
+
+def create_wait_tool(emitter: EventEmitter, parallel_safe: bool, running: list[int]) -> Tool:
+    lock = threading.Lock()
+    active = [0]
+
+    def run(input: WaitInput) -> WaitOutput:
+        with lock:
+            active[0] += 1
+            running.append(active[0])
+        time.sleep(input.seconds)
+        with lock:
+            active[0] -= 1
+        return WaitOutput(name=input.name)
+
+    return Tool(
+        tool_name="wait",
+        description="Waits",
+        input_schema=WaitInput,
+        output_schema=WaitOutput,
+        run=run,
+        emitter=emitter,
+        parallel_safe=parallel_safe
+    )
+
+
+def run_turn(parallel_safe: bool) -> tuple[list[str], list[int]]:
+    """One turn calling the tool three times, slowest first. Returns the result names in history order and the concurrency seen."""
+    emitter = EventEmitter()
+    running: list[int] = []
+    calls = [("wait", {"name": name, "seconds": seconds}) for name, seconds in (("a", 0.3), ("b", 0.1), ("c", 0.2))]
+    client = FakeClient([tool_use_response(*calls), text_response("Done")])
+    agent = Agent(
+        settings=Settings(),
+        client=client,  # type: ignore[arg-type]
+        tools=[create_wait_tool(emitter, parallel_safe, running)],
+        emitter=emitter,
+        thinking_enabled=False
+    )
+    assert agent.run("Wait") == "Done"
+    results = agent.history[2]["content"]
+    return [json.loads(block["content"])["name"] for block in results], running  # type: ignore[index]
+
+
+def test_parallel_safe_tools_run_concurrently_in_order():
+    names, running = run_turn(parallel_safe=True)
+    assert names == ["a", "b", "c"]
+    assert max(running) == 3
+
+
+def test_other_tools_run_one_at_a_time():
+    names, running = run_turn(parallel_safe=False)
+    assert names == ["a", "b", "c"]
+    assert max(running) == 1
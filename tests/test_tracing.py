@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+import pytest
+from pydantic import BaseModel
+from agent import Agent
+from events import EventEmitter
+from settings import Settings
+from tools import Tool
+from tracing import Tracer, propagate, set_tracer, trace_span
+from benchmarks.fake_client import FakeClient, text_response, tool_use_response
+
+
+class SleepInput(BaseModel):
+    seconds: float
+    fail: bool = False
+
+
+class SleepOutput(BaseModel):
+    slept: float
+
+
+def sleep(input: SleepInput) -> SleepOutput:
+    time.sleep(input.seconds)
+    if input.fail:
+        raise RuntimeError("sleep failed")
+    return SleepOutput(slept=input.seconds)
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    set_tracer(tracer)
+    yield tracer
+    set_tracer(None)
+
+
+def create_agent(client: FakeClient) -> Agent:
+    tool = Tool(
+        tool_name="sleep",
+        description="Sleeps",
+        input_schema=SleepInput,
+        output_schema=SleepOutput,
+        run=sleep,
+        emitter=EventEmitter(),
+        parallel_safe=True
+    )
+    return Agent(settings=Settings(), client=client, tools=[tool], thinking_enabled=False)  # type: ignore[arg-type]
+
+
+def test_agent_run_spans_nest(tracer):
+    client = FakeClient([
+        tool_use_response(("sleep", {"seconds": 0.1}), ("sleep", {"seconds": 0.1, "fail": True})),
+        text_response("Done"),
+    ])
+    create_agent(client).run("Sleep")
+    spans = {span.span_id: span for span in tracer.spans}
+    [root] = [span for span in spans.values() if span.parent_id is None]
+    assert root.category == "agent"
+    assert {span.trace_id for span in spans.values()} == {root.trace_id}
+
+    def path(span) -> list[str]:
+        categories = []
+        while span is not None:
+            categories.append(span.category)
+            span = spans.get(span.parent_id)
+        return categories[::-1]
+
+    assert sorted(path(span) for span in spans.values()) == sorted([
+        ["agent"],
+        ["agent", "iteration"], ["agent", "iteration", "llm"],
+        ["agent", "iteration", "tool"], ["agent", "iteration", "tool"],
+        ["agent", "iteration"], ["agent", "iteration", "llm"],
+    ])
+    tools = [span for span in spans.values() if span.category == "tool"]
+    # the tool calls ran on worker threads, but still nest under their iteration
+    assert threading.get_ident() not in {span.thread_id for span in tools}
+    assert sorted(span.error or "" for span in tools) == ["", "sleep failed"]
+    for span in spans.values():
+        parent = spans.get(span.parent_id)
+        if parent is not None:
+            assert parent.start_ns <= span.start_ns <= span.end_ns <= parent.end_ns
+    llm_calls = sorted((span for span in spans.values() if span.category == "llm"), key=lambda span: span.start_ns)
+    assert [span.attributes["stop_reason"] for span in llm_calls] == ["tool_use", "end_turn"]
+
+
+def test_span_records_exceptions(tracer):
+    with pytest.raises(ValueError):
+        with trace_span("outer", "agent"):
+            raise ValueError("boom")
+    [span] = tracer.spans
+    assert span.error == "boom"
+    assert span.end_ns is not None
+
+
+def test_propagate_carries_the_span_to_threads(tracer):
+    def child():
+        with trace_span("child", "tool"):
+            pass
+
+    with trace_span("parent", "agent") as parent:
+        worker = threading.Thread(target=propagate(child))
+        worker.start()
+        worker.join()
+        orphan = threading.Thread(target=child)
+        orphan.start()
+        orphan.join()
+    children = [span for span in tracer.spans if span.name == "child"]
+    assert sorted(span.parent_id or "" for span in children) == ["", parent.span_id]
+
+
+def test_exports(tracer, tmp_path):
+    with trace_span("outer", "agent", model="fake-model"):
+        with trace_span("inner", "tool", tool="sleep", ok=True, count=3, ratio=0.5) as inner:
+            inner.error = "failed"
+
+    tracer.export_chrome_trace(str(tmp_path / "trace.json"))
+    chrome = json.loads((tmp_path / "trace.json").read_text())
+    outer_event, inner_event = chrome["traceEvents"]
+    assert (outer_event["name"], outer_event["ph"], outer_event["cat"]) == ("outer", "X", "agent")
+    assert inner_event["args"]["parent_id"] == outer_event["args"]["span_id"]
+    assert inner_event["args"]["error"] == "failed"
+    assert outer_event["ts"] <= inner_event["ts"] and inner_event["dur"] <= outer_event["dur"]
+
+    tracer.export_otlp(str(tmp_path / "trace.otlp.json"))
+    otlp = json.loads((tmp_path / "trace.otlp.json").read_text())
+    outer_span, inner_span = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert "parentSpanId" not in outer_span
+    assert inner_span["parentSpanId"] == outer_span["spanId"]
+    assert inner_span["traceId"] == outer_span["traceId"]
+    assert (outer_span["status"], inner_span["status"]) == ({"code": 1}, {"code": 2, "message": "failed"})
+    attributes = {attribute["key"]: attribute["value"] for attribute in inner_span["attributes"]}
+    assert attributes == {
+        "category": {"stringValue": "tool"},
+        "tool": {"stringValue": "sleep"},
+        "ok": {"boolValue": True},
+        "count": {"intValue": "3"},
+        "ratio": {"doubleValue": 0.5},
+    }
+
+
+def test_tracing_off():
+    with trace_span("outer", "agent") as span:
+        assert span is None
+
+    def fn():
+        pass
+    assert propagate(fn) is fn
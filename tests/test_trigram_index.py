@@ -0,0 +1,66 @@
+import os
+import re
+from tools.search import compile_pattern
+from tools.trigram_index import TrigramIndex, required_literals
+
+
+def test_required_literals():
+    assert required_literals("def parse") == [["def parse"]]
+    assert required_literals(r"class \w+Parser") == [["class ", "Parser"]]
+    assert required_literals("(foo|barbaz)_config") == [["foo", "_config"], ["barbaz", "_config"]]
+    assert required_literals("(?:import )+os") == [["import "]]
+
+
+def test_patterns_without_required_literals():
+    # too short, optional, or an alternation with an unconstrained branch
+    assert required_literals("ab") is None
+    assert required_literals(r"\w+\.c") is None
+    assert required_literals("(?:import )?os") is None
+    assert required_literals("foo|.*") is None
+    assert required_literals("(unclosed") is None
+
+
+def test_long_alternations_are_dropped():
+    branches = "|".join(f"{chr(ord('a') + n)}_name" for n in range(20))
+    assert required_literals(f"({branches})") is None
+    assert required_literals(f"({branches})_suffix") == [["_suffix"]]
+
+
+def write(root, files: dict[str, str]):
+    for path, text in files.items():
+        (root / path).write_text(text)
+
+
+def test_candidate_files(tmp_path):
+    write(tmp_path, {"a.py": "def parse_args():\n", "b.py": "class ArgParser:\n", "c.txt": "nothing here\n"})
+    index = TrigramIndex(str(tmp_path), db_path=str(tmp_path / "index.sqlite"), max_staleness=3600)
+    files = ["a.py", "b.py", "c.txt"]
+    try:
+        assert index.candidate_files(compile_pattern("def parse"), files) == ["a.py"]
+        assert index.candidate_files(compile_pattern("parse", ignore_case=True), files) == ["a.py", "b.py"]
+        assert index.candidate_files(compile_pattern("(parse_args|here)"), files) == ["a.py", "c.txt"]
+        # nothing to narrow on: every file is a candidate
+        assert index.candidate_files(compile_pattern(r"\w+"), files) == files
+    finally:
+        index.close()
+
+
+def test_changed_files_are_reindexed(tmp_path):
+    write(tmp_path, {"a.py": "old_name = 1\n", "b.py": "other = 2\n"})
+    db_path = str(tmp_path / "index.sqlite")
+    index = TrigramIndex(str(tmp_path), db_path=db_path, max_staleness=3600)
+    try:
+        assert index.candidate_files(re.compile("old_name"), ["a.py", "b.py"]) == ["a.py"]
+        write(tmp_path, {"b.py": "old_name = 3\n"})
+        index._on_change(os.path.join(tmp_path, "b.py"))
+        assert index.candidate_files(re.compile("old_name"), ["a.py", "b.py"]) == ["a.py", "b.py"]
+    finally:
+        index.close()
+    # the index persists, and files changed since are picked up on reopening
+    os.remove(tmp_path / "a.py")
+    index = TrigramIndex(str(tmp_path), db_path=db_path)
+    try:
+        assert index.candidate_files(re.compile("old_name"), ["b.py"]) == ["b.py"]
+        assert "a.py" not in index._known
+    finally:
+        index.close()
@@ -1,12 +1,16 @@
 from tools.tool import Tool, ToolResult
 from tools.bash_tool import BashTool, create_bash_tool
-from tools.bash_session import BashSession
+from tools.bash_session import AsyncBashSession, BashSession
+from tools.bash_pool import BashSessionPool
+from tools.bash_job_tool import BashJobTool, create_bash_job_tool
 from tools.glob_tool import create_glob_tool
 from tools.grep_tool import create_grep_tool
 from tools.ping_tool import create_ping_tool
 from tools.output_tool import create_output_tool
 from tools.read_file_tool import ReadFileTool, create_read_file_tool
 from tools.text_editor_tool import TextEditorTool, create_text_editor_tool
+from tools.multi_edit_tool import MultiEditTool, create_multi_edit_tool
+from tools.apply_patch_tool import ApplyPatchTool, create_apply_patch_tool
 from tools.sub_agent_tool import SubAgentTool, create_sub_agent_tool
 from tools.todo_tool import WriteTodosTool, create_write_todos_tool
 
@@ -15,17 +19,25 @@ __all__ = [
     "ToolResult",
     "BashTool",
     "BashSession",
+    "AsyncBashSession",
+    "BashSessionPool",
+    "BashJobTool",
     "ReadFileTool",
     "TextEditorTool",
+    "MultiEditTool",
+    "ApplyPatchTool",
     "SubAgentTool",
     "WriteTodosTool",
     "create_bash_tool",
+    "create_bash_job_tool",
     "create_glob_tool",
     "create_grep_tool",
     "create_ping_tool",
     "create_output_tool",
     "create_read_file_tool",
     "create_text_editor_tool",
+    "create_multi_edit_tool",
+    "create_apply_patch_tool",
     "create_sub_agent_tool",
     "create_write_todos_tool",
 ]
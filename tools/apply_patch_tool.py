@@ -0,0 +1,312 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Literal
+from pydantic import BaseModel, Field, model_validator
+from settings import Settings
+from tools.tool import Tool
+from tools.file_cache import get_file_cache
+from tools.multi_edit_tool import Edit, apply_edits, diff_preview
+from tools.text_editor_tool import confirm_edit
+from tools.utils import atomic_write, notify_file_changed
+from events import EventEmitter
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# how many lines a hunk's context may have moved from its header's line number
+HUNK_SEARCH_WINDOW = 100
+
+
+class FileChange(BaseModel):
+    path: str = Field(description="Path relative to the project root")
+    action: Literal["edit", "create", "delete"] = "edit"
+    edits: list[Edit] = Field(default=[], description="For edit: str_replace/insert edits, applied in order")
+    content: str | None = Field(default=None, description="For create: the new file's contents")
+
+
+class ApplyPatchInput(BaseModel):
+    patch: str | None = Field(default=None, description="A unified diff (as produced by `git diff` or `diff -u`)")
+    changes: list[FileChange] | None = Field(default=None, description="Structured per-file changes, instead of a patch")
+
+    @model_validator(mode="after")
+    def check_one_form(self) -> "ApplyPatchInput":
+        if (self.patch is None) == (self.changes is None):
+            raise ValueError("Provide exactly one of patch or changes")
+        return self
+
+
+class ApplyPatchOutput(BaseModel):
+    changed: list[str]  # "<action> <path>" per file
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    lines: list[tuple[str, str]] = field(default_factory=list)  # (" " | "-" | "+", text without newline)
+    old_no_newline: bool = False  # "\ No newline at end of file" after the old side's last line
+    new_no_newline: bool = False
+
+
+@dataclass
+class FileDiff:
+    old_path: str | None  # None for /dev/null
+    new_path: str | None
+    hunks: list[Hunk] = field(default_factory=list)
+
+
+def _diff_path(header: str) -> str | None:
+    path = header[4:].split("\t")[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def _mark_no_newline(hunk: Hunk):
+    """Handle a "\\ No newline at end of file" marker, which refers to the line before it."""
+    last_tag = hunk.lines[-1][0] if hunk.lines else " "
+    hunk.old_no_newline |= last_tag != "+"
+    hunk.new_no_newline |= last_tag != "-"
+
+
+def parse_unified_diff(patch: str) -> list[FileDiff]:
+    lines = patch.splitlines()
+    diffs: list[FileDiff] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            diffs.append(FileDiff(old_path=_diff_path(line), new_path=_diff_path(lines[i + 1])))
+            i += 2
+            continue
+        match = HUNK_HEADER.match(line)
+        if match is None:
+            # git headers (diff --git, index, mode lines) and commentary between files
+            i += 1
+            continue
+        if not diffs:
+            raise ValueError("Hunk before any ---/+++ file header")
+        old_count = int(match.group(2) or 1)
+        new_count = int(match.group(4) or 1)
+        hunk = Hunk(old_start=int(match.group(1)))
+        i += 1
+        # read exactly as many lines as the header promises
+        while (old_count > 0 or new_count > 0) and i < len(lines):
+            line = lines[i]
+            tag, text = (line[0], line[1:]) if line else (" ", "")
+            if tag == "\\":
+                _mark_no_newline(hunk)
+                i += 1
+                continue
+            if tag not in " -+":
+                raise ValueError(f"Malformed hunk line: {line!r}")
+            hunk.lines.append((tag, text))
+            old_count -= tag != "+"
+            new_count -= tag != "-"
+            i += 1
+        if old_count > 0 or new_count > 0:
+            raise ValueError(f"Hunk at line {hunk.old_start} is truncated")
+        # a "\ No newline" marker can follow the hunk's last line
+        while i < len(lines) and lines[i].startswith("\\"):
+            _mark_no_newline(hunk)
+            i += 1
+        diffs[-1].hunks.append(hunk)
+    if not diffs:
+        raise ValueError("No file diffs found in patch")
+    return diffs
+
+
+def _find_block(lines: list[str], block: list[str], expected: int, lower: int) -> int | None:
+    """
+    Index where block occurs in lines, searching outward from expected up to
+    HUNK_SEARCH_WINDOW lines away, and never before lower (the end of the previous hunk).
+    """
+    if not block:
+        return expected if lower <= expected <= len(lines) else None
+    highest = len(lines) - len(block)
+    for distance in range(HUNK_SEARCH_WINDOW + 1):
+        for start in (expected - distance, expected + distance) if distance else (expected,):
+            if lower <= start <= highest and lines[start:start + len(block)] == block:
+                return start
+    return None
+
+
+def apply_hunks(content: str, hunks: list[Hunk], path: str) -> str:
+    lines = content.split("\n")
+    trailing_newline = content.endswith("\n") or not content
+    if content.endswith("\n"):
+        lines.pop()
+    elif not content:
+        lines = []
+
+    drift = 0  # how far the file has shifted from the hunk headers' line numbers
+    lower = 0  # hunks apply in order, so each one starts after the previous one's lines
+    for number, hunk in enumerate(hunks, start=1):
+        old = [text for tag, text in hunk.lines if tag != "+"]
+        new = [text for tag, text in hunk.lines if tag != "-"]
+        # an empty old side means "insert after line old_start"
+        expected = (hunk.old_start if not old else hunk.old_start - 1) + drift
+        start = _find_block(lines, old, expected, lower)
+        if start is None:
+            raise ValueError(f"{path}: hunk {number} (line {hunk.old_start}) doesn't match the current file contents")
+        lines[start:start + len(old)] = new
+        lower = start + len(new)
+        drift = start - (expected - drift) + len(new) - len(old)
+        if hunk.new_no_newline:
+            trailing_newline = False
+        elif hunk.old_no_newline:
+            trailing_newline = True
+
+    return "\n".join(lines) + ("\n" if trailing_newline and lines else "")
+
+
+@dataclass
+class PlannedChange:
+    path: str  # absolute
+    action: Literal["edit", "create", "delete"]
+    old: str | None  # current contents, None if the file doesn't exist
+    new: str | None  # contents to write, None to delete
+    created_dirs: list[str] = field(default_factory=list)  # made for a created file, deepest first
+
+
+class ApplyPatchTool(Tool):
+    """
+    Applies changes to many files in one step. Every change is computed and validated
+    against the current file contents before anything is written, the user confirms
+    once, and if writing any file fails the files already written are restored.
+    """
+
+    def __init__(self, emitter: EventEmitter, settings: Settings):
+        self.settings = settings
+        super().__init__(
+            tool_name="apply_patch",
+            description="""
+            Change several files at once, e.g. for a rename across the codebase. Pass either:
+            - `patch`: a unified diff with ---/+++ headers and @@ hunks (paths relative to the project root; a/ and b/ prefixes are fine, /dev/null creates or deletes a file)
+            - `changes`: a list of {'path', 'action': 'edit'|'create'|'delete', 'edits': [...], 'content': ...}, where edits are multi_edit-style str_replace/insert edits
+            Nothing is written unless every change applies cleanly.
+            """,
+            input_schema=ApplyPatchInput,
+            output_schema=ApplyPatchOutput,
+            run=self._run_apply_patch,
+            emitter=emitter
+        )
+
+    def _resolve(self, path: str) -> str:
+        from tools.utils import get_project_root, validate_path_within_project
+        return validate_path_within_project(os.path.join(get_project_root(), path))
+
+    def _read(self, path: str) -> str | None:
+        if not os.path.exists(path):
+            return None
+        if not os.path.isfile(path):
+            raise ValueError(f"{path} is not a file")
+        return get_file_cache().read_text(path)
+
+    def _plan_patch(self, patch: str) -> list[PlannedChange]:
+        planned = []
+        for diff in parse_unified_diff(patch):
+            if diff.new_path is None:
+                assert diff.old_path is not None
+                path = self._resolve(diff.old_path)
+                old = self._read(path)
+                if old is None:
+                    raise ValueError(f"Can't delete {diff.old_path}: it doesn't exist")
+                planned.append(PlannedChange(path, "delete", old, None))
+                continue
+            path = self._resolve(diff.new_path)
+            old = self._read(path)
+            if diff.old_path is None:
+                if old is not None:
+                    raise ValueError(f"Can't create {diff.new_path}: it already exists")
+                planned.append(PlannedChange(path, "create", None, apply_hunks("", diff.hunks, diff.new_path)))
+            else:
+                if diff.old_path != diff.new_path:
+                    raise ValueError(f"Renames are not supported ({diff.old_path} -> {diff.new_path})")
+                if old is None:
+                    raise ValueError(f"Can't patch {diff.new_path}: it doesn't exist")
+                planned.append(PlannedChange(path, "edit", old, apply_hunks(old, diff.hunks, diff.new_path)))
+        return planned
+
+    def _plan_changes(self, changes: list[FileChange]) -> list[PlannedChange]:
+        planned = []
+        for change in changes:
+            path = self._resolve(change.path)
+            old = self._read(path)
+            if change.action == "create":
+                if old is not None:
+                    raise ValueError(f"Can't create {change.path}: it already exists")
+                planned.append(PlannedChange(path, "create", None, change.content or ""))
+            elif old is None:
+                raise ValueError(f"Can't {change.action} {change.path}: it doesn't exist")
+            elif change.action == "delete":
+                planned.append(PlannedChange(path, "delete", old, None))
+            else:
+                try:
+                    planned.append(PlannedChange(path, "edit", old, apply_edits(old, change.edits)))
+                except ValueError as e:
+                    raise ValueError(f"{change.path}: {e}")
+        return planned
+
+    def _preview(self, planned: list[PlannedChange]) -> str:
+        from tools.utils import get_project_root
+        parts = []
+        for change in planned:
+            rel_path = os.path.relpath(change.path, get_project_root())
+            if change.action == "delete":
+                parts.append(f"deleted {rel_path}\n")
+            else:
+                parts.append(diff_preview(rel_path, change.old or "", change.new or ""))
+        return "\n".join(parts)
+
+    def _write(self, change: PlannedChange, contents: str | None):
+        if contents is None:
+            if os.path.exists(change.path):
+                os.remove(change.path)
+                notify_file_changed(change.path)
+            # rolling back a create also removes the directories made for it
+            for directory in change.created_dirs if change.action == "create" else []:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+        else:
+            if change.action == "create":
+                directory = os.path.dirname(change.path)
+                while not os.path.exists(directory):
+                    change.created_dirs.append(directory)
+                    directory = os.path.dirname(directory)
+                os.makedirs(os.path.dirname(change.path), exist_ok=True)
+            atomic_write(change.path, contents)
+
+    def _run_apply_patch(self, input: ApplyPatchInput) -> ApplyPatchOutput:
+        planned = self._plan_patch(input.patch) if input.patch is not None else self._plan_changes(input.changes or [])
+        paths = [change.path for change in planned]
+        if len(set(paths)) != len(paths):
+            raise ValueError("Each file may only appear once")
+
+        confirm_edit(self.emitter, self.settings, self.tool_name, "apply_patch", ", ".join(paths), self._preview(planned))
+        for change in planned:
+            current = self._read(change.path)
+            if current != change.old:
+                raise ValueError(f"{change.path} changed while waiting for confirmation, no changes applied")
+
+        written: list[PlannedChange] = []
+        try:
+            for change in planned:
+                written.append(change)
+                self._write(change, change.new)
+        except Exception as e:
+            # put back every file we touched, including the one that failed
+            for change in reversed(written):
+                try:
+                    self._write(change, change.old)
+                except OSError:
+                    pass
+            raise ValueError(f"Failed to write {written[-1].path}, all changes were rolled back: {e}")
+
+        return ApplyPatchOutput(changed=[f"{change.action} {change.path}" for change in planned])
+
+
+def create_apply_patch_tool(emitter: EventEmitter, settings: Settings) -> ApplyPatchTool:
+    return ApplyPatchTool(emitter=emitter, settings=settings)
@@ -0,0 +1,172 @@
+import atexit
+import itertools
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import weakref
+
+
+def utf8_boundary(data: bytes) -> int:
+    """Length of data without a multi-byte UTF-8 sequence cut off at its end."""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte < 0x80:
+            return len(data)
+        if byte >= 0xC0:
+            # lead byte: how many bytes its sequence needs
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return len(data) if back >= needed else len(data) - back
+    return len(data)
+
+
+class OutputBuffer:
+    """
+    Output of a background job, addressed by absolute byte offset. The most recent
+    `max_memory_bytes` are kept in memory; older bytes are spilled to a temp file,
+    so long-running jobs use bounded memory but their full output stays readable.
+    """
+
+    def __init__(self, max_memory_bytes: int = 256 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = bytearray()
+        self._memory_start = 0  # absolute offset of the first byte in memory
+        self._spill = None  # temp file holding bytes [0, _memory_start), created on first spill
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._memory_start + len(self._memory)
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            self._memory += data
+            overflow = len(self._memory) - self.max_memory_bytes
+            if overflow > 0:
+                if self._spill is None:
+                    self._spill = tempfile.TemporaryFile(prefix="toy-agent-job-")
+                self._spill.write(self._memory[:overflow])
+                self._spill.flush()
+                del self._memory[:overflow]
+                self._memory_start += overflow
+
+    def read(self, offset: int, max_bytes: int) -> bytes:
+        with self._lock:
+            offset = max(0, offset)
+            end = min(offset + max_bytes, self.size)
+            if offset >= end:
+                return b""
+            chunks = []
+            if offset < self._memory_start:
+                assert self._spill is not None
+                spill_end = min(end, self._memory_start)
+                chunks.append(os.pread(self._spill.fileno(), spill_end - offset, offset))
+                offset = spill_end
+            if offset < end:
+                chunks.append(bytes(self._memory[offset - self._memory_start:end - self._memory_start]))
+            return b"".join(chunks)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+
+class BackgroundJob:
+    """A detached shell command whose combined stdout/stderr is collected into an OutputBuffer."""
+
+    def __init__(self, job_id: str, command: str, cwd: str | None = None):
+        self.job_id = job_id
+        self.command = command
+        self.started_at = time.time()
+        self.buffer = OutputBuffer()
+        self.process = subprocess.Popen(
+            ['/bin/bash', '-c', command],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            # own process group, so the job and its children can be killed together
+            start_new_session=True
+        )
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        assert self.process.stdout is not None
+        while data := self.process.stdout.read1(65536):
+            self.buffer.write(data)
+        self.process.stdout.close()
+
+    @property
+    def running(self) -> bool:
+        return self.process.poll() is None
+
+    @property
+    def exit_code(self) -> int | None:
+        return self.process.poll()
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for the job to exit and its output to be drained. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        self._reader.join(timeout=max(0, deadline - time.monotonic()))
+        return True
+
+    def kill(self, grace: float = 2.0):
+        """SIGTERM the job's process group, then SIGKILL it if it hasn't exited after grace seconds."""
+        if not self.running:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            if not self.wait(grace):
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.wait(grace)
+        except ProcessLookupError:
+            pass
+
+
+# every open JobManager, so one exit hook can kill their jobs without keeping them alive
+_managers: "weakref.WeakSet[JobManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all():
+    for manager in list(_managers):
+        manager.close()
+
+
+class JobManager:
+    """Starts and tracks background jobs. Running jobs are killed when the process exits."""
+
+    def __init__(self):
+        self.jobs: dict[str, BackgroundJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        _managers.add(self)
+
+    def start(self, command: str, cwd: str | None = None) -> BackgroundJob:
+        with self._lock:
+            job_id = f"job-{next(self._ids)}"
+            job = BackgroundJob(job_id, command, cwd=cwd)
+            self.jobs[job_id] = job
+            return job
+
+    def get(self, job_id: str) -> BackgroundJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Job {job_id} not found")
+        return job
+
+    def close(self):
+        _managers.discard(self)
+        for job in list(self.jobs.values()):
+            job.kill()
+            job.buffer.close()
+        self.jobs.clear()
@@ -0,0 +1,105 @@
+from typing import Literal
+from pydantic import BaseModel, Field
+from tools.tool import Tool
+from tools.bash_tool import BashTool
+from tools.background_jobs import BackgroundJob, utf8_boundary
+from events import EventEmitter
+
+
+class BashJobInput(BaseModel):
+    action: Literal["start", "poll", "wait", "kill", "list"] = Field(description="What to do with the job")
+    command: str | None = Field(default=None, description="The command to run in the background (start only)")
+    job_id: str | None = Field(default=None, description="The job to poll, wait for or kill")
+    offset: int = Field(default=0, description="Byte offset to read output from. Pass `next_offset` from the previous call to get only new output (other offsets may start mid-character)")
+    timeout: float = Field(default=30, description="Max seconds to wait for the job to finish (wait only)")
+    max_bytes: int = Field(default=16000, description="Max bytes of output to return")
+
+
+class BashJobInfo(BaseModel):
+    job_id: str
+    command: str
+    running: bool
+    exit_code: int | None = None
+    output_bytes: int
+
+
+class BashJobOutput(BaseModel):
+    job: BashJobInfo | None = None
+    output: str | None = None
+    next_offset: int | None = None  # offset to poll from next time
+    jobs: list[BashJobInfo] | None = None  # list only
+
+
+class BashJobTool(Tool):
+    """
+    Runs long commands (test suites, builds, dev servers) in the background, sharing the
+    job manager and working directory of a BashTool.
+    """
+
+    def __init__(self, emitter: EventEmitter, bash_tool: BashTool):
+        self.bash_tool = bash_tool
+        super().__init__(
+            tool_name="bash_job",
+            description="""
+            Run a shell command in the background instead of the `bash` tool, for anything that may take longer than 10 seconds (test suites, builds, servers).
+            - `start` with a `command` returns a `job_id`; the job starts in the bash tool's current directory.
+            - `poll` returns output since `offset` without waiting. Pass the returned `next_offset` on the next poll to only get new output.
+            - `wait` blocks until the job exits or `timeout` seconds pass, then returns output like `poll`.
+            - `kill` stops the job. `list` shows all jobs.
+            """,
+            input_schema=BashJobInput,
+            output_schema=BashJobOutput,
+            run=self._run_bash_job,
+            emitter=emitter
+        )
+
+    def _run_bash_job(self, input: BashJobInput) -> BashJobOutput:
+        jobs = self.bash_tool.jobs
+        if input.action == "list":
+            return BashJobOutput(jobs=[self._job_info(job) for job in jobs.jobs.values()])
+
+        if input.action == "start":
+            if input.command is None:
+                raise ValueError("Command is required")
+            approved, reason = self.emitter.request_confirmation(
+                tool_name=self.tool_name,
+                action="start",
+                path=None,
+                preview=f"Starting background job: {input.command}"
+            )
+            if not approved:
+                raise ValueError(f"Command skipped: {input.command} - {reason or 'no reason given'}")
+            job = jobs.start(input.command, cwd=self.bash_tool.session.cwd)
+            return BashJobOutput(job=self._job_info(job), next_offset=0)
+
+        if input.job_id is None:
+            raise ValueError("job_id is required")
+        job = jobs.get(input.job_id)
+        if input.action == "wait":
+            job.wait(input.timeout)
+        elif input.action == "kill":
+            job.kill()
+
+        data = job.buffer.read(input.offset, input.max_bytes)
+        if job.running or max(0, input.offset) + len(data) < job.buffer.size:
+            # end on a character boundary, so the next poll doesn't start mid-character;
+            # output that ends mid-character for good is decoded lossily
+            data = data[:utf8_boundary(data) or len(data)]
+        return BashJobOutput(
+            job=self._job_info(job),
+            output=data.decode(errors="replace"),
+            next_offset=max(0, input.offset) + len(data)
+        )
+
+    def _job_info(self, job: BackgroundJob) -> BashJobInfo:
+        return BashJobInfo(
+            job_id=job.job_id,
+            command=job.command,
+            running=job.running,
+            exit_code=job.exit_code,
+            output_bytes=job.buffer.size
+        )
+
+
+def create_bash_job_tool(emitter: EventEmitter, bash_tool: BashTool) -> BashJobTool:
+    return BashJobTool(emitter=emitter, bash_tool=bash_tool)
@@ -0,0 +1,193 @@
+import atexit
+import os
+import re
+import shlex
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+from tools.bash_session import BashSession
+
+VALID_ENV_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+# Prints a fresh session's variable names, then a "---" line, then commands restoring its
+# shell options, traps and umask
+BASELINE_COMMAND = 'compgen -v; echo ---; set +o; shopt -p; trap -p; echo "umask $(umask)"'
+
+
+@dataclass
+class SessionBaseline:
+    """State of a freshly started session, which resets return sessions to."""
+    variables: list[str]
+    restore: str  # shell commands restoring options, traps and umask
+
+
+def _capture_baseline(session: BashSession, timeout: float) -> SessionBaseline:
+    result = session.execute_command(BASELINE_COMMAND, timeout=timeout)
+    if result["timed_out"] or result["exit_code"] != 0:
+        raise RuntimeError(f"Could not read the state of a new bash session: {result['stderr']}")
+    variables, _, restore = result["stdout"].partition("---\n")
+    return SessionBaseline(variables=variables.split(), restore=restore)
+
+
+def _reset_command(cwd: str, baseline: SessionBaseline) -> str:
+    """
+    Shell command that returns a session to a clean state: back in cwd, with only the
+    environment this process started it with, no user-defined functions, aliases or
+    variables, and the shell options, traps and umask of a new session. It is best-effort:
+    readonly variables can't be unset, and variables a new session already had keep
+    whatever values they were given (except IFS).
+    """
+    exports = "\n".join(
+        f"export {name}={shlex.quote(value)}"
+        for name, value in os.environ.items()
+        if VALID_ENV_NAME.match(name)
+    )
+    keep = " ".join(baseline.variables)
+    return (
+        f"cd -- {shlex.quote(cwd)}\n"
+        "unalias -a\n"
+        "unset -f $(compgen -A function) 2>/dev/null\n"
+        "unset $(compgen -e) 2>/dev/null\n"
+        f'for __toy_name in $(compgen -v); do case " {keep} " in *" $__toy_name "*) ;; *) unset "$__toy_name" ;; esac; done 2>/dev/null\n'
+        "unset __toy_name\n"
+        "IFS=$' \\t\\n'\n"
+        "trap - $(compgen -A signal) ERR DEBUG RETURN 2>/dev/null\n"
+        f"{baseline.restore}"
+        f"{exports}"
+    )
+
+
+class BashSessionPool:
+    """
+    A pool of pre-warmed BashSessions, so agents (sub-agents especially) don't pay for a
+    process spawn each time they start. Sessions are leased with acquire()/release() or
+    the lease() context manager. On release a session is reset to `cwd`, the original
+    environment and a new session's shell state; sessions that can't be reset are discarded. At most `max_size` sessions
+    exist at once, and sessions idle for longer than `idle_timeout` are terminated down
+    to `min_idle` by a background reaper.
+    """
+
+    def __init__(
+        self,
+        cwd: str | None = None,
+        max_size: int = 8,
+        min_idle: int = 2,
+        idle_timeout: float = 300.0,
+        reset_timeout: float = 5.0,
+    ):
+        from tools.utils import get_project_root
+        self.cwd = cwd or get_project_root()
+        self.max_size = max_size
+        self.min_idle = min(min_idle, max_size)
+        self.idle_timeout = idle_timeout
+        self.reset_timeout = reset_timeout
+
+        self._idle: list[tuple[BashSession, float]] = []  # (session, time it was returned)
+        self._baseline: SessionBaseline | None = None  # read from the first session started
+        self._size = 0  # idle + leased + being created
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+        atexit.register(self.close)
+
+    def _spawn(self) -> BashSession:
+        try:
+            session = BashSession(cwd=self.cwd)
+            if self._baseline is None:
+                try:
+                    self._baseline = _capture_baseline(session, self.reset_timeout)
+                except Exception:
+                    session.terminate()
+                    raise
+            return session
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify_all()
+            raise
+
+    def _fill_idle(self):
+        """Start sessions until min_idle are waiting (or the pool is full)."""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) >= self.min_idle or self._size >= self.max_size:
+                    return
+                self._size += 1
+            session = self._spawn()
+            with self._cond:
+                self._idle.append((session, time.monotonic()))
+                self._cond.notify_all()
+
+    def _reap_loop(self):
+        self._fill_idle()
+        interval = max(1.0, min(self.idle_timeout / 4, 30.0))
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, timeout=interval)
+                if self._closed:
+                    return
+                now = time.monotonic()
+                expired = []
+                # oldest first; always keep min_idle sessions warm
+                while len(self._idle) > self.min_idle and now - self._idle[0][1] > self.idle_timeout:
+                    expired.append(self._idle.pop(0)[0])
+                self._size -= len(expired)
+            for session in expired:
+                session.terminate()
+            self._fill_idle()
+
+    def acquire(self, timeout: float | None = None) -> BashSession:
+        """Lease a session, waiting up to timeout seconds if the pool is at max_size."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._idle or self._size < self.max_size, timeout=timeout):
+                raise RuntimeError(f"No bash session available (pool max size is {self.max_size})")
+            if self._closed:
+                raise RuntimeError("Bash session pool is closed")
+            if self._idle:
+                # most recently returned first, it's the least likely to be reaped
+                return self._idle.pop()[0]
+            self._size += 1
+        return self._spawn()
+
+    def release(self, session: BashSession):
+        """Return a leased session. It is reset before it can be leased again."""
+        healthy = session.process.poll() is None and not self._closed and self._baseline is not None
+        if healthy:
+            assert self._baseline is not None
+            try:
+                result = session.execute_command(_reset_command(self.cwd, self._baseline), timeout=self.reset_timeout)
+                healthy = not result["timed_out"]
+            except Exception:
+                healthy = False
+        if not healthy:
+            session.terminate()
+        with self._cond:
+            if healthy:
+                self._idle.append((session, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[BashSession]:
+        session = self.acquire(timeout=timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close(self):
+        """Terminate idle sessions and stop the reaper. Leased sessions are terminated when released."""
+        with self._cond:
+            self._closed = True
+            idle = [session for session, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            session.terminate()
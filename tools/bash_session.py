@@ -1,104 +1,335 @@
 import subprocess
-import queue
-import threading
+import asyncio
 import os
+import selectors
+import signal
 import time
+import uuid
+
+# Keep the shell alive when a running command is interrupted; the command itself
+# still gets the default SIGINT behavior.
+SHELL_SETUP = "trap ':' INT\n"
+
+# How long a timed-out command gets to exit after SIGTERM before its process group is killed
+KILL_GRACE = 1.0
+
+# Exit code reported for a command that timed out, as coreutils timeout does
+TIMEOUT_EXIT_CODE = 124
+
+
+def _wrap_command(command: str, marker: str) -> bytes:
+    """
+    Append sentinel lines to a command. After it finishes, stderr gets the bare marker and
+    stdout gets the marker followed by the exit status and cwd, so both streams can be read
+    exactly up to the end of this command without waiting on timeouts. The command's stdin
+    is /dev/null: it shares the shell's stdin, and reading it would consume the sentinels.
+    """
+    return (
+        f"{{\n{command}\n}} </dev/null\n"
+        f"__toy_status=$?; printf '\\n{marker}\\n' >&2; printf '\\n{marker} %s %s\\n' \"$__toy_status\" \"$PWD\"\n"
+    ).encode()
+
+
+def _split_stdout(buffer: bytes, marker: str) -> tuple[bytes, int, str, bytes] | None:
+    """Split stdout at the status line: (output, exit code, cwd, remainder), or None if not seen yet."""
+    tag = f"\n{marker} ".encode()
+    start = buffer.find(tag)
+    if start == -1:
+        return None
+    end = buffer.find(b"\n", start + len(tag))
+    if end == -1:
+        return None
+    status, _, cwd = buffer[start + len(tag):end].decode(errors="replace").partition(" ")
+    return buffer[:start], int(status), cwd, buffer[end + 1:]
+
+
+def _split_stderr(buffer: bytes, marker: str) -> tuple[bytes, bytes] | None:
+    """Split stderr at the marker line: (output, remainder), or None if not seen yet."""
+    tag = f"\n{marker}\n".encode()
+    start = buffer.find(tag)
+    if start == -1:
+        return None
+    return buffer[:start], buffer[start + len(tag):]
+
 
 class BashSession:
-    def __init__(self):
+    """
+    A persistent bash process. Commands are written to its stdin and both output pipes
+    are read with a selector until the command's sentinel lines show up, so a command
+    returns as soon as it finishes.
+    """
+
+    def __init__(self, cwd: str | None = None):
+        self.cwd = cwd
         self._create_process()
-        self.output_queue = queue.Queue()
-        self.error_queue = queue.Queue()
-        self._start_readers()
-        
+        self._stdout_buffer = b""
+        self._stderr_buffer = b""
+
     def _create_process(self):
         self.process = subprocess.Popen(
             ['/bin/bash'],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=0
-        )
-    
-    def _start_readers(self):
-        # These threads READ from process pipes and WRITE to queues
-        def pipe_to_queue(pipe, q):
-            for line in iter(pipe.readline, ''):
-                q.put(line)
-            pipe.close()
-
-        self.output_thread = threading.Thread(
-            target=pipe_to_queue,
-            args=(self.process.stdout, self.output_queue),
-            daemon=True
-        )
-        self.error_thread = threading.Thread(
-            target=pipe_to_queue,
-            args=(self.process.stderr, self.error_queue),
-            daemon=True
+            bufsize=0,
+            cwd=self.cwd,
+            # own process group, so a running command can be interrupted
+            start_new_session=True
         )
-        self.output_thread.start()
-        self.error_thread.start()
-
-    def _read_output(self, timeout: float = 0.1) -> str:
-        """Read from output queue (populated by background thread)"""
-        lines = []
-        while True:
-            try:
-                line = self.output_queue.get(timeout=timeout)
-                lines.append(line)
-            except queue.Empty:
-                break
-        return ''.join(lines)
-
-    def _read_error(self, timeout: float = 0.1) -> str:
-        """Read from error queue (populated by background thread)"""
-        lines = []
-        while True:
-            try:
-                line = self.error_queue.get(timeout=timeout)
-                lines.append(line)
-            except queue.Empty:
-                break
-        return ''.join(lines)
-    
+        assert self.process.stdin is not None and self.process.stdout is not None and self.process.stderr is not None
+        self._selector = selectors.DefaultSelector()
+        for pipe in (self.process.stdout, self.process.stderr):
+            os.set_blocking(pipe.fileno(), False)
+            self._selector.register(pipe, selectors.EVENT_READ)
+        self.process.stdin.write(SHELL_SETUP.encode())
+
+    def _read_available(self, timeout: float) -> bool:
+        """Read whatever is available on either pipe within timeout. Returns False once both pipes are closed."""
+        for key, _ in self._selector.select(max(timeout, 0)):
+            data = os.read(key.fd, 65536)
+            if not data:
+                self._selector.unregister(key.fileobj)
+                if not self._selector.get_map():
+                    return False
+                continue
+            if key.fileobj is self.process.stdout:
+                self._stdout_buffer += data
+            else:
+                self._stderr_buffer += data
+        return bool(self._selector.get_map())
+
+    def _read_until_marker(self, marker: str, deadline: float) -> dict | None:
+        """Read until both sentinels for marker are seen. Returns None on timeout."""
+        stdout_result = _split_stdout(self._stdout_buffer, marker)
+        stderr_result = _split_stderr(self._stderr_buffer, marker)
+        while stdout_result is None or stderr_result is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if not self._read_available(remaining):
+                raise RuntimeError("Bash session exited; restart it to continue")
+            stdout_result = _split_stdout(self._stdout_buffer, marker)
+            stderr_result = _split_stderr(self._stderr_buffer, marker)
+
+        stdout, exit_code, cwd, self._stdout_buffer = stdout_result
+        stderr, self._stderr_buffer = stderr_result
+        self.cwd = cwd
+        return {
+            "stdout": stdout.decode(errors="replace"),
+            "stderr": stderr.decode(errors="replace"),
+            "exit_code": exit_code,
+            "cwd": cwd,
+            "timed_out": False,
+        }
+
+    def interrupt(self):
+        """Send SIGINT to the running command. The shell itself survives."""
+        try:
+            os.killpg(self.process.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+
     def restart(self):
         self.terminate()
-        self.__init__()
-        
+        self.__init__(self.cwd)
+
     def terminate(self):
         self.process.terminate()
-    
+        # reap it, so discarded sessions don't linger as zombies until garbage collection
+        try:
+            self.process.wait(timeout=KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._selector.close()
+
     def execute_command(self, command: str, timeout: float = 10) -> dict:
         if self.process.stdin is None:
             raise ValueError("Process stdin is not available")
+        deadline = time.monotonic() + timeout
+
+        # Unique marker per command, so output of one command can never end another
+        marker = f"__END_{uuid.uuid4().hex}__"
+        self.process.stdin.write(_wrap_command(command, marker))
+
+        result = self._read_until_marker(marker, deadline)
+        if result is not None:
+            return result
+
+        # Timed out. Interrupting only the foreground child would let the shell go on with
+        # the rest of the command, so the shell goes down with it and a fresh one takes its
+        # place in the same directory (environment changes are lost)
+        self._kill()
+        result = {
+            "stdout": self._stdout_buffer.decode(errors="replace"),
+            "stderr": self._stderr_buffer.decode(errors="replace"),
+            "exit_code": TIMEOUT_EXIT_CODE,
+            "cwd": self.cwd,
+            "timed_out": True,
+        }
+        self._stdout_buffer = b""
+        self._stderr_buffer = b""
+        self._selector.close()
+        self._create_process()
+        return result
+
+    def _kill(self):
+        """Stop the shell and everything in its process group, keeping the output they write on the way out."""
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + KILL_GRACE
+        while time.monotonic() < deadline and self._read_available(deadline - time.monotonic()):
+            pass
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+
+class AsyncBashSession:
+    """
+    asyncio counterpart of BashSession, reading the shell's pipes on the event loop.
+    Uses the same sentinel protocol. The shell is started lazily on the first command,
+    since asyncio subprocesses must be created inside a running loop.
+    """
+
+    def __init__(self, cwd: str | None = None):
+        self.cwd = cwd
+        self.process: asyncio.subprocess.Process | None = None
+        self._lock = asyncio.Lock()
+        self._stdout_buffer = b""
+        self._stderr_buffer = b""
+
+    async def _ensure_process(self) -> asyncio.subprocess.Process:
+        if self.process is None or self.process.returncode is not None:
+            self.process = await asyncio.create_subprocess_exec(
+                '/bin/bash',
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.cwd,
+                start_new_session=True
+            )
+            assert self.process.stdin is not None
+            self.process.stdin.write(SHELL_SETUP.encode())
+            self._stdout_buffer = b""
+            self._stderr_buffer = b""
+        return self.process
+
+    async def restart(self):
+        await self.terminate()
+        await self._ensure_process()
+
+    async def terminate(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+        self.process = None
+
+    def interrupt(self):
+        """Send SIGINT to the running command. The shell itself survives."""
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+
+    async def _read_stdout(self, stream: asyncio.StreamReader, marker: str) -> tuple[bytes, int, str, bytes]:
+        while (result := _split_stdout(self._stdout_buffer, marker)) is None:
+            data = await stream.read(65536)
+            if not data:
+                raise RuntimeError("Bash session exited; restart it to continue")
+            self._stdout_buffer += data
+        return result
+
+    async def _read_stderr(self, stream: asyncio.StreamReader, marker: str) -> tuple[bytes, bytes]:
+        while (result := _split_stderr(self._stderr_buffer, marker)) is None:
+            data = await stream.read(65536)
+            if not data:
+                raise RuntimeError("Bash session exited; restart it to continue")
+            self._stderr_buffer += data
+        return result
+
+    async def _read_until_marker(self, marker: str, timeout: float) -> dict | None:
+        """Read until both sentinels for marker are seen. Returns None on timeout."""
+        assert self.process is not None and self.process.stdout is not None and self.process.stderr is not None
+        try:
+            (stdout, exit_code, cwd, self._stdout_buffer), (stderr, self._stderr_buffer) = await asyncio.wait_for(
+                asyncio.gather(
+                    self._read_stdout(self.process.stdout, marker),
+                    self._read_stderr(self.process.stderr, marker),
+                ),
+                timeout=max(timeout, 0)
+            )
+        except asyncio.TimeoutError:
+            return None
+        self.cwd = cwd
+        return {
+            "stdout": stdout.decode(errors="replace"),
+            "stderr": stderr.decode(errors="replace"),
+            "exit_code": exit_code,
+            "cwd": cwd,
+            "timed_out": False,
+        }
+
+    async def execute_command(self, command: str, timeout: float = 10) -> dict:
+        async with self._lock:
+            process = await self._ensure_process()
+            assert process.stdin is not None
+            deadline = time.monotonic() + timeout
+
+            marker = f"__END_{uuid.uuid4().hex}__"
+            process.stdin.write(_wrap_command(command, marker))
+            await process.stdin.drain()
+
+            result = await self._read_until_marker(marker, deadline - time.monotonic())
+            if result is not None:
+                return result
+
+            # Timed out: as in BashSession, the shell is replaced so the rest of the command doesn't run
+            await self._kill(process)
+            result = {
+                "stdout": self._stdout_buffer.decode(errors="replace"),
+                "stderr": self._stderr_buffer.decode(errors="replace"),
+                "exit_code": TIMEOUT_EXIT_CODE,
+                "cwd": self.cwd,
+                "timed_out": True,
+            }
+            await self._ensure_process()
+            return result
+
+    async def _drain(self, stream: asyncio.StreamReader, stdout: bool):
+        while data := await stream.read(65536):
+            if stdout:
+                self._stdout_buffer += data
+            else:
+                self._stderr_buffer += data
+
+    async def _kill(self, process: asyncio.subprocess.Process):
+        """Stop the shell and everything in its process group, keeping the output they write on the way out."""
+        assert process.stdout is not None and process.stderr is not None
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(self._drain(process.stdout, True), self._drain(process.stderr, False)),
+                timeout=KILL_GRACE
+            )
+        except asyncio.TimeoutError:
+            pass
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
 
-        # Use marker to know when command is done
-        marker = f"__END__{os.getpid()}__"
-        full_command = f"{command}; echo {marker}\n"
-
-        self.process.stdin.write(full_command)
-        self.process.stdin.flush()
-
-        # Read until we see the marker
-        output_lines = []
-        start_time = time.time()
-        while (time.time() - start_time) < timeout:
-            try:
-                line = self.output_queue.get(timeout=0.1)
-                if marker in line:
-                    break
-                output_lines.append(line)
-            except queue.Empty:
-                pass
-
-        stdout = ''.join(output_lines)
-        stderr = self._read_error()
-
-        return {"stdout": stdout, "stderr": stderr}
-    
-    
 if __name__ == "__main__":
     session = BashSession()
     while True:
@@ -106,4 +337,4 @@ if __name__ == "__main__":
         if command == "exit":
             break
         result = session.execute_command(command)
-        print(result["stdout"])
\ No newline at end of file
+        print(result["stdout"])
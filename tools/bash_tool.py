@@ -1,6 +1,10 @@
+import asyncio
 from pydantic import BaseModel
-from tools.tool import Tool, ToolResult
-from tools.bash_session import BashSession
+from tools.tool import Tool, ToolResult, ToolTimer
+from tools.bash_session import AsyncBashSession, BashSession
+from tools.background_jobs import JobManager
+from tools.bash_pool import BashSessionPool
+from tools.utils import notify_tree_changed
 from anthropic.types import ToolUnionParam, ToolBash20250124Param
 from events import EventEmitter, ToolStartedEvent, ToolCompletedEvent, ToolErrorEvent
 
@@ -13,14 +17,38 @@ class BashInput(BaseModel):
 class BashOutput(BaseModel):
     stdout: str | None = None
     stderr: str | None = None
+    exit_code: int | None = None  # 124 if the command timed out
     is_error: bool = False
 
 
-class BashTool(Tool):
-    session: BashSession
+# max seconds a single command may run before it is killed
+COMMAND_TIMEOUT = 10
+
+
+def _to_output(result: dict) -> BashOutput:
+    stderr = result["stderr"]
+    if result["timed_out"]:
+        stderr += (
+            f"\nCommand timed out after {COMMAND_TIMEOUT} seconds and was killed. The shell was restarted "
+            "in the same directory; environment changes from earlier commands were lost"
+        )
+    return BashOutput(stdout=result["stdout"], stderr=stderr, exit_code=result["exit_code"])
 
-    def __init__(self, emitter: EventEmitter, session: BashSession | None = None):
-        self.session = session or BashSession()
+
+class BashTool(Tool):
+    session: BashSession | AsyncBashSession
+    jobs: JobManager  # background jobs, driven by the bash_job tool
+
+    def __init__(
+        self,
+        emitter: EventEmitter,
+        session: BashSession | AsyncBashSession | None = None,
+        pool: BashSessionPool | None = None
+    ):
+        # a session leased from pool is returned to it on close instead of terminated
+        self.pool = pool
+        self.session = session or (pool.acquire() if pool else BashSession())
+        self.jobs = JobManager()
         super().__init__(
             tool_name="bash",
             description="",  # not used - anthropic api overrides it.
@@ -37,6 +65,8 @@ class BashTool(Tool):
         )
 
     def _run_bash(self, i: BashInput) -> BashOutput:
+        if isinstance(self.session, AsyncBashSession):
+            raise ValueError("This bash tool uses an async session; call aexecute instead")
         if i.restart:
             self.session.restart()
             return BashOutput()
@@ -56,28 +86,104 @@ class BashTool(Tool):
                 stderr=f"Command skipped: {i.command} - {reason or 'no reason given'}"
             )
 
-        result = self.session.execute_command(i.command)
-        return BashOutput(stdout=result["stdout"], stderr=result["stderr"])
+        result = self.session.execute_command(i.command, timeout=COMMAND_TIMEOUT)
+        notify_tree_changed()
+        return _to_output(result)
 
     def execute(self, input: dict) -> ToolResult[BashOutput]:
+        timer = ToolTimer()
         self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
 
         try:
             input_model = self.input_schema.model_validate(input)
             result = self._run_bash(input_model)
             if result.is_error:
-                self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=result.stderr or "Unknown error"))
-                return ToolResult(success=False, error=result.stderr)
+                timing = timer.elapsed()
+                self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=result.stderr or "Unknown error", **timing))
+                return ToolResult(success=False, error=result.stderr, **timing)
 
+            timing = timer.elapsed()
             self.emitter.emit(ToolCompletedEvent(
                 tool_name=self.tool_name,
-                output=result.model_dump() if result else None
+                output=result.model_dump() if result else None,
+                **timing
             ))
-            return ToolResult(data=result)
+            return ToolResult(data=result, **timing)
         except Exception as e:
-            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e)))
-            return ToolResult(success=False, error=str(e))
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
+
+    def close(self) -> None:
+        self.jobs.close()
+        if isinstance(self.session, AsyncBashSession):
+            if self.session.process is not None and self.session.process.returncode is None:
+                self.session.process.terminate()
+        elif self.pool is not None:
+            self.pool.release(self.session)
+        else:
+            self.session.terminate()
+
+    async def _arun_bash(self, i: BashInput) -> BashOutput:
+        assert isinstance(self.session, AsyncBashSession)
+        if i.restart:
+            await self.session.restart()
+            return BashOutput()
+        if i.command is None:
+            raise ValueError("Command is required")
+
+        # Confirmation handlers are blocking (e.g. input()), keep them off the event loop
+        approved, reason = await asyncio.to_thread(
+            self.emitter.request_confirmation,
+            tool_name="bash",
+            action="execute",
+            path=None,
+            preview=f"Running bash command: {i.command}"
+        )
+        if not approved:
+            return BashOutput(
+                is_error=True,
+                stderr=f"Command skipped: {i.command} - {reason or 'no reason given'}"
+            )
+
+        result = await self.session.execute_command(i.command, timeout=COMMAND_TIMEOUT)
+        notify_tree_changed()
+        return _to_output(result)
+
+    async def aexecute(self, input: dict) -> ToolResult[BashOutput]:
+        if not isinstance(self.session, AsyncBashSession):
+            # blocking session, run it in a worker thread
+            return await super().aexecute(input)
+
+        timer = ToolTimer(track_cpu=False)
+        self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
 
+        try:
+            input_model = self.input_schema.model_validate(input)
+            result = await self._arun_bash(input_model)
+            if result.is_error:
+                timing = timer.elapsed()
+                self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=result.stderr or "Unknown error", **timing))
+                return ToolResult(success=False, error=result.stderr, **timing)
 
-def create_bash_tool(emitter: EventEmitter) -> BashTool:
-    return BashTool(emitter=emitter)
+            timing = timer.elapsed()
+            self.emitter.emit(ToolCompletedEvent(
+                tool_name=self.tool_name,
+                output=result.model_dump() if result else None,
+                **timing
+            ))
+            return ToolResult(data=result, **timing)
+        except Exception as e:
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
+
+
+def create_bash_tool(
+    emitter: EventEmitter,
+    async_session: bool = False,
+    pool: BashSessionPool | None = None
+) -> BashTool:
+    if async_session:
+        return BashTool(emitter=emitter, session=AsyncBashSession())
+    return BashTool(emitter=emitter, pool=pool)
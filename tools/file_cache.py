@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Total bytes of file contents kept in memory
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# Larger files are read but not cached, so one big file can't evict everything else
+MAX_CACHED_FILE_BYTES = 2 * 1024 * 1024
+
+FileKey = tuple[int, int, int]  # (inode, mtime_ns, size)
+
+
+def file_key(stat: os.stat_result) -> FileKey:
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass
+class _Entry:
+    key: FileKey
+    data: bytes
+    text: str | None = None  # decoded with universal newlines, filled on first read_text
+
+
+class FileContentCache:
+    """
+    Process-wide LRU cache of file contents, shared by every tool and agent.
+    Entries are validated against the file's (inode, mtime, size) on each read,
+    and dropped when our own tools write the file (see tools.utils.notify_file_changed).
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES, max_file_bytes: int = MAX_CACHED_FILE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, path: str) -> tuple[_Entry | None, FileKey]:
+        key = file_key(os.stat(path))
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.key == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry, key
+            self.misses += 1
+            return None, key
+
+    def _store(self, path: str, entry: _Entry):
+        size = len(entry.data) + (len(entry.text) if entry.text is not None else 0)
+        if size > self.max_file_bytes:
+            return
+        with self._lock:
+            self._remove(path)
+            self._entries[path] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= len(entry.data) + (len(entry.text) if entry.text is not None else 0)
+
+    def _read_file(self, path: str) -> tuple[bytes, FileKey]:
+        with open(path, "rb") as file:
+            key = file_key(os.fstat(file.fileno()))
+            return file.read(), key
+
+    def read_bytes(self, path: str) -> bytes:
+        path = os.path.abspath(path)
+        entry, _ = self._lookup(path)
+        if entry is not None:
+            return entry.data
+        data, key = self._read_file(path)
+        # only cache what matches the stat it was read with
+        if len(data) == key[2]:
+            self._store(path, _Entry(key=key, data=data))
+        return data
+
+    def read_text(self, path: str) -> str:
+        """Contents decoded like open(path, "r"): UTF-8 with universal newlines."""
+        path = os.path.abspath(path)
+        entry, key = self._lookup(path)
+        if entry is not None and entry.text is not None:
+            return entry.text
+        if entry is not None:
+            data = entry.data
+        else:
+            data, key = self._read_file(path)
+        text = data.decode().replace("\r\n", "\n").replace("\r", "\n")
+        if len(data) == key[2]:
+            self._store(path, _Entry(key=key, data=data, text=text))
+        return text
+
+    def key(self, path: str) -> FileKey:
+        """The current (inode, mtime, size) of path, to tell whether it changed since a read."""
+        return file_key(os.stat(path))
+
+    def invalidate(self, path: str | None = None):
+        """Drop path from the cache, or everything if path is None."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._remove(os.path.abspath(path))
+
+
+@lru_cache(maxsize=1)
+def get_file_cache() -> FileContentCache:
+    """The process-wide file content cache."""
+    from tools.utils import add_change_listener
+    cache = FileContentCache()
+
+    def on_change(path: str | None):
+        # stat validation already catches changes made elsewhere; only our own writes
+        # can land within the same mtime tick, so only those are dropped eagerly
+        if path is not None:
+            cache.invalidate(path)
+
+    add_change_listener(on_change)
+    return cache
@@ -0,0 +1,225 @@
+import bisect
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from tools.ignore import IgnoreMatcher, glob_to_regex
+
+
+@dataclass
+class _DirState:
+    mtime_ns: int
+    ignore_mtime_ns: int | None  # mtime of the directory's .gitignore, None if it has none
+    matcher: IgnoreMatcher  # rules in effect for entries of this directory
+    files: set[str] = field(default_factory=set)  # names, not paths
+    subdirs: set[str] = field(default_factory=set)
+
+
+class FileIndex:
+    """
+    In-memory index of the non-ignored files and directories under a project root.
+
+    Built on first use, then kept fresh incrementally: a refresh stats every indexed
+    directory and rescans only those whose mtime (or .gitignore) changed. Refreshes
+    happen at most every `max_staleness` seconds, except that paths reported through
+    file_changed() and a mark_stale() call are picked up by the next query.
+    """
+
+    def __init__(self, root: str, max_staleness: float = 2.0):
+        self.root = root
+        self.max_staleness = max_staleness
+        self._dirs: dict[str, _DirState] = {}  # rel dir ("" for the root) -> state
+        self._lock = threading.RLock()
+        self._last_refresh = 0.0
+        self._stale = False
+        self._changed_dirs: set[str] = set()  # directories to rescan on the next query
+        self._generation = 0  # bumped whenever the indexed set changes
+        self._paths: list[str] | None = None  # sorted files and dirs, rebuilt per generation
+        self._paths_generation = -1
+        self._files: list[str] | None = None  # sorted files only
+        self._glob_cache: dict[tuple[str, bool], list[str]] = {}
+
+    # --- scanning ---
+
+    def _stat_dir(self, rel_dir: str) -> tuple[int | None, int | None]:
+        path = os.path.join(self.root, rel_dir)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, None
+        try:
+            ignore_mtime_ns = os.stat(os.path.join(path, ".gitignore")).st_mtime_ns
+        except OSError:
+            ignore_mtime_ns = None
+        return mtime_ns, ignore_mtime_ns
+
+    def _matcher_for(self, rel_dir: str) -> IgnoreMatcher:
+        """Rules in effect inside rel_dir, built from its parent's state."""
+        if not rel_dir:
+            return IgnoreMatcher.for_root(self.root)
+        parent = rel_dir.rsplit("/", 1)[0] if "/" in rel_dir else ""
+        parent_state = self._dirs.get(parent)
+        parent_matcher = parent_state.matcher if parent_state else self._matcher_for(parent)
+        return parent_matcher.child(self.root, rel_dir)
+
+    def _scan_tree(self, rel_dir: str, matcher: IgnoreMatcher):
+        stack = [(rel_dir, matcher)]
+        while stack:
+            rel_dir, matcher = stack.pop()
+            mtime_ns, ignore_mtime_ns = self._stat_dir(rel_dir)
+            if mtime_ns is None:
+                continue
+            state = _DirState(mtime_ns, ignore_mtime_ns, matcher)
+            self._dirs[rel_dir] = state
+            for name, is_dir in self._list_dir(rel_dir, matcher):
+                if is_dir:
+                    state.subdirs.add(name)
+                    child = f"{rel_dir}/{name}" if rel_dir else name
+                    stack.append((child, matcher.child(self.root, child)))
+                else:
+                    state.files.add(name)
+        self._generation += 1
+
+    def _list_dir(self, rel_dir: str, matcher: IgnoreMatcher) -> list[tuple[str, bool]]:
+        try:
+            entries = list(os.scandir(os.path.join(self.root, rel_dir)))
+        except OSError:
+            return []
+        listed = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if matcher.is_ignored(rel_path, is_dir):
+                continue
+            if is_dir or entry.is_file():
+                listed.append((entry.name, is_dir))
+        return listed
+
+    def _drop_tree(self, rel_dir: str):
+        prefix = rel_dir + "/"
+        for path in [path for path in self._dirs if path == rel_dir or path.startswith(prefix) or not rel_dir]:
+            del self._dirs[path]
+        self._generation += 1
+
+    def _rescan_dir(self, rel_dir: str, state: _DirState, mtime_ns: int):
+        """Update one directory's entries in place, scanning new subdirectories recursively."""
+        files, subdirs = set(), set()
+        for name, is_dir in self._list_dir(rel_dir, state.matcher):
+            (subdirs if is_dir else files).add(name)
+        for name in state.subdirs - subdirs:
+            self._drop_tree(f"{rel_dir}/{name}" if rel_dir else name)
+        for name in subdirs - state.subdirs:
+            child = f"{rel_dir}/{name}" if rel_dir else name
+            self._scan_tree(child, state.matcher.child(self.root, child))
+        if files != state.files:
+            self._generation += 1
+        state.files, state.subdirs, state.mtime_ns = files, subdirs, mtime_ns
+
+    def _check_dir(self, rel_dir: str):
+        state = self._dirs.get(rel_dir)
+        if state is None:
+            return
+        mtime_ns, ignore_mtime_ns = self._stat_dir(rel_dir)
+        if mtime_ns is None:
+            self._drop_tree(rel_dir)
+        elif ignore_mtime_ns != state.ignore_mtime_ns:
+            # the rules changed, everything below may be (un)ignored now
+            self._drop_tree(rel_dir)
+            self._scan_tree(rel_dir, self._matcher_for(rel_dir))
+        elif mtime_ns != state.mtime_ns:
+            self._rescan_dir(rel_dir, state, mtime_ns)
+
+    def refresh(self, force: bool = False):
+        """Bring the index up to date with the filesystem."""
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirs:
+                self._scan_tree("", self._matcher_for(""))
+            elif force or self._stale or now - self._last_refresh > self.max_staleness:
+                for rel_dir in list(self._dirs):
+                    self._check_dir(rel_dir)
+            else:
+                for rel_dir in sorted(self._changed_dirs):
+                    self._check_dir(rel_dir)
+            self._changed_dirs.clear()
+            self._stale = False
+            self._last_refresh = now
+
+    def file_changed(self, path: str):
+        """Record that the file at path (absolute) was created, written or deleted."""
+        rel_path = os.path.relpath(path, self.root)
+        if rel_path.startswith(".."):
+            return
+        rel_dir = os.path.dirname(rel_path).replace(os.sep, "/")
+        with self._lock:
+            self._changed_dirs.add(rel_dir)
+            # a file created in a new directory: rescan the nearest indexed ancestor
+            while rel_dir and rel_dir not in self._dirs:
+                rel_dir = rel_dir.rsplit("/", 1)[0] if "/" in rel_dir else ""
+                self._changed_dirs.add(rel_dir)
+
+    def mark_stale(self):
+        """Anything may have changed (e.g. after a shell command): fully refresh on the next query."""
+        with self._lock:
+            self._stale = True
+
+    # --- queries ---
+
+    def _sorted_paths(self) -> tuple[list[str], list[str]]:
+        if self._paths is None or self._paths_generation != self._generation:
+            paths, files = [], []
+            for rel_dir, state in self._dirs.items():
+                prefix = f"{rel_dir}/" if rel_dir else ""
+                if rel_dir:
+                    paths.append(rel_dir)
+                files.extend(prefix + name for name in state.files)
+            files.sort()
+            paths.extend(files)
+            paths.sort()
+            self._paths, self._files = paths, files
+            self._paths_generation = self._generation
+            self._glob_cache.clear()
+        assert self._files is not None
+        return self._paths, self._files
+
+    def list_files(self, under: str = "") -> list[str]:
+        """Sorted '/'-separated paths of every indexed file below the directory `under`."""
+        with self._lock:
+            self.refresh()
+            _, files = self._sorted_paths()
+            if not under:
+                return list(files)
+            prefix = under.rstrip("/") + "/"
+            start = bisect.bisect_left(files, prefix)
+            end = bisect.bisect_left(files, prefix[:-1] + chr(ord("/") + 1))
+            return files[start:end]
+
+    def glob(self, pattern: str, recursive: bool = False) -> list[str]:
+        """Sorted indexed files and directories matching a glob pattern relative to the root."""
+        pattern = pattern.removeprefix("./")
+        if os.path.isabs(pattern):
+            pattern = os.path.relpath(pattern, self.root)
+            if pattern.startswith(".."):
+                return []
+        if not recursive:
+            # like glob.glob, ** is just * unless recursive
+            pattern = re.sub(r"\*\*+", "*", pattern)
+        with self._lock:
+            self.refresh()
+            paths, _ = self._sorted_paths()
+            key = (pattern, recursive)
+            cached = self._glob_cache.get(key)
+            if cached is None:
+                regex = re.compile(glob_to_regex(pattern.rstrip("/")))
+                cached = [path for path in paths if regex.fullmatch(path)]
+                self._glob_cache[key] = cached
+            return list(cached)
+
+
+@lru_cache(maxsize=1)
+def get_file_index() -> FileIndex:
+    """The process-wide index of the project root."""
+    from tools.utils import get_project_root
+    return FileIndex(get_project_root())
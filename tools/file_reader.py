@@ -0,0 +1,209 @@
+import hashlib
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# A NUL byte in the first block marks a file as binary
+BINARY_CHECK_BYTES = 8192
+# Reads returning more than this are cut short (or replaced by a head/tail preview)
+MAX_READ_BYTES = 100_000
+# Lines shown from each end of a file that is too large to return whole
+PREVIEW_LINES = 100
+# The line index records the offset of every LINE_INDEX_STRIDE-th line
+LINE_INDEX_STRIDE = 256
+# Line indexes kept in memory
+MAX_CACHED_INDEXES = 64
+
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as file:
+        return b"\0" in file.read(BINARY_CHECK_BYTES)
+
+
+class LineIndex:
+    """
+    Sparse index of line start offsets for one file, so a line range can be located
+    without reading everything before it. Built by scanning the file through mmap,
+    and extended in place when the file only grew (e.g. a log being appended to): the
+    indexed prefix is hashed, and the index is only extended if the prefix still matches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.checkpoints = array("Q", [0])  # byte offset of line k * LINE_INDEX_STRIDE
+        self.line_count = 0
+        self.size = 0  # bytes covered by the index
+        self.inode = 0
+        self.mtime_ns = 0
+        self._prefix_hash = hashlib.blake2b()  # of the bytes covered, to check the file was only appended to
+        self._ends_with_newline = True
+
+    def _scan(self, mm: mmap.mmap, start: int, end: int):
+        # lines fully terminated before `start` are already counted
+        lines = self.line_count - (0 if self._ends_with_newline else 1)
+        pos = start
+        while True:
+            newline = mm.find(b"\n", pos, end)
+            if newline == -1:
+                break
+            lines += 1
+            pos = newline + 1
+            if lines % LINE_INDEX_STRIDE == 0:
+                self.checkpoints.append(pos)
+        self._ends_with_newline = pos == end
+        self.line_count = lines + (0 if pos == end else 1)
+
+    def _appended(self, stat: os.stat_result, mm: mmap.mmap | None) -> bool:
+        """Whether the file is the indexed content plus more bytes after it."""
+        # same size but not current means it was rewritten, even if the inode is the same
+        if mm is None or stat.st_ino != self.inode or stat.st_size <= self.size:
+            return False
+        # hashing runs in C, so it is much cheaper than rescanning the prefix for newlines
+        with memoryview(mm) as view, view[:self.size] as prefix:
+            return hashlib.blake2b(prefix).digest() == self._prefix_hash.digest()
+
+    def update(self, stat: os.stat_result, mm: mmap.mmap | None):
+        """Bring the index up to date with the file. mm maps the whole file (None if it is empty)."""
+        if not self._appended(stat, mm):
+            self.checkpoints = array("Q", [0])
+            self.line_count = 0
+            self.size = 0
+            self._ends_with_newline = True
+            self._prefix_hash = hashlib.blake2b()
+        if mm is not None and stat.st_size > self.size:
+            self._scan(mm, self.size, stat.st_size)
+            with memoryview(mm) as view, view[self.size:stat.st_size] as added:
+                self._prefix_hash.update(added)
+        self.size = stat.st_size
+        self.inode = stat.st_ino
+        self.mtime_ns = stat.st_mtime_ns
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) == (self.inode, self.mtime_ns, self.size)
+
+    def line_offset(self, mm: mmap.mmap, line: int) -> int:
+        """Byte offset where 0-based line `line` starts (the file size past the last line)."""
+        if line >= self.line_count:
+            return self.size
+        checkpoint = line // LINE_INDEX_STRIDE
+        pos = self.checkpoints[checkpoint]
+        for _ in range(line - checkpoint * LINE_INDEX_STRIDE):
+            pos = mm.find(b"\n", pos, self.size) + 1
+        return pos
+
+
+_indexes: OrderedDict[str, LineIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _get_line_index(path: str, stat: os.stat_result, mm: mmap.mmap | None) -> LineIndex:
+    with _indexes_lock:
+        index = _indexes.pop(path, None) or LineIndex(path)
+        _indexes[path] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+        if not index.is_current(stat):
+            index.update(stat, mm)
+        return index
+
+
+@dataclass
+class FileSlice:
+    text: str
+    start_line: int  # 1-based, first line returned (0 for byte reads)
+    end_line: int  # 1-based, last line returned (0 for byte reads)
+    total_lines: int
+    size: int  # file size in bytes
+    truncated: bool = False  # cut short by MAX_READ_BYTES, or a head/tail preview
+
+
+def _open_map(path: str) -> tuple[os.stat_result, mmap.mmap | None]:
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        if stat.st_size == 0:
+            return stat, None
+        return stat, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def locate_line(path: str, line: int) -> tuple[int, int, bool]:
+    """
+    Byte offset where 0-based line `line` starts, via the line index. Also returns the
+    file's line count and whether it ends with a newline.
+    """
+    stat, mm = _open_map(path)
+    if mm is None:
+        return 0, 0, True
+    with mm:
+        index = _get_line_index(path, stat, mm)
+        return index.line_offset(mm, line), index.line_count, mm[-1:] == b"\n"
+
+
+def read_lines(path: str, offset: int = 1, limit: int | None = None, max_bytes: int = MAX_READ_BYTES) -> FileSlice:
+    """
+    Read `limit` lines starting at 1-based line `offset` (to the end if limit is None).
+    Only the requested range is read. Output is cut at a line boundary after max_bytes.
+    """
+    if offset < 1:
+        raise ValueError("offset must be >= 1")
+    stat, mm = _open_map(path)
+    if mm is None:
+        return FileSlice(text="", start_line=0, end_line=0, total_lines=0, size=0)
+    with mm:
+        index = _get_line_index(path, stat, mm)
+        first = min(offset - 1, index.line_count)
+        last = index.line_count if limit is None else min(index.line_count, first + limit)
+        start = index.line_offset(mm, first)
+        end = index.line_offset(mm, last)
+        truncated = end - start > max_bytes
+        if truncated:
+            # cut after the last complete line that fits, or mid-line if the first doesn't
+            cut = mm.rfind(b"\n", start, start + max_bytes)
+            end = cut + 1 if cut != -1 else start + max_bytes
+            last = first + mm[start:end].count(b"\n") + (0 if mm[end - 1:end] == b"\n" else 1)
+        text = mm[start:end].decode(errors="replace")
+    return FileSlice(
+        text=text,
+        start_line=first + 1 if last > first else 0,
+        end_line=last,
+        total_lines=index.line_count,
+        size=stat.st_size,
+        truncated=truncated
+    )
+
+
+def read_bytes(path: str, offset: int = 0, length: int | None = None, max_bytes: int = MAX_READ_BYTES) -> FileSlice:
+    """Read up to `length` bytes (capped at max_bytes) starting at byte `offset`."""
+    if offset < 0:
+        raise ValueError("byte_offset must be >= 0")
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        length = size - offset if length is None else length
+        data = os.pread(file.fileno(), max(0, min(length, max_bytes)), offset)
+    return FileSlice(
+        text=data.decode(errors="replace"),
+        start_line=0,
+        end_line=0,
+        total_lines=0,
+        size=size,
+        truncated=length > max_bytes and offset + max_bytes < size
+    )
+
+
+def read_preview(path: str, lines: int = PREVIEW_LINES, max_bytes: int = MAX_READ_BYTES) -> FileSlice:
+    """The first and last `lines` lines of a file, for files too large to return whole."""
+    head = read_lines(path, 1, lines, max_bytes // 2)
+    if head.total_lines <= 2 * lines:
+        return read_lines(path, 1, None, max_bytes)
+    tail = read_lines(path, head.total_lines - lines + 1, lines, max_bytes // 2)
+    omitted = tail.start_line - head.end_line - 1
+    return FileSlice(
+        text=f"{head.text}\n... [{omitted} lines omitted, read them with offset/limit] ...\n\n{tail.text}",
+        start_line=1,
+        end_line=head.total_lines,
+        total_lines=head.total_lines,
+        size=head.size,
+        truncated=True
+    )
@@ -1,5 +1,5 @@
-import glob as glob_module
 import os
+from typing import Literal
 from pydantic import BaseModel, Field
 from tools.tool import Tool
 from events import EventEmitter
@@ -8,11 +8,21 @@ from events import EventEmitter
 class GlobInput(BaseModel):
     pattern: str = Field(description="Glob pattern to match files (e.g., '*.py', '**/*.txt', 'src/**/*.js')")
     recursive: bool = Field(default=False, description="Whether to use recursive globbing (allows ** pattern)")
+    sort: Literal["path", "modified"] = Field(default="path", description="Sort by path, or by modification time (newest first)")
+    limit: int | None = Field(default=None, ge=1, description="Return at most this many matches")
 
 
 class GlobOutput(BaseModel):
     matches: list[str] = Field(description="List of file paths matching the pattern")
     count: int = Field(description="Number of matches found")
+    truncated: bool = Field(default=False, description="True if more matches were found than returned")
+
+
+def _modified_time(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
 
 
 def run_glob(input: GlobInput) -> GlobOutput:
@@ -23,45 +33,28 @@ def run_glob(input: GlobInput) -> GlobOutput:
     - ? matches a single character
     - [seq] matches any character in seq
     - ** matches directories recursively (when recursive=True)
+    Matches come from the project file index, so files ignored by .gitignore are never returned.
     """
-    from tools.utils import get_project_root, is_path_within_project
-
-    # Change to project root for consistent behavior
-    project_root = get_project_root()
-    original_dir = os.getcwd()
-
-    try:
-        os.chdir(project_root)
-
-        # Use glob with recursive option
-        if input.recursive:
-            matches = glob_module.glob(input.pattern, recursive=True)
-        else:
-            matches = glob_module.glob(input.pattern)
-
-        # Convert to absolute paths and filter to only those within project
-        absolute_matches = []
-        for match in matches:
-            abs_path = os.path.abspath(match)
-            if is_path_within_project(abs_path):
-                # Return relative paths for cleaner output
-                rel_path = os.path.relpath(abs_path, project_root)
-                absolute_matches.append(rel_path)
+    from tools.file_index import get_file_index
 
-        # Sort for consistent output
-        absolute_matches.sort()
+    index = get_file_index()
+    matches = index.glob(input.pattern, recursive=input.recursive)
+    if input.sort == "modified":
+        matches.sort(key=lambda path: _modified_time(os.path.join(index.root, path)), reverse=True)
 
-        return GlobOutput(matches=absolute_matches, count=len(absolute_matches))
-    finally:
-        os.chdir(original_dir)
+    count = len(matches)
+    if input.limit is not None:
+        matches = matches[:input.limit]
+    return GlobOutput(matches=matches, count=count, truncated=len(matches) < count)
 
 
 def create_glob_tool(emitter: EventEmitter) -> Tool:
     return Tool(
         tool_name="glob",
-        description="Find files matching a glob pattern. Use '*' for any characters, '?' for single character, '**' for recursive directory matching (set recursive=True). Example: {'pattern': '*.py'} or {'pattern': 'src/**/*.js', 'recursive': True}",
+        description="Find files matching a glob pattern. Use '*' for any characters, '?' for single character, '**' for recursive directory matching (set recursive=True). Files ignored by .gitignore are skipped. Use sort='modified' to get recently changed files first and `limit` to cap the result. Example: {'pattern': '*.py'} or {'pattern': 'src/**/*.js', 'recursive': True}",
         input_schema=GlobInput,
         output_schema=GlobOutput,
         run=run_glob,
-        emitter=emitter
+        emitter=emitter,
+        parallel_safe=True
     )
@@ -1,41 +1,86 @@
 import os
-from pydantic import BaseModel
+import re
+from pydantic import BaseModel, Field
 from tools.tool import Tool
+from tools.search import SearchMatch, compile_pattern, search_project
 from events import EventEmitter
-from typing import Literal
-import subprocess
 
 
 class GrepInput(BaseModel):
-    pattern: str
-    file: str
-    flags: list[Literal["-i", "-v", "-n", "-l", "-c", "-r", "-w", "-E", "-F"]] = []
+    pattern: str = Field(description="Regular expression (Python syntax) to search for")
+    path: str = Field(default=".", description="File or directory to search, relative to the project root")
+    include: list[str] = Field(default=[], description="Only search files matching these globs (e.g. '*.py', 'src/**/*.ts')")
+    exclude: list[str] = Field(default=[], description="Skip files matching these globs")
+    ignore_case: bool = False
+    fixed_strings: bool = Field(default=False, description="Treat the pattern as a literal string")
+    word: bool = Field(default=False, description="Only match whole words")
+    context_lines: int = Field(default=0, ge=0, le=10, description="Lines of context to return before and after each match")
+    max_results: int = Field(default=100, ge=1, le=1000, description="Stop after this many matches")
 
 
 class GrepOutput(BaseModel):
-    result: str
+    matches: list[SearchMatch]
+    count: int
+    truncated: bool = Field(description="True if the search stopped at max_results, so there may be more matches")
+    files_searched: int
 
 
-def run_grep(input: GrepInput) -> GrepOutput:
-    from tools.utils import validate_path_within_project
-    absolute_path = validate_path_within_project(input.file)
-    cmd = ["grep"] + input.flags + [input.pattern, absolute_path]
+def run_grep(input: GrepInput, use_index: bool = False) -> GrepOutput:
+    """Search the project. With use_index, the trigram index narrows the files to scan."""
+    from tools.file_index import get_file_index
+    from tools.trigram_index import get_trigram_index
+    from tools.utils import get_project_root, validate_path_within_project
+    project_root = get_project_root()
+    absolute_path = validate_path_within_project(os.path.join(project_root, input.path))
+    if not os.path.exists(absolute_path):
+        raise ValueError(f"Path {input.path} does not exist")
 
-    result = subprocess.run(
-        cmd,
-        text=True,
-        capture_output=True,
-        timeout=10
+    try:
+        regex = compile_pattern(input.pattern, input.ignore_case, input.fixed_strings, input.word)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern {input.pattern!r}: {e}")
+
+    rel_path = os.path.relpath(absolute_path, project_root)
+    rel_path = "" if rel_path == "." else rel_path.replace(os.sep, "/")
+    files = None
+    if not os.path.isfile(absolute_path):
+        files = get_file_index().list_files(rel_path)
+        if use_index:
+            files = get_trigram_index(project_root).candidate_files(regex, files)
+    result = search_project(
+        project_root,
+        regex,
+        path=rel_path,
+        files=files,
+        include=input.include,
+        exclude=input.exclude,
+        context_lines=input.context_lines,
+        max_results=input.max_results,
+    )
+    return GrepOutput(
+        matches=result.matches,
+        count=len(result.matches),
+        truncated=result.truncated,
+        files_searched=result.files_searched
     )
-    return GrepOutput(result=result.stdout)
 
 
-def create_grep_tool(emitter: EventEmitter) -> Tool:
+def create_grep_tool(emitter: EventEmitter, use_index: bool = False) -> Tool:
+    """
+    use_index keeps an on-disk trigram index of the project (under the user cache dir)
+    so repeated searches of large trees only scan files that can match.
+    """
     return Tool(
         tool_name="grep",
-        description="Search a file in this directory for a pattern. Call like so {{'pattern': 'pattern', 'file': 'file', 'flags': '-i'}}",
+        description="""
+        Search the project for a regex pattern. Searches the whole project by default, or a single file or directory with `path`.
+        Files ignored by .gitignore, the .git directory and binary files are skipped.
+        Narrow the search with `include`/`exclude` globs, e.g. {'pattern': 'def run', 'include': ['*.py']}.
+        Returns structured matches (path, line, column, text), at most `max_results` of them.
+        """,
         input_schema=GrepInput,
         output_schema=GrepOutput,
-        run=run_grep,
-        emitter=emitter
+        run=lambda input: run_grep(input, use_index=use_index),
+        emitter=emitter,
+        parallel_safe=True
     )
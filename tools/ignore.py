@@ -0,0 +1,165 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator
+
+# Never walked, whatever the ignore files say
+ALWAYS_IGNORED = {".git"}
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob into a regex matching a '/'-separated relative path."""
+    i = 0
+    parts: list[str] = []
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif c == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return "".join(parts)
+
+
+@dataclass
+class IgnoreRule:
+    regex: re.Pattern
+    base: str  # directory of the ignore file, relative to the root ("" for the root)
+    negate: bool
+    dir_only: bool
+    anchored: bool  # matched against the path below base instead of just the name
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        target = rel_path if self.anchored else rel_path.rsplit("/", 1)[-1]
+        return self.regex.fullmatch(target) is not None
+
+
+def parse_ignore_file(path: str, base: str) -> list[IgnoreRule]:
+    """Parse a .gitignore-style file whose patterns are relative to base."""
+    try:
+        with open(path, "r", errors="replace") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return []
+
+    rules = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # a slash anywhere but the end anchors the pattern to the ignore file's directory
+        anchored = "/" in line
+        line = line.lstrip("/")
+        rules.append(IgnoreRule(
+            regex=re.compile(glob_to_regex(line)),
+            base=base,
+            negate=negate,
+            dir_only=dir_only,
+            anchored=anchored,
+        ))
+    return rules
+
+
+class IgnoreMatcher:
+    """The ignore rules in effect for one directory: its own .gitignore plus every parent's."""
+
+    def __init__(self, rules: list[IgnoreRule] | None = None):
+        self.rules = rules or []
+
+    @classmethod
+    def for_root(cls, root: str) -> "IgnoreMatcher":
+        rules = parse_ignore_file(os.path.join(root, ".git", "info", "exclude"), "")
+        rules += parse_ignore_file(os.path.join(root, ".gitignore"), "")
+        return cls(rules)
+
+    def child(self, root: str, rel_dir: str) -> "IgnoreMatcher":
+        """Matcher for a subdirectory, adding its .gitignore if it has one."""
+        path = os.path.join(root, rel_dir, ".gitignore")
+        if not os.path.isfile(path):
+            return self
+        return IgnoreMatcher(self.rules + parse_ignore_file(path, rel_dir))
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        if rel_path.rsplit("/", 1)[-1] in ALWAYS_IGNORED:
+            return True
+        # the last matching rule wins
+        for rule in reversed(self.rules):
+            if rule.matches(rel_path, is_dir):
+                return not rule.negate
+        return False
+
+
+def iter_project_files(root: str, start: str = "") -> Iterator[str]:
+    """
+    Yield '/'-separated paths, relative to root, of every file under root/start that
+    isn't ignored by .gitignore rules. Ignored directories are not descended into, and
+    symlinked directories are not followed.
+    """
+    matcher = IgnoreMatcher.for_root(root)
+    # apply .gitignore files of the directories above start
+    parts = [part for part in start.split("/") if part]
+    for depth in range(1, len(parts) + 1):
+        matcher = matcher.child(root, "/".join(parts[:depth]))
+
+    stack = [("/".join(parts), matcher)]
+    while stack:
+        rel_dir, matcher = stack.pop()
+        try:
+            entries = sorted(os.scandir(os.path.join(root, rel_dir)), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if matcher.is_ignored(rel_path, is_dir):
+                continue
+            if is_dir:
+                subdirs.append(rel_path)
+            elif entry.is_file():
+                yield rel_path
+        # reversed so subdirectories are popped in sorted order
+        for rel_path in reversed(subdirs):
+            stack.append((rel_path, matcher.child(root, rel_path)))
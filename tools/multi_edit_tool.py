@@ -0,0 +1,113 @@
+import difflib
+import re
+from typing import Annotated, Literal, Union
+from pydantic import BaseModel, Field
+from settings import Settings
+from tools.tool import Tool
+from tools.file_cache import get_file_cache
+from tools.text_editor_tool import confirm_edit, validate_file
+from tools.utils import atomic_write
+from events import EventEmitter
+
+
+class ReplaceEdit(BaseModel):
+    command: Literal["str_replace"]
+    old_str: str = Field(description="Exact text to replace. Must appear exactly once in the file at the point this edit is applied")
+    new_str: str
+
+
+class InsertEdit(BaseModel):
+    command: Literal["insert"]
+    insert_line: int = Field(ge=0, description="Line number after which to insert the text (0 for the start of the file)")
+    insert_text: str
+
+
+Edit = Annotated[Union[ReplaceEdit, InsertEdit], Field(discriminator="command")]
+
+
+class MultiEditInput(BaseModel):
+    path: str
+    edits: list[Edit] = Field(min_length=1, description="Edits to apply in order; each sees the result of the previous ones")
+
+
+class MultiEditOutput(BaseModel):
+    content: str
+
+
+def insert_at_line(content: str, insert_line: int, text: str) -> str:
+    """Insert text as whole lines after line `insert_line` (1-based; 0 inserts at the start)."""
+    lines = re.findall(r"[^\n]*\n|[^\n]+$", content)
+    if insert_line > len(lines):
+        raise ValueError(f"insert_line {insert_line} is past the end of the file ({len(lines)} lines)")
+    if lines and insert_line == len(lines) and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    if text and not text.endswith("\n"):
+        text += "\n"
+    lines.insert(insert_line, text)
+    return "".join(lines)
+
+
+def apply_edits(content: str, edits: list[Edit]) -> str:
+    """Apply edits in order to content, raising ValueError on the first one that can't be applied."""
+    for number, edit in enumerate(edits, start=1):
+        if isinstance(edit, ReplaceEdit):
+            count = content.count(edit.old_str) if edit.old_str else 0
+            if count != 1:
+                problem = "not found" if count == 0 else f"found {count} times (must be unique)"
+                raise ValueError(f"Edit {number}: old_str {edit.old_str!r} {problem}")
+            content = content.replace(edit.old_str, edit.new_str, 1)
+        else:
+            try:
+                content = insert_at_line(content, edit.insert_line, edit.insert_text)
+            except ValueError as e:
+                raise ValueError(f"Edit {number}: {e}")
+    return content
+
+
+def diff_preview(path: str, old: str, new: str) -> str:
+    diff = difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True), fromfile=path, tofile=path, n=3
+    )
+    return "".join(line if line.endswith("\n") else line + "\n" for line in diff)
+
+
+class MultiEditTool(Tool):
+    """
+    Applies several str_replace/insert edits to one file in a single step: the file is
+    read once, every edit is validated before anything is written, the user confirms one
+    combined diff, and the result is written atomically.
+    """
+
+    def __init__(self, emitter: EventEmitter, settings: Settings):
+        self.settings = settings
+        super().__init__(
+            tool_name="multi_edit",
+            description="""
+            Apply several edits to one file at once. Prefer this over repeated str_replace_based_edit_tool calls when changing more than one place in a file.
+            Edits are applied in order, each to the result of the previous ones:
+            - {'command': 'str_replace', 'old_str': ..., 'new_str': ...} where old_str must appear exactly once
+            - {'command': 'insert', 'insert_line': N, 'insert_text': ...} inserts after line N (0 for the start)
+            If any edit fails, nothing is written.
+            """,
+            input_schema=MultiEditInput,
+            output_schema=MultiEditOutput,
+            run=self._run_multi_edit,
+            emitter=emitter
+        )
+
+    def _run_multi_edit(self, input: MultiEditInput) -> MultiEditOutput:
+        validate_file(input.path)
+        content = get_file_cache().read_text(input.path)
+        new_content = apply_edits(content, input.edits)
+        confirm_edit(
+            self.emitter, self.settings, self.tool_name, "multi_edit", input.path,
+            diff_preview(input.path, content, new_content)
+        )
+        if get_file_cache().read_text(input.path) != content:
+            raise ValueError(f"File {input.path} changed while waiting for confirmation, no edits applied")
+        atomic_write(input.path, new_content)
+        return MultiEditOutput(content=f"Applied {len(input.edits)} edits to {input.path}")
+
+
+def create_multi_edit_tool(emitter: EventEmitter, settings: Settings) -> MultiEditTool:
+    return MultiEditTool(emitter=emitter, settings=settings)
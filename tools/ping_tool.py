@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from tools.tool import Tool
 from events import EventEmitter
+import asyncio
 import subprocess
 
 
@@ -24,6 +25,22 @@ def run_ping(input: PingInput) -> PingOutput:
     return PingOutput(response=result.stdout)
 
 
+async def arun_ping(input: PingInput) -> PingOutput:
+    cmd = ["ping", "-c", "5", input.url]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, 10)
+    return PingOutput(response=stdout.decode())
+
+
 def create_ping_tool(emitter: EventEmitter) -> Tool:
     return Tool(
         tool_name="ping",
@@ -31,5 +48,7 @@ def create_ping_tool(emitter: EventEmitter) -> Tool:
         input_schema=PingInput,
         output_schema=PingOutput,
         run=run_ping,
-        emitter=emitter
+        arun=arun_ping,
+        emitter=emitter,
+        parallel_safe=True
     )
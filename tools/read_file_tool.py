@@ -1,29 +1,49 @@
 import os
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from tools.tool import Tool
+from tools.file_cache import FileKey, get_file_cache
+from tools.file_reader import BINARY_CHECK_BYTES, MAX_READ_BYTES, FileSlice, is_binary, read_bytes, read_lines, read_preview
 from events import EventEmitter, FileViewedEvent
 
 
 class ReadFileInput(BaseModel):
     path: str
+    offset: int | None = Field(default=None, ge=1, description="Line number to start reading from (1-based)")
+    limit: int | None = Field(default=None, ge=1, description="Number of lines to read")
+    byte_offset: int | None = Field(default=None, ge=0, description="Read raw bytes starting at this offset instead of lines")
+    byte_limit: int | None = Field(default=None, ge=1, description="Number of bytes to read from byte_offset")
+    only_if_changed: bool = Field(default=False, description="If you already read this file (same range) and it hasn't changed since, return `unchanged: true` instead of the contents again")
 
 
 class ReadFileOutput(BaseModel):
     contents: str
+    start_line: int | None = None
+    end_line: int | None = None
+    total_lines: int | None = None
+    size: int | None = None  # bytes
+    truncated: bool = False  # only part of the requested range (or a head/tail preview) was returned
+    binary: bool = False
+    unchanged: bool = False  # only_if_changed was set and the file is as it was at the last read
 
 
 class ReadFileTool(Tool):
     def __init__(self, emitter: EventEmitter):
+        # (path, range) -> file key at the time this tool last returned it, for only_if_changed
+        self._last_reads: dict[tuple, FileKey] = {}
         super().__init__(
             tool_name="read_file",
-            description="""Read a file in the current directory. Use this when you need to view the contents of a file. 
+            description=f"""Read a file in the current directory. Use this when you need to view the contents of a file.
             Always use this instead of the bash_tool (do not use cat or other bash commands to read files).
-            Call like so {{'path': 'path/to/file'}}
+            Call like so {{{{'path': 'path/to/file'}}}}, or {{{{'path': 'path/to/file', 'offset': 500, 'limit': 200}}}} to read lines 500-699.
+            Files larger than {MAX_READ_BYTES} bytes return a head/tail preview; read the rest with offset/limit.
+            Binary files are not returned unless you ask for a byte range with byte_offset/byte_limit.
+            To re-check a file you already read, set only_if_changed to avoid getting the same contents again.
             """,
             input_schema=ReadFileInput,
             output_schema=ReadFileOutput,
             run=self._run_read_file,
-            emitter=emitter
+            emitter=emitter,
+            parallel_safe=True
         )
 
     def _run_read_file(self, input: ReadFileInput) -> ReadFileOutput:
@@ -36,8 +56,57 @@ class ReadFileTool(Tool):
         if not os.path.exists(path):
             raise ValueError(f"File {path} does not exist")
 
-        with open(path, "r") as file:
-            return ReadFileOutput(contents=file.read())
+        key = get_file_cache().key(path)
+        read_key = (path, input.offset, input.limit, input.byte_offset, input.byte_limit)
+        if input.only_if_changed and self._last_reads.get(read_key) == key:
+            return ReadFileOutput(contents="", size=key[2], unchanged=True)
+        output = self._read(path, input, size=key[2])
+        self._last_reads[read_key] = key
+        return output
+
+    def _read(self, path: str, input: ReadFileInput, size: int) -> ReadFileOutput:
+        if input.byte_offset is not None or input.byte_limit is not None:
+            return self._to_output(read_bytes(path, input.byte_offset or 0, input.byte_limit))
+
+        whole_file = input.offset is None and input.limit is None
+        if whole_file and size <= MAX_READ_BYTES:
+            # small files come from the shared content cache
+            data = get_file_cache().read_bytes(path)
+            if b"\0" in data[:BINARY_CHECK_BYTES]:
+                return self._binary_output(size)
+            text = data.decode(errors="replace")
+            total_lines = text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+            return ReadFileOutput(
+                contents=text,
+                start_line=1 if total_lines else None,
+                end_line=total_lines or None,
+                total_lines=total_lines or None,
+                size=size
+            )
+
+        if is_binary(path):
+            return self._binary_output(size)
+        if whole_file:
+            return self._to_output(read_preview(path))
+        return self._to_output(read_lines(path, input.offset or 1, input.limit))
+
+    def _binary_output(self, size: int) -> ReadFileOutput:
+        return ReadFileOutput(
+            contents=f"[binary file, {size} bytes - use byte_offset/byte_limit to read raw bytes]",
+            size=size,
+            binary=True
+        )
+
+    def _to_output(self, file_slice: FileSlice) -> ReadFileOutput:
+        is_line_read = file_slice.total_lines > 0
+        return ReadFileOutput(
+            contents=file_slice.text,
+            start_line=file_slice.start_line if is_line_read else None,
+            end_line=file_slice.end_line if is_line_read else None,
+            total_lines=file_slice.total_lines if is_line_read else None,
+            size=file_slice.size,
+            truncated=file_slice.truncated
+        )
 
 
 def create_read_file_tool(emitter: EventEmitter) -> ReadFileTool:
@@ -0,0 +1,151 @@
+import fnmatch
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pydantic import BaseModel
+from tools.file_cache import get_file_cache
+from tools.file_reader import BINARY_CHECK_BYTES
+from tools.ignore import iter_project_files
+
+# Files larger than this are skipped, they are almost never source code
+MAX_FILE_BYTES = 10 * 1024 * 1024
+
+
+class SearchMatch(BaseModel):
+    path: str  # relative to the project root
+    line: int  # 1-based
+    column: int  # 1-based
+    text: str
+    before: list[str] = []  # context lines
+    after: list[str] = []
+
+
+class SearchResult(BaseModel):
+    matches: list[SearchMatch]
+    truncated: bool  # stopped at max_results, so there may be more matches
+    files_searched: int
+
+
+def compile_pattern(pattern: str, ignore_case: bool = False, fixed_strings: bool = False, word: bool = False) -> re.Pattern:
+    if fixed_strings:
+        pattern = re.escape(pattern)
+    if word:
+        pattern = rf"\b(?:{pattern})\b"
+    # lines are matched one at a time, but the whole-file check in search_file needs ^ and $ to match at line breaks
+    return re.compile(pattern, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+
+
+def _glob_matches(rel_path: str, globs: list[str]) -> bool:
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(rel_path, glob) or fnmatch.fnmatch(name, glob) for glob in globs)
+
+
+def read_text_file(path: str) -> str | None:
+    """Read a file as text, or None if it is binary, too large or unreadable."""
+    try:
+        if os.path.getsize(path) > MAX_FILE_BYTES:
+            return None
+        data = get_file_cache().read_bytes(path)
+    except OSError:
+        return None
+    if b"\0" in data[:BINARY_CHECK_BYTES]:
+        return None
+    return data.decode(errors="replace")
+
+
+def search_file(path: str, rel_path: str, regex: re.Pattern, context_lines: int = 0, limit: int | None = None) -> list[SearchMatch]:
+    text = read_text_file(path)
+    if text is None:
+        return []
+    # one search over the whole file first: most files don't match at all. With \r\n line
+    # endings a $ can't match before the \r there, though it does per line, so skip it
+    if "\r" not in text and regex.search(text) is None:
+        return []
+
+    lines = text.splitlines()
+    matches = []
+    for index, line in enumerate(lines):
+        match = regex.search(line)
+        if match is None:
+            continue
+        matches.append(SearchMatch(
+            path=rel_path,
+            line=index + 1,
+            column=match.start() + 1,
+            text=line,
+            before=lines[max(0, index - context_lines):index] if context_lines else [],
+            after=lines[index + 1:index + 1 + context_lines] if context_lines else [],
+        ))
+        if limit is not None and len(matches) >= limit:
+            break
+    return matches
+
+
+def search_project(
+    root: str,
+    regex: re.Pattern,
+    path: str = "",
+    files: list[str] | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    context_lines: int = 0,
+    max_results: int = 100,
+    max_workers: int = 8,
+) -> SearchResult:
+    """
+    Search every non-ignored text file under root/path (or the single file root/path).
+    `files` are the candidate paths under path, e.g. from the file index; the tree is
+    walked when it's omitted. The walk itself runs on the calling thread, and only
+    reading and scanning files is spread over the thread pool, but files are handed to
+    the pool as the walk finds them, so scanning overlaps the walk.
+    Matches come back in walk order and the search stops once max_results matches are
+    collected. `truncated` is then set if any files were left unscanned, even though
+    they may hold no more matches.
+    """
+    full_path = os.path.join(root, path)
+    if os.path.isfile(full_path):
+        candidates = [path]
+    else:
+        candidates = files if files is not None else iter_project_files(root, path)
+        candidates = (
+            rel_path for rel_path in candidates
+            if (not include or _glob_matches(rel_path, include)) and not (exclude and _glob_matches(rel_path, exclude))
+        )
+
+    done = threading.Event()
+
+    def scan(rel_path: str) -> list[SearchMatch]:
+        if done.is_set():
+            return []
+        return search_file(os.path.join(root, rel_path), rel_path, regex, context_lines, limit=max_results)
+
+    matches: list[SearchMatch] = []
+    files_searched = 0
+
+    def collect(future: Future) -> bool:
+        """Add one file's matches. Returns True once max_results is reached."""
+        nonlocal files_searched
+        files_searched += 1
+        matches.extend(future.result())
+        return len(matches) >= max_results
+
+    truncated = False
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # results are collected in file order, so once the cap is hit every earlier file
+        # has been fully scanned; a bounded number are in flight ahead of them
+        pending: deque[Future] = deque()
+        for rel_path in candidates:
+            pending.append(executor.submit(scan, rel_path))
+            if len(pending) > 4 * max_workers and collect(pending.popleft()):
+                truncated = True
+                break
+        else:
+            while pending:
+                if collect(pending.popleft()):
+                    truncated = len(matches) > max_results or bool(pending)
+                    break
+        done.set()
+
+    return SearchResult(matches=matches[:max_results], truncated=truncated, files_searched=files_searched)
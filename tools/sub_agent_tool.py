@@ -1,9 +1,13 @@
 from __future__ import annotations
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING, Callable, Literal
 from pydantic import BaseModel, Field
 from anthropic.types import ToolUnionParam, ToolParam
-from tools.tool import Tool, ToolResult
-from events import EventEmitter, ToolStartedEvent, ToolCompletedEvent, ToolErrorEvent
+from tools.tool import Tool, ToolResult, ToolTimer
+from tracing import propagate, trace_span
+from events import EventEmitter, ScopedEventEmitter, ToolStartedEvent, ToolCompletedEvent, ToolErrorEvent
 
 if TYPE_CHECKING:
     from agent import Agent
@@ -11,13 +15,30 @@ if TYPE_CHECKING:
 agent_types = Literal["explore", "plan"]
 
 
-class SubAgentInput(BaseModel):
+class SubAgentJob(BaseModel):
     agent_type: agent_types = Field(description="The type of sub-agent to create, specialized for different tasks.")
     prompt: str = Field(description="The prompt to send to the sub-agent")
 
 
+class SubAgentInput(BaseModel):
+    agent_type: agent_types | None = Field(default=None, description="The type of sub-agent to create, specialized for different tasks.")
+    prompt: str | None = Field(default=None, description="The prompt to send to the sub-agent")
+    jobs: list[SubAgentJob] | None = Field(
+        default=None,
+        description="Run several sub-agents concurrently instead of one. Use this instead of `agent_type` and `prompt`."
+    )
+
+
+class SubAgentJobResult(BaseModel):
+    job_id: str
+    agent_type: agent_types
+    result: str | None = None
+    error: str | None = None
+
+
 class SubAgentOutput(BaseModel):
-    result: str
+    result: str | None = None  # single agent_type/prompt call
+    results: list[SubAgentJobResult] | None = None  # batched jobs call, in job order
 
 
 class SubAgentTool(Tool):
@@ -27,8 +48,12 @@ class SubAgentTool(Tool):
         self,
         emitter: EventEmitter,
         create_agent: Callable[[agent_types, EventEmitter], Agent],
+        max_concurrency: int = 4,
     ):
         self.create_agent = create_agent
+        # max number of sub-agents from one batched call running at once
+        self.max_concurrency = max_concurrency
+        self._job_ids = itertools.count(1)
         super().__init__(
             tool_name="sub_agent",
             description="""
@@ -37,19 +62,89 @@ class SubAgentTool(Tool):
             The `prompt` parameter tells the agent what to focus on. Be very descriptive in your prompt!
             For example, for a `plan` agent, you should write out a detailed spec for what you want it to plan - describe the problem in detail, point to any relevant files, and describe the desired solution.
             Mention any details or suggestions that the user has provided.
+            To run several independent sub-agents at once, pass a list of `jobs` (each with its own `agent_type` and `prompt`) instead;
+            they run concurrently and their results are returned in the same order.
             """,
             input_schema=SubAgentInput,
             output_schema=SubAgentOutput,
             run=self._run_sub_agent,
+            arun=self._arun_sub_agent,
             emitter=emitter
         )
 
+    def _single_job(self, input: SubAgentInput) -> SubAgentJob:
+        if input.agent_type is None or input.prompt is None:
+            raise ValueError("Either `jobs` or both `agent_type` and `prompt` are required")
+        return SubAgentJob(agent_type=input.agent_type, prompt=input.prompt)
+
+    def _next_job_id(self, job: SubAgentJob) -> str:
+        return f"{job.agent_type}-{next(self._job_ids)}"
+
     def _run_sub_agent(self, input: SubAgentInput) -> SubAgentOutput:
+        if input.jobs:
+            job_ids = [self._next_job_id(job) for job in input.jobs]
+            with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+                results = list(executor.map(propagate(self._run_job), job_ids, input.jobs))
+            return SubAgentOutput(results=results)
+
+        job = self._single_job(input)
         # Pass emitter to create_agent so sub-agent gets the same emitter
-        agent = self.create_agent(input.agent_type, self.emitter)
-        result = agent.run(prompt=input.prompt, max_iterations=None)
+        agent = self.create_agent(job.agent_type, self.emitter)
+        try:
+            with trace_span(f"sub_agent {job.agent_type}", "sub_agent", agent_type=job.agent_type):
+                result = agent.run(prompt=job.prompt, max_iterations=None)
+        finally:
+            agent.close()
         return SubAgentOutput(result=result)
 
+    def _run_job(self, job_id: str, job: SubAgentJob) -> SubAgentJobResult:
+        """Run one job of a batch. Failures are reported per job rather than failing the batch."""
+        agent = self.create_agent(job.agent_type, ScopedEventEmitter(self.emitter, job_id))
+        try:
+            with trace_span(f"sub_agent {job_id}", "sub_agent", agent_type=job.agent_type, job_id=job_id):
+                result = agent.run(prompt=job.prompt, max_iterations=None)
+            return SubAgentJobResult(job_id=job_id, agent_type=job.agent_type, result=result)
+        except Exception as e:
+            return SubAgentJobResult(job_id=job_id, agent_type=job.agent_type, error=str(e))
+        finally:
+            agent.close()
+
+    async def _arun_sub_agent(self, input: SubAgentInput) -> SubAgentOutput:
+        if input.jobs:
+            semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+            async def run_limited(job_id: str, job: SubAgentJob) -> SubAgentJobResult:
+                async with semaphore:
+                    return await self._arun_job(job_id, job)
+
+            job_ids = [self._next_job_id(job) for job in input.jobs]
+            results = await asyncio.gather(*(run_limited(job_id, job) for job_id, job in zip(job_ids, input.jobs)))
+            return SubAgentOutput(results=list(results))
+
+        job = self._single_job(input)
+        agent = self.create_agent(job.agent_type, self.emitter)
+        with trace_span(f"sub_agent {job.agent_type}", "sub_agent", agent_type=job.agent_type):
+            return SubAgentOutput(result=await self._arun_agent(agent, job.prompt))
+
+    async def _arun_job(self, job_id: str, job: SubAgentJob) -> SubAgentJobResult:
+        agent = self.create_agent(job.agent_type, ScopedEventEmitter(self.emitter, job_id))
+        try:
+            with trace_span(f"sub_agent {job_id}", "sub_agent", agent_type=job.agent_type, job_id=job_id):
+                result = await self._arun_agent(agent, job.prompt)
+            return SubAgentJobResult(job_id=job_id, agent_type=job.agent_type, result=result)
+        except Exception as e:
+            return SubAgentJobResult(job_id=job_id, agent_type=job.agent_type, error=str(e))
+
+    async def _arun_agent(self, agent: Agent, prompt: str) -> str:
+        try:
+            arun = getattr(agent, "arun", None)
+            if arun is not None:
+                return await arun(prompt=prompt, max_iterations=None)
+            # sync agent, keep it off the event loop
+            return await asyncio.to_thread(agent.run, prompt=prompt, max_iterations=None)
+        finally:
+            agent.close()
+
     def to_anthropic_tool(self) -> ToolUnionParam:
         return ToolParam(
             name=self.tool_name,
@@ -59,24 +154,29 @@ class SubAgentTool(Tool):
         )
 
     def execute(self, input: dict) -> ToolResult[SubAgentOutput]:
+        timer = ToolTimer()
         self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
 
         try:
             input_model = SubAgentInput.model_validate(input)
             result = self._run_sub_agent(input_model)
 
+            timing = timer.elapsed()
             self.emitter.emit(ToolCompletedEvent(
                 tool_name=self.tool_name,
-                output=result.model_dump() if result else None
+                output=result.model_dump() if result else None,
+                **timing
             ))
-            return ToolResult(data=result)
+            return ToolResult(data=result, **timing)
         except Exception as e:
-            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e)))
-            return ToolResult(success=False, error=str(e))
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
 
 
 def create_sub_agent_tool(
     emitter: EventEmitter,
-    create_agent: Callable[[agent_types, EventEmitter], Agent]
+    create_agent: Callable[[agent_types, EventEmitter], Agent],
+    max_concurrency: int = 4
 ) -> SubAgentTool:
-    return SubAgentTool(emitter=emitter, create_agent=create_agent)
+    return SubAgentTool(emitter=emitter, create_agent=create_agent, max_concurrency=max_concurrency)
@@ -4,13 +4,17 @@ from anthropic.types import ToolTextEditor20250728Param, ToolUnionParam
 from pydantic import BaseModel, Field, RootModel
 from settings import Settings, EditMode
 from tools import ToolResult
-from tools.tool import Tool
+from tools.tool import Tool, ToolTimer
+from tools.file_cache import get_file_cache
+from tools.file_reader import MAX_READ_BYTES, is_binary, locate_line, read_lines, read_preview
+from tools.utils import atomic_insert, atomic_write
 from events import EventEmitter, FileViewedEvent, ToolStartedEvent, ToolCompletedEvent, ToolErrorEvent
 
 
 class TextEditorViewCommand(BaseModel):
     command: Literal["view"]
     path: str
+    view_range: list[int] | None = None  # [start, end], 1-based and inclusive; end -1 reads to EOF
 
 
 class TextEditorStrReplaceCommand(BaseModel):
@@ -47,6 +51,38 @@ class TextEditorOutput(BaseModel):
     content: str
 
 
+def validate_file(path: str, should_exist: bool = True) -> bool:
+    from tools.utils import validate_path_within_project
+    abs_path = validate_path_within_project(path)
+
+    exists = os.path.exists(abs_path)
+    if should_exist != exists:
+        raise ValueError(f"File {abs_path} {'already exists' if exists else 'does not exist'}")
+    return True
+
+
+def confirm_edit(emitter: EventEmitter, settings: Settings, tool_name: str, command: str, path: str, contents: str):
+    """Ask for confirmation of a file edit according to settings.edit_mode. Raises if it isn't allowed."""
+    match settings.edit_mode:
+        case EditMode.NEVER:
+            raise ValueError(f"Command '{command}' on file '{path}' is disabled in settings")
+        case EditMode.ALWAYS:
+            return True
+        case EditMode.ASK:
+            pass
+
+    # Use emitter for confirmation
+    approved, reason = emitter.request_confirmation(
+        tool_name=tool_name,
+        action=command,
+        path=path,
+        preview=contents
+    )
+    if not approved:
+        raise ValueError(f"Command '{command}' on file '{path}' skipped")
+    return True
+
+
 # https://platform.claude.com/docs/en/agents-and-tools/tool-use/text-editor-tool
 class TextEditorTool(Tool):
     # max characters to display when viewing a file
@@ -71,14 +107,22 @@ class TextEditorTool(Tool):
         if cmd.command == "view":
             self.emitter.emit(FileViewedEvent(path=cmd.path))
             self._validate_file(cmd.path)
-            with open(cmd.path, "r") as file:
-                return TextEditorOutput(content=file.read())
+            if is_binary(cmd.path):
+                raise ValueError(f"File {cmd.path} is binary and can't be viewed")
+            if cmd.view_range is not None:
+                content = self._view_range(cmd.path, cmd.view_range)
+            elif os.path.getsize(cmd.path) > MAX_READ_BYTES:
+                content = read_preview(cmd.path).text
+            else:
+                content = get_file_cache().read_text(cmd.path)
+            if self.max_characters is not None and len(content) > self.max_characters:
+                content = content[:self.max_characters] + f"\n... [truncated to {self.max_characters} characters, use view_range to see more]"
+            return TextEditorOutput(content=content)
 
         elif cmd.command == "str_replace":
             self._validate_file(cmd.path)
             # Read file to show preview before making changes
-            with open(cmd.path, "r") as file:
-                content = file.read()
+            content = get_file_cache().read_text(cmd.path)
             # Generate preview showing what will be replaced
             preview = self._generate_replace_preview(content, cmd.old_str, cmd.new_str)
             self._confirm_command(cmd.command, cmd.path, preview)
@@ -88,18 +132,14 @@ class TextEditorTool(Tool):
         elif cmd.command == "create":
             self._validate_file(cmd.path, should_exist=False)
             self._confirm_command(cmd.command, cmd.path, cmd.file_text)
-            with open(cmd.path, "w") as file:
-                file.write(cmd.file_text)
+            atomic_write(cmd.path, cmd.file_text)
             return TextEditorOutput(content=f"File {cmd.path} created")
 
         elif cmd.command == "insert":
             self._validate_file(cmd.path)
             self._confirm_command(cmd.command, cmd.path, cmd.insert_text)
-            with open(cmd.path, "a") as file:
-                # go to the line
-                file.seek(cmd.insert_line)
-                file.write(cmd.insert_text)
-            return TextEditorOutput(content=f"Line {cmd.insert_line} inserted")
+            self._run_insert(cmd)
+            return TextEditorOutput(content=f"Text inserted after line {cmd.insert_line}")
         else:
             raise ValueError(f"Invalid command: {cmd.command}")
 
@@ -152,46 +192,48 @@ class TextEditorTool(Tool):
         return "\n".join(preview_lines)
 
     def _run_replace(self, cmd: TextEditorStrReplaceCommand) -> bool:
-        with open(cmd.path, "r") as file:
-            content = file.read()
+        # served from the cache unless the file changed while waiting for confirmation
+        content = get_file_cache().read_text(cmd.path)
         count = content.count(cmd.old_str)
         if count > 1:
             raise ValueError(f"String '{cmd.old_str}' appears multiple times in {cmd.path}. Make it more specific.")
         if count == 0:
             raise ValueError(f"String '{cmd.old_str}' not found in {cmd.path}")
         new_content = content.replace(cmd.old_str, cmd.new_str, 1)
-        with open(cmd.path, "w") as file:
-            file.write(new_content)
+        atomic_write(cmd.path, new_content)
         return True
 
-    def _validate_file(self, path: str, should_exist: bool = True) -> bool:
-        from tools.utils import validate_path_within_project
-        abs_path = validate_path_within_project(path)
-
-        exists = os.path.exists(abs_path)
-        if should_exist != exists:
-            raise ValueError(f"File {abs_path} {'already exists' if exists else 'does not exist'}")
+    def _view_range(self, path: str, view_range: list[int]) -> str:
+        if len(view_range) != 2:
+            raise ValueError("view_range must be [start_line, end_line]")
+        start, end = view_range
+        if start < 1 or (end != -1 and end < start):
+            raise ValueError(f"Invalid view_range {view_range}")
+        # only the requested lines are read, located through the cached line index
+        file_slice = read_lines(path, start, None if end == -1 else end - start + 1)
+        if start > file_slice.total_lines:
+            raise ValueError(f"view_range starts past the end of the file ({file_slice.total_lines} lines)")
+        return file_slice.text
+
+    def _run_insert(self, cmd: TextEditorInsertCommand) -> bool:
+        # insert_line is the line after which to insert (0 inserts at the start of the file)
+        offset, line_count, ends_with_newline = locate_line(cmd.path, cmd.insert_line)
+        if not 0 <= cmd.insert_line <= line_count:
+            raise ValueError(f"insert_line {cmd.insert_line} is out of range, the file has {line_count} lines")
+        text = cmd.insert_text
+        if text and not text.endswith("\n"):
+            text += "\n"
+        if cmd.insert_line == line_count and not ends_with_newline:
+            # appending after a last line that has no newline of its own
+            text = "\n" + text
+        atomic_insert(cmd.path, offset, text.encode())
         return True
 
+    def _validate_file(self, path: str, should_exist: bool = True) -> bool:
+        return validate_file(path, should_exist)
+
     def _confirm_command(self, command: str, path: str, contents: str):
-        match self.settings.edit_mode:
-            case EditMode.NEVER:
-                raise ValueError(f"Command '{command}' on file '{path}' is disabled in settings")
-            case EditMode.ALWAYS:
-                return True
-            case EditMode.ASK:
-                pass
-
-        # Use emitter for confirmation
-        approved, reason = self.emitter.request_confirmation(
-            tool_name="str_replace_based_edit_tool",
-            action=command,
-            path=path,
-            preview=contents
-        )
-        if not approved:
-            raise ValueError(f"Command '{command}' on file '{path}' skipped")
-        return True
+        return confirm_edit(self.emitter, self.settings, self.tool_name, command, path, contents)
 
     def to_anthropic_tool(self) -> ToolUnionParam:
         return ToolTextEditor20250728Param(
@@ -201,20 +243,24 @@ class TextEditorTool(Tool):
         )
 
     def execute(self, input: dict) -> ToolResult[TextEditorOutput]:
+        timer = ToolTimer()
         self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
 
         try:
             input_model = self.input_schema.model_validate(input)
             result = self._run_text_editor(input_model)
 
+            timing = timer.elapsed()
             self.emitter.emit(ToolCompletedEvent(
                 tool_name=self.tool_name,
-                output=result.model_dump() if result else None
+                output=result.model_dump() if result else None,
+                **timing
             ))
-            return ToolResult(data=result)
+            return ToolResult(data=result, **timing)
         except Exception as e:
-            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e)))
-            return ToolResult(success=False, error=str(e))
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
 
 
 def create_text_editor_tool(emitter: EventEmitter, settings: Settings) -> TextEditorTool:
@@ -1,5 +1,7 @@
+import asyncio
+import time
 from dataclasses import dataclass
-from typing import Callable, Generic, TypeVar, cast
+from typing import Awaitable, Callable, Generic, TypeVar, cast
 from anthropic.types import ToolParam, ToolUnionParam
 from pydantic import BaseModel
 from events import EventEmitter, ToolStartedEvent, ToolCompletedEvent, ToolErrorEvent
@@ -13,6 +15,8 @@ class ToolResult(BaseModel, Generic[OutputType]):
     success: bool = True
     data: OutputType | None = None
     error: str | None = None
+    wall_time: float | None = None  # seconds the call took
+    cpu_time: float | None = None  # CPU seconds used by the thread running it
 
     @property
     def is_error(self) -> bool:
@@ -26,6 +30,26 @@ class ToolResult(BaseModel, Generic[OutputType]):
             return self.data.model_dump()
         return {}
 
+
+class ToolTimer:
+    """
+    Wall-clock and CPU time of one tool call. CPU time is measured for the calling thread,
+    so it leaves out subprocesses, and is skipped for async calls where the event loop
+    thread is shared with other coroutines.
+    """
+
+    def __init__(self, track_cpu: bool = True):
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time() if track_cpu else None
+
+    def elapsed(self) -> dict[str, float | None]:
+        """wall_time/cpu_time keyword arguments for tool events and results."""
+        return {
+            "wall_time": time.perf_counter() - self._wall_start,
+            "cpu_time": time.thread_time() - self._cpu_start if self._cpu_start is not None else None,
+        }
+
+
 @dataclass
 class Tool(Generic[InputType, OutputType]):
     tool_name: str
@@ -34,6 +58,11 @@ class Tool(Generic[InputType, OutputType]):
     output_schema: type[OutputType]
     run: Callable[[InputType], OutputType]
     emitter: EventEmitter
+    # Safe to run concurrently with other parallel-safe tools from the same turn.
+    # Only read-only tools without confirmation prompts should set this.
+    parallel_safe: bool = False
+    # Optional native async implementation, used by aexecute
+    arun: Callable[[InputType], Awaitable[OutputType]] | None = None
 
     def to_anthropic_tool(self) -> ToolUnionParam:
         return ToolParam(
@@ -44,18 +73,51 @@ class Tool(Generic[InputType, OutputType]):
         )
 
     def execute(self, input: dict) -> ToolResult[OutputType]:
+        timer = ToolTimer()
         self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
 
         try:
             input_model = self.input_schema.model_validate(input)
             output = self.run(cast(InputType, input_model))
 
+            timing = timer.elapsed()
+            self.emitter.emit(ToolCompletedEvent(
+                tool_name=self.tool_name,
+                output=output.model_dump() if output else None,
+                **timing
+            ))
+
+            return ToolResult(data=output, **timing)
+        except Exception as e:
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
+
+    def close(self) -> None:
+        """Release any resources held by the tool (processes, sessions). Called when its agent is done."""
+        pass
+
+    async def aexecute(self, input: dict) -> ToolResult[OutputType]:
+        if self.arun is None:
+            # Sync-only tool: run it in a worker thread so the event loop isn't blocked
+            return await asyncio.to_thread(self.execute, input)
+
+        timer = ToolTimer(track_cpu=False)
+        self.emitter.emit(ToolStartedEvent(tool_name=self.tool_name, input=input))
+
+        try:
+            input_model = self.input_schema.model_validate(input)
+            output = await self.arun(cast(InputType, input_model))
+
+            timing = timer.elapsed()
             self.emitter.emit(ToolCompletedEvent(
                 tool_name=self.tool_name,
-                output=output.model_dump() if output else None
+                output=output.model_dump() if output else None,
+                **timing
             ))
 
-            return ToolResult(data=output)
+            return ToolResult(data=output, **timing)
         except Exception as e:
-            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e)))
-            return ToolResult(success=False, error=str(e))
+            timing = timer.elapsed()
+            self.emitter.emit(ToolErrorEvent(tool_name=self.tool_name, error=str(e), **timing))
+            return ToolResult(success=False, error=str(e), **timing)
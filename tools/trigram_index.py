@@ -0,0 +1,226 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from re import _constants as sre_constants, _parser as sre_parser  # type: ignore[attr-defined]
+from tools.search import read_text_file
+
+# Give up narrowing when an alternation expands into more branches than this
+MAX_ALTERNATIVES = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trigrams_by_file ON trigrams (file_id);
+"""
+
+
+def trigrams(text: str) -> set[str]:
+    """Lowercased trigrams of text; queries are lowercased too, so one index serves case-insensitive search."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# A query is a list of alternatives, each a list of literals that must all appear in a
+# matching file (an OR of ANDs). None means the pattern can't be narrowed.
+Query = list[list[str]] | None
+
+
+def _and(left: Query, right: Query) -> Query:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if len(left) * len(right) > MAX_ALTERNATIVES:
+        # keep the side with fewer alternatives, it is still a valid (weaker) filter
+        return left if len(left) <= len(right) else right
+    return [a + b for a in left for b in right]
+
+
+def _required(parsed) -> Query:
+    """Literals a match of a parsed regex must contain."""
+    query: Query = None
+    run: list[str] = []
+
+    def end_run():
+        nonlocal query
+        if len(run) >= 3:
+            query = _and(query, [["".join(run)]])
+        run.clear()
+
+    for op, arg in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(arg))
+            continue
+        end_run()
+        if op is sre_constants.SUBPATTERN:
+            query = _and(query, _required(arg[-1]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT):
+            low, _, body = arg
+            if low >= 1:
+                query = _and(query, _required(body))
+        elif op is sre_constants.ATOMIC_GROUP:
+            query = _and(query, _required(arg))
+        elif op is sre_constants.BRANCH:
+            alternatives: list[list[str]] = []
+            for branch in arg[1]:
+                branch_query = _required(branch)
+                if branch_query is None:
+                    alternatives = []
+                    break
+                alternatives.extend(branch_query)
+            if alternatives and len(alternatives) <= MAX_ALTERNATIVES:
+                query = _and(query, alternatives)
+        # anything else (classes, anchors, backreferences, lookarounds) requires nothing we can index
+    end_run()
+    return query
+
+
+def required_literals(pattern: str, flags: int = 0) -> Query:
+    try:
+        return _required(sre_parser.parse(pattern, flags))
+    except Exception:
+        return None
+
+
+class TrigramIndex:
+    """
+    On-disk trigram index of the project's files, used to narrow grep queries to the
+    files that can contain a match before they are scanned.
+
+    Stored in SQLite under the user cache dir, one database per project. Files are
+    reindexed when their mtime or size changes: every known file is re-statted at
+    most every `max_staleness` seconds, and files reported through
+    tools.utils.notify_file_changed (e.g. editor writes) are reindexed on the next query.
+    """
+
+    def __init__(self, root: str, db_path: str | None = None, max_staleness: float = 2.0):
+        from tools.utils import add_change_listener, get_cache_dir
+        self.root = root
+        self.max_staleness = max_staleness
+        if db_path is None:
+            key = hashlib.sha1(root.encode()).hexdigest()[:16]
+            db_path = os.path.join(get_cache_dir(), "trigrams", f"{key}.sqlite")
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # path -> (id, mtime_ns, size) for every indexed file
+        self._known: dict[str, tuple[int, int, int]] = {
+            path: (file_id, mtime_ns, size)
+            for file_id, path, mtime_ns, size in self._db.execute("SELECT id, path, mtime_ns, size FROM files")
+        }
+        self._last_sync = 0.0
+        self._stale = True
+        self._changed: set[str] = set()
+        add_change_listener(self._on_change)
+
+    def _on_change(self, path: str | None):
+        with self._lock:
+            if path is None:
+                self._stale = True
+                return
+            rel_path = os.path.relpath(path, self.root)
+            if not rel_path.startswith(".."):
+                self._changed.add(rel_path.replace(os.sep, "/"))
+
+    def _index_file(self, rel_path: str, stat: os.stat_result):
+        old = self._known.get(rel_path)
+        if old is not None:
+            self._db.execute("DELETE FROM trigrams WHERE file_id = ?", (old[0],))
+            self._db.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?", (stat.st_mtime_ns, stat.st_size, old[0]))
+            file_id = old[0]
+        else:
+            cursor = self._db.execute(
+                "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)", (rel_path, stat.st_mtime_ns, stat.st_size)
+            )
+            assert cursor.lastrowid is not None
+            file_id = cursor.lastrowid
+        self._known[rel_path] = (file_id, stat.st_mtime_ns, stat.st_size)
+        # binary and oversized files get no trigrams: grep skips them anyway
+        text = read_text_file(os.path.join(self.root, rel_path))
+        if text is not None:
+            self._db.executemany(
+                "INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)",
+                ((trigram, file_id) for trigram in trigrams(text))
+            )
+
+    def _remove_file(self, rel_path: str):
+        file_id = self._known.pop(rel_path)[0]
+        self._db.execute("DELETE FROM trigrams WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _sync_paths(self, paths):
+        for rel_path in paths:
+            try:
+                stat = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                if rel_path in self._known:
+                    self._remove_file(rel_path)
+                continue
+            known = self._known.get(rel_path)
+            if known is None or known[1:] != (stat.st_mtime_ns, stat.st_size):
+                self._index_file(rel_path, stat)
+
+    def sync(self, files: list[str]):
+        """Bring the index up to date for files (paths relative to the root)."""
+        with self._lock, self._db:
+            now = time.monotonic()
+            if self._stale or now - self._last_sync > self.max_staleness:
+                # files may be a subtree; known files outside it are re-statted too,
+                # and deleted ones dropped
+                self._sync_paths(sorted(set(files) | set(self._known)))
+                self._stale = False
+                self._last_sync = now
+            else:
+                # reported changes, and files that appeared since the last full sync
+                self._sync_paths(sorted(self._changed) + [path for path in files if path not in self._known])
+            self._changed.clear()
+
+    def _query_files(self, literals: list[str]) -> set[str]:
+        grams = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+        placeholders = ",".join("?" * len(grams))
+        rows = self._db.execute(
+            f"SELECT files.path FROM trigrams JOIN files ON files.id = trigrams.file_id "
+            f"WHERE trigram IN ({placeholders}) GROUP BY trigrams.file_id HAVING COUNT(*) = ?",
+            (*grams, len(grams))
+        )
+        return {path for (path,) in rows}
+
+    def candidate_files(self, regex: re.Pattern, files: list[str]) -> list[str]:
+        """The subset of files (in order) that may contain a match for regex."""
+        query = required_literals(regex.pattern, regex.flags)
+        if query is None:
+            return files
+        self.sync(files)
+        with self._lock:
+            matched: set[str] = set()
+            for literals in query:
+                matched |= self._query_files(literals)
+        return [path for path in files if path in matched]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@lru_cache(maxsize=None)
+def get_trigram_index(root: str) -> TrigramIndex:
+    """The process-wide trigram index of a project root."""
+    return TrigramIndex(root)
@@ -1,5 +1,8 @@
 import os
+import shutil
+import tempfile
 from functools import lru_cache
+from typing import BinaryIO, Callable
 
 MARKER_FILES = ['.git', 'pyproject.toml', 'setup.py', 'setup.cfg']
 
@@ -30,3 +33,100 @@ def validate_path_within_project(path: str) -> str:
     if not is_path_within_project(abs_path):
         raise ValueError(f"Path {abs_path} is not within the project root {get_project_root()}")
     return abs_path
+
+
+# Extra callbacks for notify_file_changed/notify_tree_changed, called with the absolute
+# path that changed, or None when any file may have changed
+_change_listeners: list[Callable[[str | None], None]] = []
+
+
+def add_change_listener(listener: Callable[[str | None], None]) -> None:
+    _change_listeners.append(listener)
+
+
+def notify_file_changed(path: str) -> None:
+    """
+    Tell the project's in-memory caches that the file at path was created, written or deleted.
+    Tools that write files call this so their changes are visible to the next glob/grep.
+    """
+    from tools.file_index import get_file_index
+    abs_path = os.path.abspath(path)
+    get_file_index().file_changed(abs_path)
+    for listener in _change_listeners:
+        listener(abs_path)
+
+
+def notify_tree_changed() -> None:
+    """Like notify_file_changed, for when any file may have changed (e.g. after a shell command)."""
+    from tools.file_index import get_file_index
+    get_file_index().mark_stale()
+    for listener in _change_listeners:
+        listener(None)
+
+
+def get_cache_dir() -> str:
+    """Per-user cache directory for on-disk indexes ($XDG_CACHE_HOME/toy-agent)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "toy-agent")
+
+
+def get_data_dir() -> str:
+    """Per-user directory for data worth keeping, like saved sessions ($XDG_DATA_HOME/toy-agent)."""
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "toy-agent")
+
+
+def _atomic_replace(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """
+    Replace the file at path with what write() writes to a temp file in the same
+    directory, then rename it into place, so readers (and a crash) never see a
+    half-written file. Keeps the existing file's permissions and notifies the project caches.
+    """
+    abs_path = os.path.abspath(path)
+    directory = os.path.dirname(abs_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(abs_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            os.chmod(temp_path, os.stat(abs_path).st_mode & 0o7777)
+        except FileNotFoundError:
+            # new file: mkstemp creates it 0600, use the usual umask default instead
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, abs_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    notify_file_changed(abs_path)
+
+
+def atomic_write(path: str, content: str) -> None:
+    """Atomically replace the file at path with content (UTF-8)."""
+    _atomic_replace(path, lambda file: file.write(content.encode()))
+
+
+def atomic_insert(path: str, offset: int, data: bytes) -> None:
+    """
+    Atomically insert data at byte offset in the file at path. The rest of the file is
+    copied in chunks, never decoded or held in memory whole.
+    """
+    def write(file: BinaryIO):
+        with open(path, "rb") as source:
+            remaining = offset
+            while remaining > 0:
+                chunk = source.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                file.write(chunk)
+                remaining -= len(chunk)
+            file.write(data)
+            shutil.copyfileobj(source, file, 1024 * 1024)
+
+    _atomic_replace(path, write)
@@ -0,0 +1,183 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+SERVICE_NAME = "toy-agent"
+
+
+@dataclass
+class Span:
+    name: str
+    category: str  # "agent", "iteration", "llm", "tool", "sub_agent", "confirmation"
+    trace_id: str  # 32 hex chars, shared by every span under one root
+    span_id: str  # 16 hex chars
+    parent_id: str | None
+    start_ns: int  # unix time
+    end_ns: int | None = None
+    thread_id: int = field(default_factory=threading.get_ident)
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Records nested spans for agent runs, iterations, model calls, tool calls, sub-agents
+    and confirmation prompts. The current span is tracked in a context variable, so
+    spans nest across asyncio tasks; worker threads need the submitting context (see
+    `propagate`). Finished spans are kept in memory until exported.
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str, **attributes: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            category=category,
+            trace_id=parent.trace_id if parent is not None else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.time_ns(),
+            attributes=attributes
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def _finished_spans(self) -> list[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span.start_ns)
+
+    def to_chrome_trace(self) -> dict:
+        """Spans as Chrome trace-event JSON ("X" complete events), for Perfetto or chrome://tracing."""
+        pid = os.getpid()
+        events = []
+        for span in self._finished_spans():
+            assert span.end_ns is not None
+            args = {"span_id": span.span_id, "parent_id": span.parent_id, **span.attributes}
+            if span.error is not None:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start_ns / 1000,  # microseconds
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_otlp(self) -> dict:
+        """Spans as an OTLP/JSON ExportTraceServiceRequest, e.g. for an OpenTelemetry collector's file receiver."""
+        spans = []
+        for span in self._finished_spans():
+            otlp_span: dict[str, Any] = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [_otlp_attribute("category", span.category)]
+                + [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error is not None else {"code": 1},
+            }
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+            }]
+        }
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def export_otlp(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_otlp(), f)
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+_tracer: Tracer | None = None
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """Install the process-wide tracer. Tracing is off (and costs nothing) while it is None."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+@contextmanager
+def trace_span(name: str, category: str, **attributes: Any) -> Iterator[Span | None]:
+    """A span under the current one, or None when no tracer is installed."""
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, category, **attributes) as span:
+        yield span
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap fn to run in a copy of the current context, so spans started in a worker
+    thread nest under the span that submitted it.
+    """
+    if _tracer is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        # a context can only be entered by one thread at a time, so copy it per call
+        return context.copy().run(fn, *args, **kwargs)
+    return run